@@ -3,11 +3,15 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
-from backend import api
+from backend.api.data_ingestion import versions as document_version_model
+from backend.api.token import model as token_model
+from backend.api.user import model as user_model
 from backend.config.settings import _settings
 from backend.databases.db import Base
 
-be_api = api
+# Models register their tables on Base.metadata when imported
+be_models = [user_model, token_model, document_version_model]
+
 config = context.config
 config.set_main_option("sqlalchemy.url", _settings.postgres.url)
 
@@ -0,0 +1,496 @@
+"""Extraction benchmark on a synthetic corpus.
+
+The corpus is generated locally, without network access or extra
+dependencies: digital PDFs with a text layer, scanned PDFs rasterized from
+the same kind of pages, table-heavy and picture-heavy pages. Every benchmark
+configuration runs in a fresh process, so that its peak RSS and model load
+time are not hidden by a previous configuration, and reports pages per
+second, CPU utilization, peak RSS and Docling's per-stage timings.
+"""
+
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from loguru import logger
+from PIL import Image, ImageDraw, ImageFont
+
+from backend.utils.resources import (
+    get_available_memory_bytes,
+    get_cpu_count,
+    get_peak_rss_bytes,
+)
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+_WORDS = (
+    "ingestion pipeline document layout table figure revenue quarter model "
+    "throughput latency memory region customer contract invoice report "
+    "analysis summary policy network storage cluster request response "
+    "schedule budget forecast growth margin segment market product service"
+).split()
+
+
+@dataclass
+class BenchmarkConfig:
+    name: str
+    # Keyword arguments of DoclingExtractionService._extract_document
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+def _sentence(rng: random.Random, num_words: int) -> str:
+    words = [rng.choice(_WORDS) for _ in range(num_words)]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph_lines(rng: random.Random, num_lines: int) -> List[str]:
+    return [_sentence(rng, rng.randint(9, 12)) for _ in range(num_lines)]
+
+
+def _chart_image(rng: random.Random, width: int = 480, height: int = 320):
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    num_bars = rng.randint(4, 8)
+    bar_width = (width - 40) // num_bars
+    for index in range(num_bars):
+        bar_height = rng.randint(height // 8, height - 40)
+        left = 20 + index * bar_width
+        color = tuple(rng.randint(0, 200) for _ in range(3))
+        draw.rectangle(
+            (left + 4, height - 20 - bar_height, left + bar_width - 4, height - 20),
+            fill=color,
+        )
+    draw.line((20, height - 20, width - 20, height - 20), fill="black", width=2)
+    return image
+
+
+class _PdfWriter:
+    """Writes PDFs with Helvetica text, lines and RGB images."""
+
+    def __init__(self):
+        self._objects: List[bytes] = []
+        self._pages: List[int] = []
+        self._font = self._add(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+        )
+        # Reserved for the page tree, written last
+        self._pages_id = self._add(b"")
+
+    def _add(self, data: bytes) -> int:
+        self._objects.append(data)
+        return len(self._objects)
+
+    def _add_stream(self, dictionary: bytes, data: bytes) -> int:
+        return self._add(
+            b"<< %s /Length %d >>\nstream\n" % (dictionary, len(data))
+            + data
+            + b"\nendstream"
+        )
+
+    def add_page(
+        self,
+        operations: List[str],
+        images: Sequence[Tuple[Image.Image, Tuple[float, float, float, float]]] = (),
+    ) -> None:
+        """Add a page.
+
+        Args:
+            operations: PDF content stream operators.
+            images: Images with their (x, y, width, height) in points.
+        """
+        names = []
+        for index, (image, (x, y, width, height)) in enumerate(images):
+            rgb = image.convert("RGB")
+            image_id = self._add_stream(
+                b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+                b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode"
+                % rgb.size,
+                zlib.compress(rgb.tobytes()),
+            )
+            names.append(b"/Im%d %d 0 R" % (index, image_id))
+            operations.append(f"q {width} 0 0 {height} {x} {y} cm /Im{index} Do Q")
+        contents = self._add_stream(b"", "\n".join(operations).encode("latin-1"))
+        self._pages.append(
+            self._add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << /Font << /F1 %d 0 R >> /XObject << %s >> >> "
+                b"/Contents %d 0 R >>"
+                % (
+                    self._pages_id,
+                    PAGE_WIDTH,
+                    PAGE_HEIGHT,
+                    self._font,
+                    b" ".join(names),
+                    contents,
+                )
+            )
+        )
+
+    def save(self, path: Path) -> None:
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        page_tree = b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        self._objects[self._pages_id - 1] = page_tree % (kids, len(self._pages))
+        catalog = self._add(b"<< /Type /Catalog /Pages %d 0 R >>" % self._pages_id)
+        output = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for number, data in enumerate(self._objects, start=1):
+            offsets.append(len(output))
+            output += b"%d 0 obj\n" % number + data + b"\nendobj\n"
+        xref = len(output)
+        output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(self._objects) + 1)
+        for offset in offsets:
+            output += b"%010d 00000 n \n" % offset
+        trailer = b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        output += trailer % (len(self._objects) + 1, catalog, xref)
+        path.write_bytes(bytes(output))
+
+
+def _text_operations(lines: List[str], top: float, size: int = 11) -> List[str]:
+    operations = [f"BT /F1 {size} Tf {size + 3} TL {MARGIN} {top} Td"]
+    operations.extend(f"({line}) '" for line in lines)
+    operations.append("ET")
+    return operations
+
+
+def _text_page(rng: random.Random, page_no: int) -> List[str]:
+    operations = _text_operations([f"Section {page_no}"], PAGE_HEIGHT - MARGIN, 16)
+    top = PAGE_HEIGHT - MARGIN - 30
+    for _ in range(4):
+        lines = _paragraph_lines(rng, 8)
+        operations += _text_operations(lines, top)
+        top -= 14 * len(lines) + 20
+    return operations
+
+
+def _table_page(rng: random.Random, page_no: int) -> List[str]:
+    operations = _text_operations([f"Table {page_no}"], PAGE_HEIGHT - MARGIN, 16)
+    num_rows, num_columns = 12, 5
+    row_height, column_width = 20, (PAGE_WIDTH - 2 * MARGIN) / num_columns
+    for table in range(2):
+        top = PAGE_HEIGHT - MARGIN - 40 - table * (num_rows * row_height + 60)
+        bottom = top - num_rows * row_height
+        for row in range(num_rows + 1):
+            y = top - row * row_height
+            operations.append(f"{MARGIN} {y} m {PAGE_WIDTH - MARGIN} {y} l S")
+        for column in range(num_columns + 1):
+            x = MARGIN + column * column_width
+            operations.append(f"{x:.1f} {top} m {x:.1f} {bottom} l S")
+        for row, column in product(range(num_rows), range(num_columns)):
+            if row == 0:
+                text = rng.choice(_WORDS).capitalize()
+            elif column == 0:
+                text = f"{rng.choice(_WORDS)} {row}"
+            else:
+                text = f"{rng.uniform(0, 10_000):,.2f}"
+            x = MARGIN + column * column_width + 4
+            y = top - (row + 1) * row_height + 6
+            operations.append(f"BT /F1 9 Tf {x:.1f} {y} Td ({text}) Tj ET")
+    return operations
+
+
+def _picture_page(
+    rng: random.Random, page_no: int
+) -> Tuple[List[str], List[Tuple[Image.Image, Tuple[float, float, float, float]]]]:
+    operations = _text_operations([f"Figure {page_no}"], PAGE_HEIGHT - MARGIN, 16)
+    operations += _text_operations(_paragraph_lines(rng, 4), PAGE_HEIGHT - MARGIN - 30)
+    width = PAGE_WIDTH - 2 * MARGIN
+    height = width * 2 / 3
+    images = [
+        (_chart_image(rng), (MARGIN, PAGE_HEIGHT - 160 - height, width, height)),
+        (_chart_image(rng), (MARGIN, MARGIN, width * 0.6, height * 0.6)),
+    ]
+    return operations, images
+
+
+def _scanned_page(rng: random.Random, page_no: int, dpi: int) -> Image.Image:
+    scale = dpi / 72
+    image = Image.new("L", (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)), "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=int(11 * scale))
+    except TypeError:
+        # Pillow < 10.1 only has a fixed size bitmap font
+        font = ImageFont.load_default()
+    y = MARGIN * scale
+    draw.text((MARGIN * scale, y), f"Scanned page {page_no}", fill="black", font=font)
+    for line in _paragraph_lines(rng, 36):
+        y += 16 * scale
+        draw.text((MARGIN * scale, y), line, fill="black", font=font)
+    # Scanners rarely feed pages perfectly straight
+    return image.rotate(rng.uniform(-1, 1), fillcolor="white", expand=False)
+
+
+def generate_corpus(
+    output_folder: Path, pages: int = 8, seed: int = 0, dpi: int = 150
+) -> List[Path]:
+    """Write the synthetic benchmark corpus.
+
+    Args:
+        output_folder: Folder receiving the documents.
+        pages: Pages per document.
+        seed: Seed of the generated content, the corpus is reproducible.
+        dpi: Resolution of the scanned pages.
+
+    Returns:
+        List[Path]: The digital, scanned, table-heavy and picture-heavy PDFs.
+    """
+    output_folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    doc_paths = []
+
+    for name, make_page in (("digital", _text_page), ("tables", _table_page)):
+        writer = _PdfWriter()
+        for page_no in range(1, pages + 1):
+            writer.add_page(make_page(rng, page_no))
+        doc_paths.append(output_folder / f"{name}.pdf")
+        writer.save(doc_paths[-1])
+
+    writer = _PdfWriter()
+    for page_no in range(1, pages + 1):
+        writer.add_page(*_picture_page(rng, page_no))
+    doc_paths.append(output_folder / "pictures.pdf")
+    writer.save(doc_paths[-1])
+
+    scans = [_scanned_page(rng, page_no, dpi) for page_no in range(1, pages + 1)]
+    doc_paths.append(output_folder / "scanned.pdf")
+    scans[0].save(doc_paths[-1], save_all=True, append_images=scans[1:], resolution=dpi)
+    return doc_paths
+
+
+def build_matrix(
+    threads: Sequence[int] = (4,),
+    batch_sizes: Sequence[int] = (4,),
+    layout_batch_sizes: Sequence[int] = (64,),
+    standard: bool = True,
+    accelerator: bool = True,
+) -> List[BenchmarkConfig]:
+    """Build the standard pipeline config and the accelerator config grid.
+
+    Args:
+        threads: Values of ``num_threads``.
+        batch_sizes: Values of ``ocr_batch_size`` and ``table_batch_size``.
+        layout_batch_sizes: Values of ``layout_batch_size``.
+        standard: Whether to include the standard pipeline.
+        accelerator: Whether to include the threaded pipeline grid.
+
+    Returns:
+        List[BenchmarkConfig]: The configurations.
+    """
+    configs = []
+    if standard:
+        configs.append(BenchmarkConfig(name="standard"))
+    if accelerator:
+        for num_threads, batch_size, layout_batch_size in product(
+            threads, batch_sizes, layout_batch_sizes
+        ):
+            configs.append(
+                BenchmarkConfig(
+                    name=f"accelerator-t{num_threads}-b{batch_size}-l{layout_batch_size}",
+                    options={
+                        "is_accelerator": True,
+                        "num_threads": num_threads,
+                        "ocr_batch_size": batch_size,
+                        "table_batch_size": batch_size,
+                        "layout_batch_size": layout_batch_size,
+                    },
+                )
+            )
+    return configs
+
+
+def _cpu_seconds() -> float:
+    # OCR runs in tesseract subprocesses, count them too
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+class _ProfiledConverter:
+    """Adds the per-stage timings of every conversion to a running total."""
+
+    def __init__(self, converter, stage_seconds: Dict[str, float]):
+        self._converter = converter
+        self._stage_seconds = stage_seconds
+
+    def convert(self, *args, **kwargs):
+        result = self._converter.convert(*args, **kwargs)
+        for stage, item in result.timings.items():
+            self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + float(
+                item.total()
+            )
+        return result
+
+    def initialize_pipeline(self, *args, **kwargs):
+        return self._converter.initialize_pipeline(*args, **kwargs)
+
+
+def _run_config_in_worker(
+    doc_paths: List[Path], config: BenchmarkConfig, output_folder: Path, repeat: int
+) -> dict:
+    from docling.datamodel.settings import settings as docling_settings
+
+    from backend.api.data_ingestion.converter_registry import ConverterOptions
+    from backend.api.data_ingestion.extraction import (
+        CONVERTER_OPTION_NAMES,
+        DoclingExtractionService,
+    )
+
+    docling_settings.debug.profile_pipeline_timings = True
+    stage_seconds: Dict[str, float] = {}
+
+    class ProfiledExtractionService(DoclingExtractionService):
+        def get_converter(self, options):
+            return _ProfiledConverter(super().get_converter(options), stage_seconds)
+
+    service = ProfiledExtractionService()
+    converter_options = ConverterOptions(
+        **{
+            name: value
+            for name, value in config.options.items()
+            if name in CONVERTER_OPTION_NAMES
+        }
+    )
+    result = {"config": asdict(config), "documents": []}
+    try:
+        started = time.perf_counter()
+        service.warm_up(converter_options)
+        result["load_seconds"] = time.perf_counter() - started
+
+        cpu_started = _cpu_seconds()
+        started = time.perf_counter()
+        pages = 0
+        for iteration in range(repeat):
+            for doc_path in doc_paths:
+                doc_started = time.perf_counter()
+                doc = service._extract_document(
+                    doc_path, output_folder, use_cache=False, **config.options
+                )
+                pages += len(doc.pages)
+                if iteration == 0:
+                    result["documents"].append(
+                        {
+                            "document": doc_path.name,
+                            "pages": len(doc.pages),
+                            "seconds": time.perf_counter() - doc_started,
+                        }
+                    )
+        seconds = time.perf_counter() - started
+        cpu_seconds = _cpu_seconds() - cpu_started
+        result.update(
+            pages=pages,
+            seconds=seconds,
+            pages_per_second=pages / max(seconds, 1e-9),
+            cpu_seconds=cpu_seconds,
+            # Share of the CPUs available to the process kept busy
+            cpu_utilization=cpu_seconds / max(seconds, 1e-9) / get_cpu_count(),
+            stage_seconds=dict(sorted(stage_seconds.items())),
+        )
+    except Exception as e:
+        logger.exception(f"Benchmark config {config.name} failed: {e}")
+        result["error"] = repr(e)
+    result["peak_rss_mb"] = get_peak_rss_bytes() / 2**20
+    return result
+
+
+def run_benchmark(
+    doc_paths: List[Path],
+    configs: List[BenchmarkConfig],
+    output_folder: Path,
+    repeat: int = 1,
+) -> dict:
+    """Extract the documents with every configuration.
+
+    Caching is disabled and every configuration runs in a new process.
+
+    Args:
+        doc_paths: Documents to extract.
+        configs: Configurations to compare.
+        output_folder: Scratch folder of the extraction.
+        repeat: Times each document is extracted per configuration.
+
+    Returns:
+        dict: Host description and one result per configuration.
+    """
+    import docling
+    import torch
+
+    report = {
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": get_cpu_count(),
+            "available_memory_mb": get_available_memory_bytes() / 2**20,
+            "torch": torch.__version__,
+            "cuda": torch.cuda.is_available(),
+            "docling": getattr(docling, "__version__", "unknown"),
+        },
+        "corpus": [path.name for path in doc_paths],
+        "repeat": repeat,
+        "results": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        logger.info(f"Benchmarking {config.name}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                _run_config_in_worker, doc_paths, config, output_folder, repeat
+            ).result()
+        report["results"].append(result)
+    return report
+
+
+def render_markdown(report: dict) -> str:
+    """Render a benchmark report as a Markdown table."""
+    host = report["host"]
+    lines = [
+        f"Host: {host['cpus']} CPUs, {host['available_memory_mb']:.0f} MB available, "
+        f"CUDA {'yes' if host['cuda'] else 'no'}, torch {host['torch']}",
+        f"Corpus: {', '.join(report['corpus'])} (x{report['repeat']})",
+        "",
+        "| Config | Pages/s | Seconds | Load s | CPU util. | Peak RSS MB | "
+        "Slowest stages (s) |",
+        "|---|---:|---:|---:|---:|---:|---|",
+    ]
+    for result in report["results"]:
+        name = result["config"]["name"]
+        if "error" in result:
+            error = result["error"].splitlines()[0][:100]
+            lines.append(f"| {name} | failed: {error} | | | | | |")
+            continue
+        stages = sorted(
+            result["stage_seconds"].items(), key=lambda item: item[1], reverse=True
+        )
+        slowest = ", ".join(f"{stage} {seconds:.1f}" for stage, seconds in stages[:3])
+        lines.append(
+            f"| {name} | {result['pages_per_second']:.2f} | {result['seconds']:.1f} | "
+            f"{result['load_seconds']:.1f} | {result['cpu_utilization']:.0%} | "
+            f"{result['peak_rss_mb']:.0f} | {slowest} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report: dict, output_folder: Path) -> Tuple[Path, Path]:
+    """Write a benchmark report as ``report.json`` and ``report.md``."""
+    output_folder.mkdir(parents=True, exist_ok=True)
+    json_path = output_folder / "report.json"
+    markdown_path = output_folder / "report.md"
+    json_path.write_text(json.dumps(report, indent=2))
+    markdown_path.write_text(render_markdown(report))
+    return json_path, markdown_path
+
+
+def load_matrix(path: Path) -> List[BenchmarkConfig]:
+    """Load configurations from a JSON list of ``{"name", "options"}``."""
+    return [BenchmarkConfig(**config) for config in json.loads(path.read_text())]
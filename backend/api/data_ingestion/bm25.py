@@ -0,0 +1,426 @@
+"""Local BM25 term weights, behind the "bm25" sparse encoder.
+
+Texts are split into words, stop words dropped and the others stemmed, then
+each word is mapped to a term id by the CRC32 of its stem. The ids of a
+distinct word are computed once and cached, so encoding a batch is a regular
+expression pass, dictionary lookups, and NumPy for the rest.
+
+Document vectors hold the saturated term frequency of BM25,
+``tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))``, and query
+vectors the inverse document frequency of their terms, so the dot product of
+the two is the BM25 score. The document frequencies, the number and the total
+length of the indexed documents are kept in ``Bm25Statistics``, updated as
+documents are indexed or removed, and saved in a small ``.npz`` file that
+several workers can update.
+"""
+
+import fcntl
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Term id of the words left out, never stored
+_SKIPPED = 0
+# Distinct words whose term id is cached
+_MAX_CACHED_WORDS = 1_000_000
+
+STOP_WORDS = frozenset(
+    """a about above after again against all am an and any are as at be because
+    been before being below between both but by can did do does doing down during
+    each few for from further had has have having he her here hers herself him
+    himself his how i if in into is it its itself just me more most my myself no
+    nor not now of off on once only or other our ours ourselves out over own same
+    she should so some such than that the their theirs them themselves then there
+    these they this those through to too under until up very was we were what
+    when where which while who whom why will with you your yours yourself
+    yourselves""".split()
+)
+
+_VOWELS = frozenset("aeiouy")
+_STEP2_SUFFIXES = (
+    ("ization", "ize"),
+    ("iveness", "ive"),
+    ("fulness", "ful"),
+    ("ousness", "ous"),
+    ("ational", "ate"),
+    ("biliti", "ble"),
+    ("tional", "tion"),
+    ("ation", "ate"),
+    ("aliti", "al"),
+    ("iviti", "ive"),
+    ("entli", "ent"),
+    ("ousli", "ous"),
+    ("alism", "al"),
+    ("ator", "ate"),
+    ("izer", "ize"),
+    ("enci", "ence"),
+    ("anci", "ance"),
+    ("alli", "al"),
+)
+_STEP3_SUFFIXES = (
+    ("icate", "ic"),
+    ("ative", ""),
+    ("alize", "al"),
+    ("iciti", "ic"),
+    ("ical", "ic"),
+    ("ness", ""),
+    ("ful", ""),
+)
+_STEP4_SUFFIXES = (("tion", "t"), ("sion", "s")) + tuple(
+    (suffix, "")
+    for suffix in (
+        "ement",
+        "ment",
+        "ance",
+        "ence",
+        "able",
+        "ible",
+        "ant",
+        "ent",
+        "ism",
+        "ate",
+        "iti",
+        "ous",
+        "ive",
+        "ize",
+        "al",
+        "er",
+        "ic",
+    )
+)
+
+
+def _has_vowel(word: str) -> bool:
+    return any(letter in _VOWELS for letter in word)
+
+
+def _strip(word: str, suffixes: tuple) -> str:
+    """Replace the first matching suffix when a stem of three letters is left."""
+    for suffix, replacement in suffixes:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= 3:
+                return word[: -len(suffix)] + replacement
+            return word
+    return word
+
+
+def stem(word: str) -> str:
+    """Light English stemmer, close to the steps of Porter's algorithm.
+
+    Words that are not plain ASCII letters, such as Vietnamese words or
+    numbers, are kept as they are.
+    """
+    if len(word) <= 3 or not word.isascii() or not word.isalpha():
+        return word
+    # Plurals
+    if word.endswith(("sses", "ies")):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    # Past tenses and gerunds
+    if word.endswith("eed"):
+        if len(word) > 4:
+            word = word[:-1]
+    else:
+        for suffix in ("ing", "ed"):
+            if word.endswith(suffix) and _has_vowel(word[: -len(suffix)]):
+                word = word[: -len(suffix)]
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif len(word) > 2 and word[-1] == word[-2] and word[-1] not in "lsz":
+                    word = word[:-1]
+                break
+    if word.endswith("y") and _has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+    word = _strip(word, _STEP2_SUFFIXES)
+    word = _strip(word, _STEP3_SUFFIXES)
+    return _strip(word, _STEP4_SUFFIXES)
+
+
+class _TermIds(dict):
+    """Lowercased word -> term id, filled on first lookup."""
+
+    def __missing__(self, word: str) -> int:
+        if word in STOP_WORDS:
+            term = _SKIPPED
+        else:
+            term = zlib.crc32(stem(word).encode()) or 1
+        if len(self) < _MAX_CACHED_WORDS:
+            self[word] = term
+        return term
+
+
+class Bm25Statistics:
+    """Document frequencies of terms, and number and length of documents.
+
+    Changes are applied in memory at once, and merged into the file by
+    ``save`` under an exclusive lock, so workers updating the same file do
+    not lose each other's documents.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.num_docs = 0
+        self.total_length = 0
+        # Sorted term ids and their document frequencies
+        self.terms = np.zeros(0, np.uint32)
+        self.df = np.zeros(0, np.int64)
+        # Changes since the last save
+        self._pending_terms = np.zeros(0, np.uint32)
+        self._pending_df = np.zeros(0, np.int64)
+        self._pending_docs = 0
+        self._pending_length = 0
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        if path is not None:
+            self.refresh()
+
+    @staticmethod
+    def _merge(
+        terms: np.ndarray, df: np.ndarray, other_terms: np.ndarray, other_df: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        merged, inverse = np.unique(
+            np.concatenate([terms, other_terms]), return_inverse=True
+        )
+        counts = np.bincount(
+            inverse, weights=np.concatenate([df, other_df]), minlength=len(merged)
+        ).astype(np.int64)
+        keep = counts > 0
+        return merged[keep].astype(np.uint32), counts[keep]
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.num_docs if self.num_docs else 0.0
+
+    def update(self, terms: np.ndarray, lengths: np.ndarray, sign: int = 1) -> None:
+        """Count documents in, or out with ``sign=-1``.
+
+        Args:
+            terms: Distinct term ids of every document, concatenated.
+            lengths: Number of terms of every document.
+            sign: 1 to add the documents, -1 to remove them.
+        """
+        unique, counts = np.unique(terms, return_counts=True)
+        counts = counts.astype(np.int64) * sign
+        num_docs = len(lengths) * sign
+        total_length = int(lengths.sum()) * sign
+        with self._lock:
+            self.terms, self.df = self._merge(self.terms, self.df, unique, counts)
+            self.num_docs = max(0, self.num_docs + num_docs)
+            self.total_length = max(0, self.total_length + total_length)
+            pending_terms = np.concatenate([self._pending_terms, unique])
+            pending_df = np.concatenate([self._pending_df, counts])
+            self._pending_terms, inverse = np.unique(pending_terms, return_inverse=True)
+            self._pending_df = np.bincount(
+                inverse, weights=pending_df, minlength=len(self._pending_terms)
+            ).astype(np.int64)
+            self._pending_docs += num_docs
+            self._pending_length += total_length
+
+    def document_frequency(self, terms: np.ndarray) -> np.ndarray:
+        """Number of documents containing each term."""
+        with self._lock:
+            table, df = self.terms, self.df
+        if not len(table):
+            return np.zeros(len(terms), np.int64)
+        positions = np.minimum(np.searchsorted(table, terms), len(table) - 1)
+        return np.where(table[positions] == terms, df[positions], 0)
+
+    def idf(self, terms: np.ndarray) -> np.ndarray:
+        """Inverse document frequency of each term, always positive."""
+        df = self.document_frequency(terms)
+        return np.log1p((self.num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def _read(self) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        try:
+            with np.load(self.path) as arrays:
+                num_docs, total_length = (int(value) for value in arrays["totals"])
+                return arrays["terms"], arrays["df"], num_docs, total_length
+        except FileNotFoundError:
+            return np.zeros(0, np.uint32), np.zeros(0, np.int64), 0, 0
+
+    def _apply_pending(
+        self, terms: np.ndarray, df: np.ndarray, num_docs: int, total_length: int
+    ) -> None:
+        self.terms, self.df = self._merge(
+            terms, df, self._pending_terms, self._pending_df
+        )
+        self.num_docs = max(0, num_docs + self._pending_docs)
+        self.total_length = max(0, total_length + self._pending_length)
+
+    def refresh(self) -> None:
+        """Reload the file when another process saved it."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            saved = self._read()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable BM25 statistics {self.path}: {e}")
+            return
+        with self._lock:
+            self._apply_pending(*saved)
+            self._mtime = mtime
+
+    def save(self) -> None:
+        """Merge the changes since the last save into the file."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            saved = self._read()
+            with self._lock:
+                self._apply_pending(*saved)
+                terms, df = self.terms, self.df
+                totals = np.array([self.num_docs, self.total_length], np.int64)
+                self._pending_terms = np.zeros(0, np.uint32)
+                self._pending_df = np.zeros(0, np.int64)
+                self._pending_docs = self._pending_length = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                np.savez(file, terms=terms, df=df, totals=totals)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime
+
+
+class Bm25Model:
+    """Computes BM25 weights of documents and queries as CSR arrays."""
+
+    def __init__(
+        self,
+        statistics: Bm25Statistics,
+        k1: float = 1.2,
+        b: float = 0.75,
+        avg_length: float = 256.0,
+    ):
+        self.statistics = statistics
+        self.k1 = k1
+        self.b = b
+        # Until documents are counted into the statistics
+        self.default_avg_length = avg_length
+        self._term_ids = _TermIds()
+
+    def tokenize(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Term ids of texts.
+
+        Returns:
+            tuple: Row of every term, and the term ids, in text order.
+        """
+        lookup = self._term_ids.__getitem__
+        rows = [
+            list(map(lookup, _WORD_PATTERN.findall(text.lower()))) for text in texts
+        ]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        terms = np.fromiter(
+            chain.from_iterable(rows), dtype=np.uint32, count=int(lengths.sum())
+        )
+        row_ids = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+        keep = terms != _SKIPPED
+        return row_ids[keep], terms[keep]
+
+    def _term_frequencies(
+        self, texts: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Distinct terms of every text with their counts, and text lengths.
+
+        Returns:
+            tuple: Row and term id of the distinct terms, sorted by row then
+                term, their counts, and the number of terms of every text.
+        """
+        row_ids, terms = self.tokenize(texts)
+        lengths = np.bincount(row_ids, minlength=len(texts))
+        keys, counts = np.unique(
+            (row_ids.astype(np.uint64) << np.uint64(32)) | terms, return_counts=True
+        )
+        rows = (keys >> np.uint64(32)).astype(np.int64)
+        return rows, (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32), counts, lengths
+
+    @staticmethod
+    def _csr(
+        num_texts: int, rows: np.ndarray, terms: np.ndarray, values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        indptr = np.zeros(num_texts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_texts), out=indptr[1:])
+        return indptr, terms, values.astype(np.float32)
+
+    def document_weights(
+        self, texts: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Saturated term frequencies of documents.
+
+        Returns:
+            tuple: ``indptr``, term ids and weights of the CSR rows.
+        """
+        rows, terms, counts, lengths = self._term_frequencies(texts)
+        avg_length = self.statistics.avg_length or self.default_avg_length
+        norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        values = counts * (self.k1 + 1) / (counts + norms[rows])
+        return self._csr(len(texts), rows, terms, values)
+
+    def query_weights(
+        self, texts: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Inverse document frequencies of the distinct terms of queries.
+
+        Returns:
+            tuple: ``indptr``, term ids and weights of the CSR rows.
+        """
+        if self.statistics.path is not None:
+            self.statistics.refresh()
+        rows, terms, _, _ = self._term_frequencies(texts)
+        return self._csr(len(texts), rows, terms, self.statistics.idf(terms))
+
+    def count_documents(self, texts: List[str], sign: int = 1) -> None:
+        """Count documents into the statistics, or out with ``sign=-1``."""
+        _, terms, _, lengths = self._term_frequencies(texts)
+        self.statistics.update(terms, lengths, sign)
+
+
+def benchmark_bm25(
+    texts: List[str], repeat: int = 3, model: Optional[Bm25Model] = None
+) -> Dict[str, float]:
+    """Measure BM25 document encoding throughput.
+
+    Args:
+        texts: The documents, encoded in batches of the embedding settings.
+        repeat: Runs, the fastest one is reported. The first run also fills
+            the cache of term ids, as a long running worker would have.
+        model: The model (default: a new one without statistics).
+
+    Returns:
+        dict: Documents, terms, seconds and documents per minute.
+    """
+    from backend.config.settings import _settings
+
+    model = model or Bm25Model(Bm25Statistics())
+    batch_size = _settings.embedding_model.batch_max_size
+    best = (float("inf"), 0)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        num_terms = 0
+        for start in range(0, len(texts), batch_size):
+            _, terms, _ = model.document_weights(texts[start : start + batch_size])
+            num_terms += len(terms)
+        best = min(best, (time.perf_counter() - started, num_terms))
+    seconds, num_terms = best
+    seconds = max(seconds, 1e-9)
+    return {
+        "documents": len(texts),
+        "terms": num_terms,
+        "seconds": seconds,
+        "documents_per_minute": len(texts) / seconds * 60,
+    }
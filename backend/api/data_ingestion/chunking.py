@@ -0,0 +1,390 @@
+"""Structure-aware chunking of extracted documents for retrieval.
+
+Documents are walked once, either as the Markdown page stream written by the
+extract stage or as a ``DoclingDocument`` tree. Headers configured in
+``ChunkConfig.markdown_headers`` open a new section: chunks never span two
+sections and carry the header path they belong to. Within a section, blocks
+(paragraphs, list items, tables, pictures) are packed into chunks of at most
+``chunk_size`` tokens, and the last blocks of a chunk are repeated at the
+start of the next one up to ``chunk_overlap`` tokens. A block too large for
+one chunk is split with the ``separators`` cascade, from paragraphs down to
+single tokens.
+
+Only the chunk being filled is held in memory, and every block is tokenized
+once, so chunking runs in linear time over arbitrarily long documents.
+"""
+
+import random
+import re
+import string
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from docling_core.types.doc import (
+    DoclingDocument,
+    ListItem,
+    PictureItem,
+    SectionHeaderItem,
+    TableItem,
+    TextItem,
+    TitleItem,
+)
+from loguru import logger
+
+from backend.api.data_ingestion.model import (
+    ChunkBoundingBox,
+    DocumentChunk,
+    ExtractedPage,
+)
+from backend.config.config import ChunkConfig
+from backend.config.settings import _settings
+
+# Tokens as counted when tiktoken is not installed: words and punctuation
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_HEADER_PATTERN = re.compile(r"^(#+) +(.+)$")
+
+
+class Tokenizer:
+    """Counts tokens and cuts text into pieces of a given number of tokens.
+
+    Uses the tiktoken encoding configured in ``ChunkConfig.tokenizer``, or
+    approximates tokens with words and punctuation marks when tiktoken or the
+    encoding is not available.
+    """
+
+    def __init__(self, encoding_name: str):
+        try:
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except ImportError:
+            logger.warning("tiktoken is not installed, approximating tokens by words")
+            self._encoding = None
+        except Exception as e:
+            # The encoding is downloaded on first use, which fails offline
+            logger.warning(
+                f"Failed to load the {encoding_name} encoding, approximating "
+                f"tokens by words: {e}"
+            )
+            self._encoding = None
+
+    def count(self, text: str) -> int:
+        if self._encoding is None:
+            return sum(1 for _ in _FALLBACK_TOKEN_PATTERN.finditer(text))
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Cut text every ``max_tokens`` tokens."""
+        if self._encoding is None:
+            starts = [
+                match.start()
+                for index, match in enumerate(_FALLBACK_TOKEN_PATTERN.finditer(text))
+                if index % max_tokens == 0
+            ]
+            bounds = [0, *starts[1:], len(text)]
+            return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return [
+            self._encoding.decode(tokens[start : start + max_tokens])
+            for start in range(0, len(tokens), max_tokens)
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str) -> Tokenizer:
+    return Tokenizer(encoding_name)
+
+
+@dataclass
+class _Block:
+    text: str
+    num_tokens: int
+    page_nos: Tuple[int, ...] = ()
+    # One box per page the block is on, when known
+    bboxes: Tuple[ChunkBoundingBox, ...] = ()
+
+    # Put between the previous block and this one in a chunk
+    joiner: str = "\n\n"
+
+    def part(self, text: str, num_tokens: int, joiner: str) -> "_Block":
+        return _Block(text, num_tokens, self.page_nos, self.bboxes, joiner)
+
+
+@dataclass
+class _Header:
+    # 1 for the first configured header, "#" in Markdown or the title
+    depth: int
+    text: str
+
+
+class Chunker:
+    """Splits documents into ``DocumentChunk``s as configured in ``ChunkConfig``."""
+
+    def __init__(self, config: Optional[ChunkConfig] = None):
+        self.config = config or _settings.chunk
+        if self.config.chunk_overlap >= self.config.chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.tokenizer = get_tokenizer(self.config.tokenizer)
+        # "#" -> 1, "##" -> 2, ... in the order of the configured headers
+        prefixes = sorted(
+            (prefix for prefix, _ in self.config.markdown_headers), key=len
+        )
+        self._depths = {prefix: depth for depth, prefix in enumerate(prefixes, 1)}
+        self._header_names = {
+            self._depths[prefix]: name for prefix, name in self.config.markdown_headers
+        }
+
+    def chunk_pages(self, pages: Iterable[ExtractedPage]) -> Iterator[DocumentChunk]:
+        """Chunk the Markdown of a page stream.
+
+        Args:
+            pages: Pages in page order, as yielded by ``iter_pages``.
+
+        Returns:
+            Iterator[DocumentChunk]: Chunks in document order.
+        """
+        return self._pack(self._page_blocks(pages))
+
+    def chunk_document(self, doc: DoclingDocument) -> Iterator[DocumentChunk]:
+        """Chunk a document tree, keeping the bounding boxes of its items.
+
+        Args:
+            doc: The extracted document.
+
+        Returns:
+            Iterator[DocumentChunk]: Chunks in document order.
+        """
+        return self._pack(self._document_blocks(doc))
+
+    def _page_blocks(
+        self, pages: Iterable[ExtractedPage]
+    ) -> Iterator[Union[_Block, _Header]]:
+        for page in pages:
+            for text in page.text.split("\n\n"):
+                text = text.strip()
+                if not text:
+                    continue
+                match = _HEADER_PATTERN.match(text)
+                if match and "\n" not in text and match.group(1) in self._depths:
+                    yield _Header(self._depths[match.group(1)], match.group(2))
+                else:
+                    yield _Block(text, self.tokenizer.count(text), (page.page_no,))
+
+    def _document_blocks(
+        self, doc: DoclingDocument
+    ) -> Iterator[Union[_Block, _Header]]:
+        for item, _ in doc.iterate_items():
+            depth = None
+            if isinstance(item, TitleItem):
+                depth = 1
+            elif isinstance(item, SectionHeaderItem):
+                depth = item.level + 1
+            if depth is not None and depth in self._header_names:
+                yield _Header(depth, item.text)
+                continue
+
+            if isinstance(item, TableItem):
+                text = item.export_to_markdown(doc)
+            elif isinstance(item, PictureItem):
+                description = None
+                if item.meta is not None and item.meta.description is not None:
+                    description = item.meta.description.text
+                text = "\n".join(filter(None, [item.caption_text(doc), description]))
+            elif isinstance(item, ListItem):
+                text = f"{item.marker or '-'} {item.text}"
+            elif isinstance(item, TextItem):
+                text = item.text
+            else:
+                continue
+            text = text.strip()
+            if not text:
+                continue
+
+            bboxes = []
+            for prov in item.prov:
+                page = doc.pages.get(prov.page_no)
+                bbox = prov.bbox
+                if page is not None:
+                    bbox = bbox.to_top_left_origin(page_height=page.size.height)
+                bboxes.append(
+                    ChunkBoundingBox(
+                        page_no=prov.page_no, l=bbox.l, t=bbox.t, r=bbox.r, b=bbox.b
+                    )
+                )
+            yield _Block(
+                text,
+                self.tokenizer.count(text),
+                tuple(sorted({bbox.page_no for bbox in bboxes})),
+                tuple(bboxes),
+            )
+
+    def _split(self, block: _Block, separators: List[str]) -> Iterator[_Block]:
+        """Split a block larger than a chunk with the separator cascade."""
+        chunk_size = self.config.chunk_size
+        if block.num_tokens <= chunk_size:
+            yield block
+            return
+
+        separator = next((sep for sep in separators if sep in block.text), "")
+        if separator == "":
+            texts = self.tokenizer.split(block.text, chunk_size)
+        else:
+            texts = block.text.split(separator)
+            # Sentences keep their period, lines and paragraphs their break
+            texts = [text + separator for text in texts[:-1]] + texts[-1:]
+        rest = separators[separators.index(separator) + 1 :] if separator else []
+        joiner = block.joiner
+        for text in texts:
+            if not text.strip():
+                continue
+            part = block.part(text, self.tokenizer.count(text), joiner)
+            # The separator ends the previous part, the next one follows it as is
+            joiner = ""
+            if separator:
+                yield from self._split(part, rest)
+            else:
+                yield part
+
+    def _pack(self, items: Iterable[Union[_Block, _Header]]) -> Iterator[DocumentChunk]:
+        chunk_size = self.config.chunk_size
+        chunk_overlap = self.config.chunk_overlap
+        separators = list(self.config.separators)
+        headings: Dict[int, str] = {}
+        buffer: Deque[_Block] = deque()
+        buffer_tokens = 0
+        # Blocks of the buffer already sent in a chunk, kept as overlap
+        sent = 0
+        index = 0
+
+        def make_chunk() -> DocumentChunk:
+            return DocumentChunk(
+                index=index,
+                text="".join(
+                    block.joiner + block.text if position else block.text
+                    for position, block in enumerate(buffer)
+                ).strip(),
+                num_tokens=buffer_tokens,
+                headings={
+                    self._header_names[depth]: text
+                    for depth, text in sorted(headings.items())
+                },
+                page_nos=sorted(
+                    {page_no for block in buffer for page_no in block.page_nos}
+                ),
+                bboxes=[bbox for block in buffer for bbox in block.bboxes],
+            )
+
+        for item in items:
+            if isinstance(item, _Header):
+                if len(buffer) > sent:
+                    yield make_chunk()
+                    index += 1
+                buffer.clear()
+                buffer_tokens = sent = 0
+                headings = {
+                    depth: text
+                    for depth, text in headings.items()
+                    if depth < item.depth
+                }
+                headings[item.depth] = item.text
+                continue
+
+            for block in self._split(item, separators):
+                if len(buffer) > sent and buffer_tokens + block.num_tokens > chunk_size:
+                    yield make_chunk()
+                    index += 1
+                    # Keep the last blocks as overlap, leaving room for the new one
+                    while buffer and (
+                        buffer_tokens > chunk_overlap
+                        or buffer_tokens + block.num_tokens > chunk_size
+                    ):
+                        buffer_tokens -= buffer.popleft().num_tokens
+                    sent = len(buffer)
+                buffer.append(block)
+                buffer_tokens += block.num_tokens
+
+        if len(buffer) > sent:
+            yield make_chunk()
+
+
+def synthetic_pages(num_pages: int, seed: int = 0) -> List[ExtractedPage]:
+    """Generate pages of Markdown with sections, paragraphs, lists and tables.
+
+    Args:
+        num_pages: Pages to generate.
+        seed: Seed of the generated words.
+
+    Returns:
+        List[ExtractedPage]: The pages.
+    """
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10)))
+        for _ in range(2000)
+    ]
+
+    def sentence() -> str:
+        return " ".join(rng.choices(words, k=rng.randint(6, 24))).capitalize() + "."
+
+    pages = []
+    for page_no in range(1, num_pages + 1):
+        blocks = []
+        if page_no % 10 == 1:
+            blocks.append(f"# Chapter {page_no // 10 + 1}")
+        for section in range(3):
+            blocks.append(f"## Section {page_no}.{section + 1}")
+            blocks.extend(
+                " ".join(sentence() for _ in range(rng.randint(2, 8)))
+                for _ in range(rng.randint(1, 4))
+            )
+            if rng.random() < 0.3:
+                blocks.append("\n".join(f"- {sentence()}" for _ in range(4)))
+            if rng.random() < 0.2:
+                rows = ["| a | b | c |", "|---|---|---|"] + [
+                    "| " + " | ".join(rng.choices(words, k=3)) + " |"
+                    for _ in range(rng.randint(3, 30))
+                ]
+                blocks.append("\n".join(rows))
+        pages.append(
+            ExtractedPage(
+                page_no=page_no, num_pages=num_pages, text="\n\n".join(blocks)
+            )
+        )
+    return pages
+
+
+def benchmark_chunker(
+    pages: List[ExtractedPage], repeat: int = 3, config: Optional[ChunkConfig] = None
+) -> Dict[str, float]:
+    """Measure chunking throughput on a page stream.
+
+    Args:
+        pages: The pages to chunk.
+        repeat: Runs, the fastest one is reported.
+        config: Chunk configuration (default: the settings).
+
+    Returns:
+        dict: Chunks, tokens, pages per second and chunks per second.
+    """
+    chunker = Chunker(config)
+    best: Tuple[float, int, int] = (float("inf"), 0, 0)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        num_chunks = num_tokens = 0
+        for chunk in chunker.chunk_pages(pages):
+            num_chunks += 1
+            num_tokens += chunk.num_tokens
+        best = min(best, (time.perf_counter() - started, num_chunks, num_tokens))
+    seconds, num_chunks, num_tokens = best
+    seconds = max(seconds, 1e-9)
+    return {
+        "pages": len(pages),
+        "chunks": num_chunks,
+        "tokens": num_tokens,
+        "seconds": seconds,
+        "pages_per_second": len(pages) / seconds,
+        "chunks_per_second": num_chunks / seconds,
+    }
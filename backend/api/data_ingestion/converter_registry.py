@@ -0,0 +1,208 @@
+"""Process-wide registry of warm Docling converters.
+
+Building a ``DocumentConverter`` and loading its layout, table and OCR models
+costs seconds and hundreds of MB, so converters are built once per normalized
+option set and reused. Idle converters are evicted after a timeout by a
+background thread, and the least recently used ones when there are too many
+or the process grows past its memory limit.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+from loguru import logger
+
+from backend.config.settings import _settings
+from backend.utils.resources import get_rss_bytes
+
+ConverterType = TypeVar("ConverterType")
+
+
+@dataclass(frozen=True)
+class ConverterOptions:
+    """Options that determine how a converter is built."""
+
+    is_accelerator: bool = False
+    do_ocr: bool = True
+    force_full_page_ocr: bool = True
+    do_table_structure: bool = True
+    do_cell_matching: bool = True
+    num_threads: int = 4
+    ocr_batch_size: int = 4
+    layout_batch_size: int = 64
+    table_batch_size: int = 4
+    vlm_framework: str = "vllm"
+    vlm_model: Optional[str] = None
+
+    def normalized(self) -> "ConverterOptions":
+        """Reset options that do not affect the built converter.
+
+        Returns:
+            ConverterOptions: Options equal for every equivalent pipeline.
+        """
+        defaults = ConverterOptions()
+        options = self
+        if not options.is_accelerator:
+            # The standard pipeline uses num_threads but does not batch
+            options = replace(
+                options,
+                ocr_batch_size=defaults.ocr_batch_size,
+                layout_batch_size=defaults.layout_batch_size,
+                table_batch_size=defaults.table_batch_size,
+            )
+        if not options.do_ocr:
+            options = replace(
+                options,
+                force_full_page_ocr=False,
+                ocr_batch_size=defaults.ocr_batch_size,
+            )
+        if not options.do_table_structure:
+            options = replace(
+                options,
+                do_cell_matching=False,
+                table_batch_size=defaults.table_batch_size,
+            )
+        if options.vlm_model is None:
+            options = replace(options, vlm_framework=defaults.vlm_framework)
+        return options
+
+
+class ConverterRegistry(Generic[ConverterType]):
+    """LRU of converters keyed by normalized ``ConverterOptions``."""
+
+    def __init__(
+        self,
+        max_converters: int,
+        memory_limit_mb: int,
+        idle_seconds: int,
+    ):
+        self._max_converters = max_converters
+        self._memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self._idle_seconds = idle_seconds
+        # options -> (converter, last used)
+        self._converters: "OrderedDict[ConverterOptions, tuple]" = OrderedDict()
+        self._build_locks: Dict[ConverterOptions, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Process running the idle eviction thread, threads do not survive a fork
+        self._janitor_pid: Optional[int] = None
+
+    def get(
+        self,
+        options: ConverterOptions,
+        build: Callable[[ConverterOptions], ConverterType],
+    ) -> ConverterType:
+        """Return the converter for ``options``, building it on first use.
+
+        Args:
+            options: Converter options, normalized by the registry.
+            build: Factory called with the normalized options on a miss.
+
+        Returns:
+            The shared converter.
+        """
+        options = options.normalized()
+        converter = self._lookup(options)
+        if converter is not None:
+            return converter
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(options, threading.Lock())
+
+        # Only one thread builds a given converter, the others wait for it
+        with build_lock:
+            converter = self._lookup(options)
+            if converter is None:
+                started = time.perf_counter()
+                converter = build(options)
+                logger.info(
+                    f"Built converter in {time.perf_counter() - started:.2f}s "
+                    f"for {options}"
+                )
+                with self._lock:
+                    self._converters[options] = (converter, time.monotonic())
+                self._evict(keep=options)
+                self._start_janitor()
+        return converter
+
+    def _start_janitor(self) -> None:
+        with self._lock:
+            if self._janitor_pid == os.getpid():
+                return
+            self._janitor_pid = os.getpid()
+        threading.Thread(
+            target=self._evict_idle_forever, name="converter-janitor", daemon=True
+        ).start()
+
+    def _evict_idle_forever(self) -> None:
+        interval = max(1.0, min(self._idle_seconds / 2, 60.0))
+        while True:
+            time.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Idle converter eviction failed: {e}")
+
+    def _lookup(self, options: ConverterOptions) -> Optional[ConverterType]:
+        with self._lock:
+            entry = self._converters.get(options)
+            if entry is None:
+                return None
+            self._converters[options] = (entry[0], time.monotonic())
+            self._converters.move_to_end(options)
+            return entry[0]
+
+    def _evict(self, keep: Optional[ConverterOptions] = None) -> None:
+        evicted = 0
+        with self._lock:
+            now = time.monotonic()
+            for options, (_, last_used) in list(self._converters.items()):
+                if options != keep and now - last_used > self._idle_seconds:
+                    del self._converters[options]
+                    evicted += 1
+            while len(self._converters) > self._max_converters:
+                self._pop_oldest(keep)
+                evicted += 1
+        if evicted:
+            gc.collect()
+
+        # Memory pressure: drop the least recently used converters one at a time.
+        # Freed memory is seldom returned to the system, so the RSS may stay
+        # high; the converter in use, or the most recent one, is always kept
+        while get_rss_bytes() > self._memory_limit_bytes:
+            with self._lock:
+                if len(self._converters) <= 1 or not self._pop_oldest(keep):
+                    break
+            gc.collect()
+
+    def _pop_oldest(self, keep: Optional[ConverterOptions]) -> bool:
+        for options in self._converters:
+            if options != keep:
+                del self._converters[options]
+                logger.info(f"Evicted converter for {options}")
+                return True
+        return False
+
+    def evict_idle(self) -> None:
+        """Drop converters unused for longer than the idle timeout."""
+        self._evict()
+
+    def clear(self) -> None:
+        """Drop every converter."""
+        with self._lock:
+            self._converters.clear()
+        gc.collect()
+
+    def __len__(self) -> int:
+        return len(self._converters)
+
+
+converter_registry: ConverterRegistry = ConverterRegistry(
+    max_converters=_settings.extraction.max_converters,
+    memory_limit_mb=_settings.extraction.converter_memory_limit_mb,
+    idle_seconds=_settings.extraction.converter_idle_seconds,
+)
@@ -0,0 +1,511 @@
+"""Near-duplicate chunk detection with MinHash and LSH.
+
+Every chunk gets a MinHash signature of its word shingles: ``num_perm``
+multiply-shift hashes of the shingle hashes, keeping the minimum of each,
+computed for a whole batch of chunks as NumPy array operations. The share of
+equal positions of two signatures estimates the Jaccard similarity of their
+shingle sets.
+
+Signatures are cut into bands, and the hash of each band is stored with the
+point in the ``minhash_bands`` payload field, so the LSH index of a
+collection is the collection itself: chunks sharing a band with a new chunk
+are found with one filtered request, and kept as duplicates when their
+estimated similarity reaches ``threshold``. Chunks repeating an earlier chunk
+of the same document are found in an index kept in memory for the job.
+
+A point repeated by other documents lists them in ``duplicate_documents``,
+and their chunks in ``duplicate_chunks``, so the point can be handed over to
+one of them when its own document loses the chunk.
+
+Documents ingested at the same time do not see each other's chunks, so they
+may both keep a chunk they share.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from backend.api.data_ingestion.embedding import embedding_text
+from backend.api.data_ingestion.indexing import chunk_hash, point_id
+from backend.api.data_ingestion.model import ChunkDuplicate, DocumentChunk
+from backend.config.config import DedupConfig
+from backend.config.settings import _settings
+from backend.databases.qdrant import get_qdrant_client
+
+SIGNATURE_FIELD = "minhash"
+BANDS_FIELD = "minhash_bands"
+DOCUMENTS_FIELD = "duplicate_documents"
+# Chunk fields of the documents repeating a point, to hand it over to them
+DUPLICATES_FIELD = "duplicate_chunks"
+_DUPLICATE_FIELDS = {"index", "page_nos", "bboxes"}
+_WORD_PATTERN = re.compile(r"\w+")
+_SHINGLE_PRIME = np.uint64(1_099_511_628_211)
+_BAND_PRIME = np.uint64(0x9E3779B97F4A7C15)
+# Signature of a text without words
+_NO_WORDS = np.uint32(2**32 - 1)
+# Hashes computed at once, bounds the memory of a batch
+_MAX_HASHES = 1 << 22
+# Weights of the false positive and false negative probabilities when
+# choosing the bands; candidates are verified, missing one costs more
+_FALSE_POSITIVE_WEIGHT = 0.3
+_FALSE_NEGATIVE_WEIGHT = 0.7
+
+
+def lsh_parameters(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Bands and rows per band best separating pairs around a threshold.
+
+    Two chunks of similarity ``s`` share a band with probability
+    ``1 - (1 - s ** rows) ** bands``; the parameters minimize the weighted
+    probabilities of a candidate below, and of a miss above the threshold.
+
+    Returns:
+        tuple: Number of bands, and rows per band.
+    """
+    similarities = np.linspace(0.0, 1.0, 201)
+    below = similarities < threshold
+    best = (float("inf"), 1, num_perm)
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - similarities**rows) ** bands
+            # Proportional to the areas under the curves, the grid is even
+            error = (
+                _FALSE_POSITIVE_WEIGHT * candidate[below].sum()
+                + _FALSE_NEGATIVE_WEIGHT * (1 - candidate[~below]).sum()
+            )
+            best = min(best, (error, bands, rows))
+    return best[1], best[2]
+
+
+class _WordHashes(dict):
+    """Lowercased word -> CRC32, filled on first lookup."""
+
+    def __missing__(self, word: str) -> int:
+        value = zlib.crc32(word.encode())
+        if len(self) < 1_000_000:
+            self[word] = value
+        return value
+
+
+class MinHasher:
+    """Computes MinHash signatures and LSH band keys of texts."""
+
+    def __init__(self, config: Optional[DedupConfig] = None):
+        config = config or _settings.dedup
+        self.num_perm = config.num_perm
+        self.shingle_size = config.shingle_size
+        self.bands, self.rows = lsh_parameters(config.threshold, config.num_perm)
+        rng = np.random.default_rng(config.seed)
+        # Multiply-shift hashing: odd multipliers, the high 32 bits are kept
+        self._multipliers = rng.integers(
+            0, 2**64, size=(self.num_perm, 1), dtype=np.uint64
+        ) | np.uint64(1)
+        self._increments = rng.integers(
+            0, 2**64, size=(self.num_perm, 1), dtype=np.uint64
+        )
+        self._word_hashes = _WordHashes()
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hashes of the runs of ``shingle_size`` words of a text.
+
+        A text shorter than that is one shingle, an empty one has none.
+        """
+        words = np.fromiter(
+            map(self._word_hashes.__getitem__, _WORD_PATTERN.findall(text.lower())),
+            dtype=np.uint64,
+        )
+        size = min(self.shingle_size, len(words))
+        if not size:
+            return words
+        count = len(words) - size + 1
+        hashes = words[:count].copy()
+        for offset in range(1, size):
+            hashes = hashes * _SHINGLE_PRIME + words[offset : offset + count]
+        return hashes
+
+    def signatures(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """MinHash signatures of texts.
+
+        Returns:
+            tuple: (len(texts), num_perm) uint32 signatures, and whether each
+                text has words; the signature of one without is meaningless.
+        """
+        shingles = [self.shingles(text) for text in texts]
+        lengths = np.fromiter(map(len, shingles), dtype=np.int64, count=len(texts))
+        signatures = np.full((len(texts), self.num_perm), _NO_WORDS, dtype=np.uint32)
+        has_words = lengths > 0
+        rows = np.flatnonzero(has_words)
+        per_group = max(1, _MAX_HASHES // self.num_perm)
+        start = 0
+        while start < len(rows):
+            # Texts whose shingles fit in one hash matrix, at least one
+            end = start + 1
+            total = lengths[rows[start]]
+            while end < len(rows) and total + lengths[rows[end]] <= per_group:
+                total += lengths[rows[end]]
+                end += 1
+            group = rows[start:end]
+            values = np.concatenate([shingles[row] for row in group])
+            hashes = (
+                (self._multipliers * values + self._increments) >> np.uint64(32)
+            ).astype(np.uint32)
+            offsets = np.zeros(len(group), dtype=np.int64)
+            np.cumsum(lengths[group][:-1], out=offsets[1:])
+            signatures[group] = np.minimum.reduceat(hashes, offsets, axis=1).T
+            start = end
+        return signatures, has_words
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(len(signatures), bands) int64 hashes of the signature bands."""
+        banded = signatures[:, : self.bands * self.rows].reshape(
+            len(signatures), self.bands, self.rows
+        )
+        keys = np.broadcast_to(
+            np.arange(1, self.bands + 1, dtype=np.uint64) * _BAND_PRIME,
+            (len(signatures), self.bands),
+        ).copy()
+        for row in range(self.rows):
+            keys = (keys ^ banded[:, :, row].astype(np.uint64)) * _SHINGLE_PRIME
+        return keys.view(np.int64)
+
+    def payloads(self, signatures: np.ndarray) -> List[dict]:
+        """Payload fields putting kept chunks in the LSH index of a collection."""
+        keys = self.band_keys(signatures)
+        return [
+            (
+                {}
+                if (signature == _NO_WORDS).all()
+                else {SIGNATURE_FIELD: signature.tolist(), BANDS_FIELD: row.tolist()}
+            )
+            for signature, row in zip(signatures, keys)
+        ]
+
+
+def similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of a signature with each of others."""
+    return (others == signature).mean(axis=-1)
+
+
+class Deduplicator:
+    """Finds the chunks of a document repeating already indexed chunks.
+
+    Feed the chunks of the document in order with ``check``; chunks not
+    reported as duplicates are remembered, and repeated by later ones.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        document_id: str,
+        client: Optional[QdrantClient] = None,
+        config: Optional[DedupConfig] = None,
+    ):
+        self.config = config or _settings.dedup
+        self.collection = collection
+        self.document_id = document_id
+        self.client = client or get_qdrant_client()
+        self.hasher = MinHasher(self.config)
+        self._indexed = self.client.collection_exists(collection)
+        # Band key -> positions in the signatures of the document's chunks
+        self._bands: Dict[int, List[int]] = defaultdict(list)
+        self._signatures: List[np.ndarray] = []
+        self._chunk_indices: List[int] = []
+
+    def _indexed_candidates(self, keys: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Points of other documents sharing a band with any of the keys."""
+        if not self._indexed:
+            return [], np.zeros((0, self.hasher.num_perm), dtype=np.uint32)
+        scroll_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key=BANDS_FIELD,
+                    match=models.MatchAny(any=np.unique(keys).tolist()),
+                )
+            ],
+            must_not=[
+                models.FieldCondition(
+                    key="document_id",
+                    match=models.MatchValue(value=self.document_id),
+                )
+            ],
+        )
+        point_ids: List[str] = []
+        signatures: List[List[int]] = []
+        offset = None
+        while len(point_ids) < self.config.max_candidates:
+            points, offset = self.client.scroll(
+                self.collection,
+                scroll_filter=scroll_filter,
+                limit=min(256, self.config.max_candidates - len(point_ids)),
+                offset=offset,
+                with_payload=[SIGNATURE_FIELD],
+            )
+            for point in points:
+                signature = (point.payload or {}).get(SIGNATURE_FIELD)
+                if signature and len(signature) == self.hasher.num_perm:
+                    point_ids.append(str(point.id))
+                    signatures.append(signature)
+            if offset is None:
+                break
+        return point_ids, np.array(signatures, dtype=np.uint32).reshape(
+            len(signatures), self.hasher.num_perm
+        )
+
+    def _remember(self, signature: np.ndarray, keys: np.ndarray, index: int) -> None:
+        for key in keys:
+            self._bands[int(key)].append(len(self._signatures))
+        self._signatures.append(signature)
+        self._chunk_indices.append(index)
+
+    def remember(self, chunks: List[DocumentChunk]) -> None:
+        """Add indexed chunks of the document, for the chunks checked next."""
+        signatures, has_words = self.hasher.signatures(
+            [embedding_text(chunk) for chunk in chunks]
+        )
+        keys = self.hasher.band_keys(signatures)
+        for row, chunk in enumerate(chunks):
+            if has_words[row]:
+                self._remember(signatures[row], keys[row], chunk.index)
+
+    def check(
+        self, chunks: List[DocumentChunk]
+    ) -> Tuple[np.ndarray, List[Optional[ChunkDuplicate]]]:
+        """Find the duplicates among a batch of chunks.
+
+        Returns:
+            tuple: Signatures of the chunks, and for every chunk what it
+                repeats, or None when it is kept.
+        """
+        signatures, has_words = self.hasher.signatures(
+            [embedding_text(chunk) for chunk in chunks]
+        )
+        keys = self.hasher.band_keys(signatures)
+        point_ids, candidates = self._indexed_candidates(keys[has_words])
+        threshold = self.config.threshold
+
+        duplicates: List[Optional[ChunkDuplicate]] = []
+        for row, chunk in enumerate(chunks):
+            duplicate = None
+            if has_words[row]:
+                signature = signatures[row]
+                best, best_index = 0.0, None
+                if len(point_ids):
+                    scores = similarity(signature, candidates)
+                    best_index = int(scores.argmax())
+                    best = float(scores[best_index])
+                if best >= threshold:
+                    duplicate = ChunkDuplicate(
+                        index=chunk.index,
+                        num_tokens=chunk.num_tokens,
+                        similarity=best,
+                        point_id=point_ids[best_index],
+                    )
+                else:
+                    positions = sorted(
+                        set(
+                            chain.from_iterable(
+                                self._bands.get(k, ()) for k in keys[row]
+                            )
+                        )
+                    )
+                    if positions:
+                        scores = similarity(
+                            signature,
+                            np.stack([self._signatures[p] for p in positions]),
+                        )
+                        position = int(scores.argmax())
+                        if scores[position] >= threshold:
+                            duplicate = ChunkDuplicate(
+                                index=chunk.index,
+                                num_tokens=chunk.num_tokens,
+                                similarity=float(scores[position]),
+                                chunk_index=self._chunk_indices[positions[position]],
+                            )
+                if duplicate is None:
+                    self._remember(signature, keys[row], chunk.index)
+            duplicates.append(duplicate)
+        return signatures, duplicates
+
+
+def _set_duplicates(
+    point, entries: List[dict], documents: List[str]
+) -> models.SetPayloadOperation:
+    return models.SetPayloadOperation(
+        set_payload=models.SetPayload(
+            payload={DOCUMENTS_FIELD: documents, DUPLICATES_FIELD: entries},
+            points=[point],
+        )
+    )
+
+
+def record_duplicates(
+    client: QdrantClient,
+    collection: str,
+    document_id: str,
+    duplicates: Dict[str, DocumentChunk],
+) -> None:
+    """Add a document to the points it repeats.
+
+    Args:
+        client: The Qdrant client.
+        collection: The collection of the points.
+        document_id: The document left without its own points for the chunks.
+        duplicates: Point id -> the chunk of the document repeating it.
+    """
+    point_ids = sorted(duplicates)
+    for start in range(0, len(point_ids), 100):
+        points = client.retrieve(
+            collection,
+            point_ids[start : start + 100],
+            with_payload=[DOCUMENTS_FIELD, DUPLICATES_FIELD],
+        )
+        operations = []
+        for point in points:
+            payload = point.payload or {}
+            chunk = duplicates[str(point.id)]
+            entry = {
+                "document_id": document_id,
+                "chunk_hash": chunk_hash(chunk),
+                **chunk.model_dump(mode="json", include=_DUPLICATE_FIELDS),
+            }
+            # Replaced, its position may have changed since it was recorded
+            entries = [
+                other
+                for other in payload.get(DUPLICATES_FIELD) or []
+                if other["document_id"] != document_id
+            ] + [entry]
+            documents = [
+                other
+                for other in payload.get(DOCUMENTS_FIELD) or []
+                if other != document_id
+            ] + [document_id]
+            operations.append(_set_duplicates(point.id, entries, documents))
+        if operations:
+            client.batch_update_points(collection, operations)
+
+
+def forget_duplicates(
+    client: QdrantClient, collection: str, document_id: str, digests: List[str]
+) -> None:
+    """Remove chunks of a document from the points they repeat.
+
+    Args:
+        client: The Qdrant client.
+        collection: The collection of the points.
+        document_id: The document the chunks were part of.
+        digests: Hashes of the chunks, see ``chunk_hash``.
+    """
+    digests = set(digests)
+    if not digests or not client.collection_exists(collection):
+        return
+    scroll_filter = models.Filter(
+        must=[
+            models.FieldCondition(
+                key=DOCUMENTS_FIELD, match=models.MatchValue(value=document_id)
+            )
+        ]
+    )
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection,
+            scroll_filter=scroll_filter,
+            limit=100,
+            offset=offset,
+            with_payload=[DOCUMENTS_FIELD, DUPLICATES_FIELD],
+        )
+        operations = []
+        for point in points:
+            payload = point.payload or {}
+            entries = payload.get(DUPLICATES_FIELD) or []
+            kept = [
+                entry
+                for entry in entries
+                if entry["document_id"] != document_id
+                or entry["chunk_hash"] not in digests
+            ]
+            if len(kept) == len(entries):
+                continue
+            documents = payload.get(DOCUMENTS_FIELD) or []
+            if not any(entry["document_id"] == document_id for entry in kept):
+                documents = [other for other in documents if other != document_id]
+            operations.append(_set_duplicates(point.id, kept, documents))
+        if operations:
+            client.batch_update_points(collection, operations)
+        if offset is None:
+            break
+
+
+def hand_over_duplicates(
+    client: QdrantClient, collection: str, point_ids: List[str]
+) -> List[str]:
+    """Copy points about to be deleted over to a document repeating them.
+
+    The first document repeating a point, and without a point of its own for
+    the chunk, becomes the owner of the copy, under the id of its chunk and
+    with the position of that chunk. The text and the vectors stay those of
+    the point, which its chunk repeats. The other documents keep repeating
+    the copy.
+
+    Args:
+        client: The Qdrant client.
+        collection: The collection of the points.
+        point_ids: Points of a document losing their chunks.
+
+    Returns:
+        List[str]: The points handed over.
+    """
+    handed_over: List[str] = []
+    for start in range(0, len(point_ids), 100):
+        points = [
+            point
+            for point in client.retrieve(
+                collection,
+                point_ids[start : start + 100],
+                with_payload=True,
+                with_vectors=True,
+            )
+            if (point.payload or {}).get(DUPLICATES_FIELD)
+        ]
+        entries_of = {
+            point_id(entry["document_id"], entry["chunk_hash"]): entry
+            for point in points
+            for entry in point.payload[DUPLICATES_FIELD]
+        }
+        # Documents that indexed their chunk in the meantime need no copy
+        indexed = {
+            str(point.id)
+            for point in client.retrieve(
+                collection, list(entries_of), with_payload=False
+            )
+        }
+        copies = []
+        for point in points:
+            entries = [
+                entry
+                for entry in point.payload[DUPLICATES_FIELD]
+                if point_id(entry["document_id"], entry["chunk_hash"]) not in indexed
+            ]
+            if not entries:
+                continue
+            entry, *others = entries
+            copies.append(
+                models.PointStruct(
+                    id=point_id(entry["document_id"], entry["chunk_hash"]),
+                    vector=point.vector,
+                    payload={
+                        **point.payload,
+                        **entry,
+                        DOCUMENTS_FIELD: [other["document_id"] for other in others],
+                        DUPLICATES_FIELD: others,
+                    },
+                )
+            )
+            handed_over.append(str(point.id))
+        if copies:
+            client.upsert(collection, points=copies, wait=True)
+    return handed_over
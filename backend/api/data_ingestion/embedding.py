@@ -0,0 +1,536 @@
+"""Dense and sparse embeddings of document chunks.
+
+Chunks are packed into batches of at most ``batch_max_tokens`` tokens and
+``batch_max_size`` inputs, the limits embedding providers put on a request.
+Every batch goes to the dense and the sparse encoder at the same time, and
+at most ``max_in_flight`` batches are embedded while the next ones are
+packed, so a slow provider slows the stream down instead of growing a
+backlog in memory.
+
+Vectors stay NumPy arrays from the response to the index: dense vectors are
+requested as base64 float32 and decoded with ``np.frombuffer``, sparse
+vectors are kept in CSR arrays. Encoders are chosen by name in
+``EmbeddingModelConfig``; the BM25 encoder (see ``bm25``) runs locally, and
+the hashing encoders are deterministic, need no model or network, and stand
+in for the real ones offline.
+
+All requests run on one event loop thread owned by the embedder, so the
+connection pool is shared by the batches and outlives a single document.
+"""
+
+import asyncio
+import atexit
+import base64
+import hashlib
+import math
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from loguru import logger
+
+from backend.api.data_ingestion.bm25 import Bm25Model, Bm25Statistics
+from backend.api.data_ingestion.model import DocumentChunk
+from backend.config.settings import _settings
+
+# Status codes worth retrying, the provider is throttling or restarting
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class SparseVectors:
+    """Sparse vectors in CSR form: row ``i`` is ``indptr[i]:indptr[i + 1]``."""
+
+    indptr: np.ndarray  # int64, one more than the rows
+    indices: np.ndarray  # uint32
+    values: np.ndarray  # float32
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, i: int) -> tuple:
+        """Indices and values of a row, as views."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "SparseVectors":
+        rows = list(rows)
+        lengths = [len(indices) for indices, _ in rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if not rows:
+            return cls(indptr, np.zeros(0, np.uint32), np.zeros(0, np.float32))
+        return cls(
+            indptr,
+            np.concatenate([indices for indices, _ in rows]).astype(np.uint32),
+            np.concatenate([values for _, values in rows]).astype(np.float32),
+        )
+
+    def save(self, path: Path) -> None:
+        np.savez(path, indptr=self.indptr, indices=self.indices, values=self.values)
+
+    @classmethod
+    def load(cls, path: Path) -> "SparseVectors":
+        with np.load(path) as arrays:
+            return cls(arrays["indptr"], arrays["indices"], arrays["values"])
+
+    @classmethod
+    def concatenate(cls, parts: List["SparseVectors"]) -> "SparseVectors":
+        offsets = np.cumsum([0] + [len(part.indices) for part in parts[:-1]])
+        return cls(
+            np.concatenate(
+                [np.zeros(1, np.int64)]
+                + [part.indptr[1:] + offset for part, offset in zip(parts, offsets)]
+            ),
+            np.concatenate([np.zeros(0, np.uint32)] + [p.indices for p in parts]),
+            np.concatenate([np.zeros(0, np.float32)] + [p.values for p in parts]),
+        )
+
+
+@dataclass
+class EmbeddedBatch:
+    chunks: List[DocumentChunk]
+    # (len(chunks), dimension) float32
+    dense: np.ndarray
+    sparse: Optional[SparseVectors] = None
+
+
+class DenseEncoder(ABC):
+    """Encodes texts into dense vectors of a fixed dimension."""
+
+    dimension: int
+
+    @abstractmethod
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a (len(texts), dimension) float32 array."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class SparseEncoder(ABC):
+    """Encodes texts into sparse vectors.
+
+    Encoders keeping corpus statistics, such as BM25, are told which texts
+    are indexed and removed, and persist the statistics on ``save``.
+    """
+
+    # Whether the index weights the terms by inverse document frequency,
+    # False when the encoder puts the weights in the query vectors
+    server_idf: bool = True
+
+    @abstractmethod
+    async def encode(self, texts: List[str]) -> SparseVectors:
+        """Encode texts into one sparse vector per text."""
+
+    async def encode_queries(self, texts: List[str]) -> SparseVectors:
+        """Encode search queries, by default like documents."""
+        return await self.encode(texts)
+
+    def add_documents(self, texts: List[str]) -> None:
+        """Count texts written to the index into the corpus statistics."""
+
+    def remove_documents(self, texts: List[str]) -> None:
+        """Count texts removed from the index out of the corpus statistics."""
+
+    def save(self) -> None:
+        """Persist the corpus statistics."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class AzureOpenAIDenseEncoder(DenseEncoder):
+    """Embeddings deployment of Azure OpenAI, decoded from base64 float32."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_key: str,
+        api_version: str,
+        deployment: str,
+        dimension: int,
+        concurrency: int,
+        timeout_seconds: int,
+        max_retries: int,
+    ):
+        self.dimension = dimension
+        self._url = (
+            f"{(endpoint or '').rstrip('/')}/openai/deployments/{deployment}"
+            f"/embeddings?api-version={api_version}"
+        )
+        self._api_key = api_key
+        self._concurrency = concurrency
+        self._timeout_seconds = timeout_seconds
+        self._max_retries = max_retries
+        # Created on the event loop thread, used only there
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"api-key": self._api_key or ""},
+                timeout=self._timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self._concurrency,
+                    max_keepalive_connections=self._concurrency,
+                ),
+            )
+        return self._client
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        payload = {
+            "input": texts,
+            "encoding_format": "base64",
+            "dimensions": self.dimension,
+        }
+        client = self._get_client()
+        for attempt in range(self._max_retries + 1):
+            try:
+                response = await client.post(self._url, json=payload)
+                if (
+                    response.status_code not in _RETRY_STATUS_CODES
+                    or attempt == self._max_retries
+                ):
+                    response.raise_for_status()
+                    data = sorted(response.json()["data"], key=lambda d: d["index"])
+                    buffer = b"".join(base64.b64decode(d["embedding"]) for d in data)
+                    return np.frombuffer(buffer, dtype="<f4").reshape(
+                        len(texts), self.dimension
+                    )
+                retry_after = response.headers.get("retry-after")
+                delay = float(retry_after) if retry_after else 2**attempt
+            except httpx.TransportError:
+                if attempt == self._max_retries:
+                    raise
+                delay = 2**attempt
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _hashed_terms(text: str) -> Counter:
+    """Count the words of a text by a stable 64-bit hash."""
+    return Counter(
+        int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        for word in _WORD_PATTERN.findall(text.lower())
+    )
+
+
+class HashingDenseEncoder(DenseEncoder):
+    """Signed feature hashing of words, L2-normalized. Deterministic, offline."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = _hashed_terms(text)
+            if not terms:
+                continue
+            hashes = np.fromiter(terms.keys(), dtype=np.uint64, count=len(terms))
+            counts = np.fromiter(terms.values(), dtype=np.float32, count=len(terms))
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(
+                vectors[row],
+                (hashes % np.uint64(self.dimension)).astype(np.int64),
+                signs * counts,
+            )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._encode, texts)
+
+
+class HashingSparseEncoder(SparseEncoder):
+    """Log-scaled counts of hashed words. Deterministic, offline."""
+
+    def _encode(self, texts: List[str]) -> SparseVectors:
+        rows = []
+        for text in texts:
+            terms: Dict[int, int] = {}
+            for term, count in _hashed_terms(text).items():
+                index = term & 0xFFFFFFFF
+                terms[index] = terms.get(index, 0) + count
+            rows.append(
+                (
+                    np.fromiter(terms.keys(), dtype=np.uint32, count=len(terms)),
+                    np.fromiter(
+                        (1.0 + math.log(count) for count in terms.values()),
+                        dtype=np.float32,
+                        count=len(terms),
+                    ),
+                )
+            )
+        return SparseVectors.from_rows(rows)
+
+    async def encode(self, texts: List[str]) -> SparseVectors:
+        return await asyncio.to_thread(self._encode, texts)
+
+
+class FastEmbedSparseEncoder(SparseEncoder):
+    """Sparse model of fastembed, such as ``Qdrant/bm25``, run locally."""
+
+    def __init__(self, model_name: str):
+        self._model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str], query: bool = False) -> SparseVectors:
+        with self._lock:
+            if self._model is None:
+                from fastembed import SparseTextEmbedding
+
+                self._model = SparseTextEmbedding(self._model_name)
+            if query:
+                embeddings = list(self._model.query_embed(texts))
+            else:
+                embeddings = list(self._model.embed(texts, batch_size=len(texts)))
+        return SparseVectors.from_rows(
+            (embedding.indices, embedding.values) for embedding in embeddings
+        )
+
+    async def encode(self, texts: List[str]) -> SparseVectors:
+        return await asyncio.to_thread(self._encode, texts)
+
+    async def encode_queries(self, texts: List[str]) -> SparseVectors:
+        return await asyncio.to_thread(self._encode, texts, True)
+
+
+class Bm25SparseEncoder(SparseEncoder):
+    """BM25 weights computed locally, with corpus statistics on disk."""
+
+    # Queries carry the inverse document frequencies
+    server_idf = False
+
+    def __init__(self, model: Bm25Model):
+        self.model = model
+
+    async def encode(self, texts: List[str]) -> SparseVectors:
+        return SparseVectors(
+            *await asyncio.to_thread(self.model.document_weights, texts)
+        )
+
+    async def encode_queries(self, texts: List[str]) -> SparseVectors:
+        return SparseVectors(*await asyncio.to_thread(self.model.query_weights, texts))
+
+    def add_documents(self, texts: List[str]) -> None:
+        self.model.count_documents(texts)
+
+    def remove_documents(self, texts: List[str]) -> None:
+        self.model.count_documents(texts, -1)
+
+    def save(self) -> None:
+        self.model.statistics.save()
+
+
+def _azure_openai_dense_encoder() -> DenseEncoder:
+    config = _settings.embedding_model
+    azure = _settings.azure_chat_openai
+    return AzureOpenAIDenseEncoder(
+        endpoint=azure.api_endpoint,
+        api_key=azure.api_key,
+        api_version=config.api_version,
+        deployment=config.dense_model,
+        dimension=config.dense_embedding_size,
+        concurrency=config.max_in_flight,
+        timeout_seconds=config.timeout_seconds,
+        max_retries=config.max_retries,
+    )
+
+
+def _bm25_sparse_encoder() -> SparseEncoder:
+    config = _settings.embedding_model
+    return Bm25SparseEncoder(
+        Bm25Model(
+            Bm25Statistics(Path(config.bm25_statistics_path)),
+            k1=config.bm25_k1,
+            b=config.bm25_b,
+            avg_length=config.bm25_avg_length,
+        )
+    )
+
+
+DENSE_ENCODERS: Dict[str, Callable[[], DenseEncoder]] = {
+    "azure_openai": _azure_openai_dense_encoder,
+    "hashing": lambda: HashingDenseEncoder(
+        _settings.embedding_model.dense_embedding_size
+    ),
+}
+SPARSE_ENCODERS: Dict[str, Callable[[], Optional[SparseEncoder]]] = {
+    "bm25": _bm25_sparse_encoder,
+    "fastembed": lambda: FastEmbedSparseEncoder(_settings.embedding_model.sparse_model),
+    "hashing": HashingSparseEncoder,
+    "none": lambda: None,
+}
+
+
+def embedding_text(chunk: DocumentChunk) -> str:
+    """Text embedded for a chunk: its header path, then its content."""
+    if not chunk.headings:
+        return chunk.text
+    return " > ".join(chunk.headings.values()) + "\n\n" + chunk.text
+
+
+def batch_chunks(
+    chunks: Iterable[DocumentChunk], max_tokens: int, max_size: int
+) -> Iterator[List[DocumentChunk]]:
+    """Pack chunks, in order, into batches within a token and a size budget.
+
+    A chunk larger than the token budget is sent in a batch of its own.
+    """
+    batch: List[DocumentChunk] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        if batch and (
+            batch_tokens + chunk.num_tokens > max_tokens or len(batch) == max_size
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += chunk.num_tokens
+    if batch:
+        yield batch
+
+
+class Embedder:
+    """Embeds chunk streams with a dense and an optional sparse encoder."""
+
+    def __init__(
+        self,
+        dense_encoder: DenseEncoder,
+        sparse_encoder: Optional[SparseEncoder],
+        batch_max_tokens: int,
+        batch_max_size: int,
+        max_in_flight: int,
+    ):
+        self.dense_encoder = dense_encoder
+        self.sparse_encoder = sparse_encoder
+        self._batch_max_tokens = batch_max_tokens
+        self._batch_max_size = batch_max_size
+        self._max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="embedder", daemon=True
+                ).start()
+            return self._loop
+
+    async def _embed_batch(self, chunks: List[DocumentChunk]) -> EmbeddedBatch:
+        dense, sparse = await self._encode([embedding_text(chunk) for chunk in chunks])
+        return EmbeddedBatch(chunks, dense, sparse)
+
+    async def _encode(self, texts: List[str], queries: bool = False) -> tuple:
+        if self.sparse_encoder is None:
+            return await self.dense_encoder.encode(texts), None
+        encode_sparse = (
+            self.sparse_encoder.encode_queries
+            if queries
+            else self.sparse_encoder.encode
+        )
+        return tuple(
+            await asyncio.gather(self.dense_encoder.encode(texts), encode_sparse(texts))
+        )
+
+    def encode_queries(
+        self, texts: List[str], timeout: Optional[float] = None
+    ) -> Tuple[np.ndarray, Optional[SparseVectors]]:
+        """Encode search queries with both encoders.
+
+        Args:
+            texts: The queries.
+            timeout: Seconds to wait for the encoders.
+
+        Returns:
+            tuple: The dense vectors, and the sparse vectors or None.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._encode(texts, queries=True), self._get_loop()
+        )
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def embed(self, chunks: Iterable[DocumentChunk]) -> Iterator[EmbeddedBatch]:
+        """Embed chunks, yielding batches in chunk order.
+
+        Args:
+            chunks: The chunks, consumed as batches are sent.
+
+        Returns:
+            Iterator[EmbeddedBatch]: The embedded batches.
+        """
+        loop = self._get_loop()
+        in_flight: Deque[Future] = deque()
+        try:
+            for batch in batch_chunks(
+                chunks, self._batch_max_tokens, self._batch_max_size
+            ):
+                if len(in_flight) == self._max_in_flight:
+                    yield in_flight.popleft().result()
+                in_flight.append(
+                    asyncio.run_coroutine_threadsafe(self._embed_batch(batch), loop)
+                )
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def close(self) -> None:
+        """Close the encoders and stop the event loop thread."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        for encoder in (self.dense_encoder, self.sparse_encoder):
+            if encoder is None:
+                continue
+            try:
+                asyncio.run_coroutine_threadsafe(encoder.aclose(), loop).result()
+            except Exception as e:
+                logger.warning(f"Failed to close {type(encoder).__name__}: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def create_embedder() -> Embedder:
+    """Build the embedder configured in ``EmbeddingModelConfig``."""
+    config = _settings.embedding_model
+    return Embedder(
+        dense_encoder=DENSE_ENCODERS[config.dense_encoder](),
+        sparse_encoder=SPARSE_ENCODERS[config.sparse_encoder](),
+        batch_max_tokens=config.batch_max_tokens,
+        batch_max_size=config.batch_max_size,
+        max_in_flight=config.max_in_flight,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embedder() -> Embedder:
+    """Get the configured embedder, building it on first use."""
+    embedder = create_embedder()
+    atexit.register(embedder.close)
+    return embedder
@@ -1,21 +1,82 @@
+import hashlib
+import math
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import fields, replace
 from pathlib import Path
-from typing import List, Literal
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+)
 
+import pypdfium2 as pdfium
 import torch
 from docling.datamodel.accelerator_options import AcceleratorOptions
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import (
     PdfPipelineOptions,
-    PictureDescriptionApiOptions,
     TableStructureOptions,
     TesseractCliOcrOptions,
     ThreadedPdfPipelineOptions,
 )
-from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.settings import DEFAULT_PAGE_RANGE
+from docling.document_converter import (
+    DocumentConverter,
+    ExcelFormatOption,
+    FormatOption,
+    ImageFormatOption,
+    PdfFormatOption,
+    PowerpointFormatOption,
+    WordFormatOption,
+)
 from docling.pipeline.threaded_standard_pdf_pipeline import ThreadedStandardPdfPipeline
+from docling_core.types.doc import DoclingDocument
+from loguru import logger
+
+from backend.api.data_ingestion.converter_registry import (
+    ConverterOptions,
+    converter_registry,
+)
+from backend.api.data_ingestion.extraction_cache import (
+    ExtractionCache,
+    get_extraction_cache,
+)
+from backend.api.data_ingestion.model import (
+    DocumentType,
+    ExtractedPage,
+    ExtractedPicture,
+    ExtractionResult,
+    MemoryStats,
+    OcrStats,
+    PictureDescriptionStats,
+)
+from backend.api.data_ingestion.office import convert_legacy_office
+from backend.api.data_ingestion.picture_description import (
+    VlmEndpoint,
+    picture_describer,
+)
+from backend.api.data_ingestion.text_layer import analyze_text_layer
+from backend.api.data_ingestion.tuning import get_accelerator_profile
+from backend.config.settings import _settings
+from backend.utils.resources import (
+    get_available_memory_bytes,
+    get_cpu_count,
+    get_peak_rss_bytes,
+    get_rss_bytes,
+    release_memory,
+    reset_peak_rss,
+)
 
-from backend.api.data_ingestion.model import DocumentSuffix, DocumentType
-from backend.exceptions.model import NotImplementedException
+CONVERTER_OPTION_NAMES = {option.name for option in fields(ConverterOptions)}
 
 
 class DoclingExtractionService:
@@ -29,47 +90,23 @@ class DoclingExtractionService:
         Returns:
             DocumentType: The document type.
         """
-        if doc_path.suffix.lower() in DocumentSuffix.PDF.value:
-            return DocumentType.PDF
-        elif doc_path.suffix.lower() in DocumentSuffix.DOCX.value:
-            return DocumentType.DOCX
-        elif doc_path.suffix.lower() in DocumentSuffix.DOC.value:
-            return DocumentType.DOC
-        elif doc_path.suffix.lower() in DocumentSuffix.EXCEL.value:
-            return DocumentType.EXCEL
-        elif doc_path.suffix.lower() in DocumentSuffix.POWERPOINT.value:
-            return DocumentType.POWERPOINT
-        elif doc_path.suffix.lower() in DocumentSuffix.IMAGE.value:
-            return DocumentType.IMAGE
-        elif doc_path.suffix.lower() in DocumentSuffix.AUDIO.value:
-            return DocumentType.AUDIO
-        elif doc_path.suffix.lower() in DocumentSuffix.VIDEO.value:
-            return DocumentType.VIDEO
-        else:
-            raise NotImplementedException(
-                f"Unsupported document type: {doc_path.suffix.lower()}"
-            )
+        return DocumentType.from_path(doc_path)
 
-    def _preprocess_document(self, doc_path: Path) -> Path:
+    def _preprocess_document(self, doc_path: Path, output_folder: Path) -> Path:
         """
         Preprocess the document to make it compatible with Docling.
+        DOCX, XLSX, PPTX, images and PDFs are read as they are. Legacy
+        DOC, XLS and PPT documents are converted to DOCX, XLSX and PPTX by a
+        pooled LibreOffice server, so they are parsed natively as well.
         Args:
             doc_path: Path to the document.
+            output_folder: Path to the folder receiving converted documents.
         Returns:
             Path: The path to the preprocessed document.
         """
-        document_type = self._get_document_type(doc_path)
-        if document_type in [
-            DocumentType.DOCX,
-            DocumentType.DOC,
-            DocumentType.EXCEL,
-            DocumentType.POWERPOINT,
-            DocumentType.IMAGE,
-        ]:
-            # TODO: Implement conversion to PDF
-            return doc_path
-        else:
-            return doc_path
+        self._get_document_type(doc_path)
+        converted_path = convert_legacy_office(doc_path, output_folder / "converted")
+        return converted_path or doc_path
 
     def _get_device_type(self) -> str:
         """
@@ -89,72 +126,59 @@ class DoclingExtractionService:
         self,
         model: str,
         seed: int = 42,
-        timeout: int = 120,
         max_completion_tokens: int = 512,
         host: str = "localhost",
         port: int = 8000,
         prompt: str = "Describe the image in three sentences. Be consise and accurate.",
-    ) -> PictureDescriptionApiOptions:
+    ) -> VlmEndpoint:
         """
-        Get the picture annotation with VLM using VLLM.
+        Get the picture annotation endpoint of a VLM served by VLLM.
         Args:
             model: The model to use.
             seed: The seed to use.
-            timeout: The timeout to use.
             max_completion_tokens: The maximum completion tokens to use.
             host: The host to use.
             port: The port to use.
             prompt: The prompt to use.
         Returns:
-            option: DoclingOption: The Docling option.
+            VlmEndpoint: The chat completions endpoint.
         """
-
-        options = PictureDescriptionApiOptions(
+        return VlmEndpoint(
             url=f"http://{host}:{port}/v1/chat/completions",
-            params=dict(
-                model=model,
-                seed=seed,
-                max_completion_tokens=max_completion_tokens,
-            ),
+            model=model,
             prompt=prompt,
-            timeout=timeout,
+            seed=seed,
+            max_completion_tokens=max_completion_tokens,
         )
-        return options
 
     def _get_lms_picture_annotation_with_vlm(
         self,
         model: str,
         seed: int = 42,
-        timeout: int = 120,
         max_completion_tokens: int = 512,
         host: str = "localhost",
         port: int = 1234,
         prompt: str = "Describe the image in three sentences. Be consise and accurate.",
-    ) -> PictureDescriptionApiOptions:
+    ) -> VlmEndpoint:
         """
-        Get the picture annotation with VLM using LMS.
+        Get the picture annotation endpoint of a VLM served by LMS.
         Args:
             model: The model to use.
             seed: The seed to use.
-            timeout: The timeout to use.
             max_completion_tokens: The maximum completion tokens to use.
             host: The host to use.
             port: The port to use.
             prompt: The prompt to use.
         Returns:
-            option: DoclingOption: The Docling option.
+            VlmEndpoint: The chat completions endpoint.
         """
-        options = PictureDescriptionApiOptions(
+        return VlmEndpoint(
             url=f"http://{host}:{port}/v1/chat/completions",
-            params=dict(
-                model=model,
-                seed=seed,
-                max_completion_tokens=max_completion_tokens,
-            ),
+            model=model,
             prompt=prompt,
-            timeout=timeout,
+            seed=seed,
+            max_completion_tokens=max_completion_tokens,
         )
-        return options
 
     def _get_accelerator_config(
         self,
@@ -174,12 +198,39 @@ class DoclingExtractionService:
             device=device_type,
         )
 
+    def _get_format_options(
+        self,
+        pipeline_options: PdfPipelineOptions,
+        pipeline_cls: Optional[Type] = None,
+    ) -> Dict[InputFormat, FormatOption]:
+        """
+        Get the format options of every supported input format.
+        PDFs and images go through the PDF pipeline, Office documents through
+        Docling's native backends, which read the document XML directly.
+        Args:
+            pipeline_options: The PDF pipeline options.
+            pipeline_cls: The PDF pipeline class (default: the standard pipeline).
+        Returns:
+            Dict[InputFormat, FormatOption]: The format options.
+        """
+        pdf_pipeline = {"pipeline_options": pipeline_options}
+        if pipeline_cls is not None:
+            pdf_pipeline["pipeline_cls"] = pipeline_cls
+        return {
+            InputFormat.PDF: PdfFormatOption(**pdf_pipeline),
+            InputFormat.IMAGE: ImageFormatOption(**pdf_pipeline),
+            InputFormat.DOCX: WordFormatOption(),
+            InputFormat.XLSX: ExcelFormatOption(),
+            InputFormat.PPTX: PowerpointFormatOption(),
+        }
+
     def _get_standard_converter(
         self,
         do_ocr: bool = True,
         force_full_page_ocr: bool = True,
         do_table_structure: bool = True,
         do_cell_matching: bool = True,
+        num_threads: int = 4,
         vlm_framework: Literal["vllm", "lms"] = "vllm",
         vlm_model: str = None,
     ) -> DocumentConverter:
@@ -190,6 +241,7 @@ class DoclingExtractionService:
             force_full_page_ocr: Whether to force full page OCR.
             do_table_structure: Whether to do table structure.
             do_cell_matching: Whether to do cell matching.
+            num_threads: The number of threads to use.
             vlm_framework: The framework to use for picture description.
             vlm_model: The model to use for picture description.
         Returns:
@@ -197,7 +249,9 @@ class DoclingExtractionService:
         """
 
         ocr_options = TesseractCliOcrOptions(lang=["auto"])
+        accelerator_config = self._get_accelerator_config(num_threads=num_threads)
         pipeline_options = PdfPipelineOptions(
+            accelerator_options=accelerator_config,
             do_ocr=do_ocr,
             force_full_page_ocr=force_full_page_ocr,
             ocr_options=ocr_options,
@@ -207,25 +261,16 @@ class DoclingExtractionService:
             ),
         )
 
+        _bound_pipeline_queues(pipeline_options)
         if vlm_model is not None:
-            if vlm_framework == "vllm":
-                picture_description_options = (
-                    self._get_vllm_picture_annotation_with_vlm(vlm_model)
-                )
-            elif vlm_framework == "lms":
-                picture_description_options = self._get_lms_picture_annotation_with_vlm(
-                    vlm_model
-                )
-
-            # Set the picture description options
-            pipeline_options.picture_description_options = picture_description_options
+            # Pictures are described after conversion, see _describe_pictures
+            pipeline_options.generate_picture_images = True
+            pipeline_options.images_scale = _settings.extraction.picture_images_scale
 
+        format_options = self._get_format_options(pipeline_options)
         converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_options=pipeline_options,
-                )
-            }
+            allowed_formats=list(format_options),
+            format_options=format_options,
         )
         return converter
 
@@ -276,44 +321,161 @@ class DoclingExtractionService:
             ocr_options=ocr_options,
         )
 
+        _bound_pipeline_queues(pipeline_options)
         if vlm_model is not None:
-            if vlm_framework == "vllm":
-                picture_description_options = (
-                    self._get_vllm_picture_annotation_with_vlm(vlm_model)
-                )
-            elif vlm_framework == "lms":
-                picture_description_options = self._get_lms_picture_annotation_with_vlm(
-                    vlm_model
-                )
-
-            # Set the picture description options
-            pipeline_options.picture_description_options = picture_description_options
+            # Pictures are described after conversion, see _describe_pictures
+            pipeline_options.generate_picture_images = True
+            pipeline_options.images_scale = _settings.extraction.picture_images_scale
 
+        format_options = self._get_format_options(
+            pipeline_options, pipeline_cls=ThreadedStandardPdfPipeline
+        )
         converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_cls=ThreadedStandardPdfPipeline,
-                    pipeline_options=pipeline_options,
-                )
-            }
+            allowed_formats=list(format_options),
+            format_options=format_options,
         )
         return converter
 
+    def _build_converter(self, options: ConverterOptions) -> DocumentConverter:
+        """
+        Build a new converter for the given options.
+        Args:
+            options: The converter options.
+        Returns:
+            DocumentConverter: The converter.
+        """
+        if options.is_accelerator:
+            return self._get_accelerator_converter(
+                do_ocr=options.do_ocr,
+                force_full_page_ocr=options.force_full_page_ocr,
+                do_table_structure=options.do_table_structure,
+                do_cell_matching=options.do_cell_matching,
+                num_threads=options.num_threads,
+                ocr_batch_size=options.ocr_batch_size,
+                layout_batch_size=options.layout_batch_size,
+                table_batch_size=options.table_batch_size,
+                vlm_framework=options.vlm_framework,
+                vlm_model=options.vlm_model,
+            )
+        return self._get_standard_converter(
+            do_ocr=options.do_ocr,
+            force_full_page_ocr=options.force_full_page_ocr,
+            do_table_structure=options.do_table_structure,
+            do_cell_matching=options.do_cell_matching,
+            num_threads=options.num_threads,
+            vlm_framework=options.vlm_framework,
+            vlm_model=options.vlm_model,
+        )
+
+    def get_converter(self, options: ConverterOptions) -> DocumentConverter:
+        """
+        Get a warm converter from the process-wide registry.
+        Args:
+            options: The converter options.
+        Returns:
+            DocumentConverter: The shared converter.
+        """
+        return converter_registry.get(options, self._build_converter)
+
+    def warm_up(self, options: ConverterOptions = ConverterOptions()) -> None:
+        """
+        Build a converter and load its models ahead of the first document.
+        Args:
+            options: The converter options to warm up.
+        """
+        converter = self.get_converter(options)
+        converter.initialize_pipeline(InputFormat.PDF)
+
+    def _get_cache(self, output_folder: Path) -> Optional[ExtractionCache]:
+        """
+        Get the extraction cache used for an output folder.
+        Args:
+            output_folder: Path to the output folder.
+        Returns:
+            Optional[ExtractionCache]: The cache, or None when caching is disabled.
+        """
+        if not _settings.extraction.cache_enabled:
+            return None
+        return get_extraction_cache(
+            Path(_settings.extraction.cache_dir or output_folder / "cache")
+        )
+
+    def _get_cache_entry(
+        self, doc_path: Path, output_folder: Path, extract_kwargs: dict
+    ) -> Tuple[Optional[ExtractionCache], Optional[str]]:
+        """
+        Get the cache and key of a whole-document extraction.
+        Pops ``use_cache`` from ``extract_kwargs``.
+        Args:
+            doc_path: Path to the document.
+            output_folder: Path to the output folder.
+            extract_kwargs: Options passed to ``_extract_document``.
+        Returns:
+            tuple: The cache and key, or (None, None) when not caching.
+        """
+        cache = None
+        if extract_kwargs.pop("use_cache", True):
+            cache = self._get_cache(output_folder)
+        if cache is None:
+            return None, None
+
+        options = ConverterOptions(
+            **{
+                name: value
+                for name, value in extract_kwargs.items()
+                if name in CONVERTER_OPTION_NAMES
+            }
+        )
+        adaptive_ocr = extract_kwargs.get("adaptive_ocr")
+        if adaptive_ocr is None:
+            adaptive_ocr = _settings.extraction.adaptive_ocr
+        adaptive_ocr = (
+            adaptive_ocr
+            and options.do_ocr
+            and self._get_document_type(doc_path) == DocumentType.PDF
+        )
+        return cache, cache.key(doc_path, options, _ocr_variant(adaptive_ocr))
+
+    def _store_in_cache(
+        self,
+        cache: ExtractionCache,
+        cache_key: str,
+        doc: DoclingDocument,
+        doc_path: Path,
+    ) -> None:
+        """
+        Store a document in the cache, logging instead of failing on I/O errors.
+        Args:
+            cache: The extraction cache.
+            cache_key: The cache key.
+            doc: The document.
+            doc_path: Path to the document, for logging.
+        """
+        try:
+            cache.put(cache_key, doc)
+        except OSError as e:
+            logger.warning(f"Failed to cache extraction of {doc_path}: {e}")
+
     def _extract_document(
         self,
         doc_path: Path,
         output_folder: Path = Path("temp"),
         is_accelerator: bool = False,
-        ocr_batch_size: int = 4,
-        layout_batch_size: int = 64,
-        table_batch_size: int = 4,
+        ocr_batch_size: Optional[int] = None,
+        layout_batch_size: Optional[int] = None,
+        table_batch_size: Optional[int] = None,
         do_ocr: bool = True,
         do_table_structure: bool = True,
         do_cell_matching: bool = True,
         force_full_page_ocr: bool = True,
-        num_threads: int = 4,
+        num_threads: Optional[int] = None,
         vlm_framework: Literal["vllm", "lms"] = "vllm",
         vlm_model: str = None,
+        use_cache: bool = True,
+        page_range: Optional[Tuple[int, int]] = None,
+        adaptive_ocr: Optional[bool] = None,
+        ocr_stats: Optional[OcrStats] = None,
+        picture_stats: Optional[PictureDescriptionStats] = None,
     ):
         """
         Extract the text from the document.
@@ -321,16 +483,25 @@ class DoclingExtractionService:
             doc_path: Path to the document.
             output_folder: Path to the output folder.
             is_accelerator: Whether to use accelerator.
-            ocr_batch_size: The batch size for OCR.
-            layout_batch_size: The batch size for layout.
-            table_batch_size: The batch size for table structure.
+            ocr_batch_size: The batch size for OCR (default: tuned for the host).
+            layout_batch_size: The batch size for layout (default: tuned).
+            table_batch_size: The batch size for table structure (default: tuned).
             do_ocr: Whether to do OCR.
             do_table_structure: Whether to do table structure.
             do_cell_matching: Whether to do cell matching.
             force_full_page_ocr: Whether to force full page OCR.
-            num_threads: The number of threads to use.
+            num_threads: The number of threads to use (default: tuned).
             vlm_framework: The framework to use for picture description.
             vlm_model: The model to use for picture description.s
+            use_cache: Whether to reuse a previous extraction of the same bytes.
+            page_range: First and last page (1-based, inclusive) to convert.
+                Partial extractions are never cached.
+            adaptive_ocr: Whether to OCR in full only the PDF pages without a
+                usable text layer (default: ``extraction.adaptive_ocr``).
+            ocr_stats: Filled with the pages OCRed in full, when given.
+            picture_stats: Filled with the picture description counts, when
+                given. Callers caching a partial extraction must not cache the
+                whole document when some pictures failed.
         Returns:
             str: The text from the document.
         """
@@ -342,27 +513,725 @@ class DoclingExtractionService:
         if not output_folder.exists():
             output_folder.mkdir(parents=True, exist_ok=True)
 
-        if is_accelerator:
-            converter = self._get_accelerator_converter(
-                ocr_batch_size=ocr_batch_size,
-                layout_batch_size=layout_batch_size,
-                table_batch_size=table_batch_size,
-                do_ocr=do_ocr,
-                do_table_structure=do_table_structure,
-                do_cell_matching=do_cell_matching,
-                vlm_framework=vlm_framework,
-                vlm_model=vlm_model,
+        profile = get_accelerator_profile()
+        options = ConverterOptions(
+            is_accelerator=is_accelerator,
+            do_ocr=do_ocr,
+            force_full_page_ocr=force_full_page_ocr,
+            do_table_structure=do_table_structure,
+            do_cell_matching=do_cell_matching,
+            num_threads=num_threads or profile.num_threads,
+            ocr_batch_size=ocr_batch_size or profile.ocr_batch_size,
+            layout_batch_size=layout_batch_size or profile.layout_batch_size,
+            table_batch_size=table_batch_size or profile.table_batch_size,
+            vlm_framework=vlm_framework,
+            vlm_model=vlm_model,
+        )
+
+        if adaptive_ocr is None:
+            adaptive_ocr = _settings.extraction.adaptive_ocr
+        adaptive_ocr = (
+            adaptive_ocr
+            and do_ocr
+            and self._get_document_type(doc_path) == DocumentType.PDF
+        )
+
+        cache = self._get_cache(output_folder) if use_cache and not page_range else None
+        if cache is not None:
+            cache_key = cache.key(doc_path, options, _ocr_variant(adaptive_ocr))
+            doc = cache.get(cache_key)
+            if doc is not None:
+                return doc
+
+        if adaptive_ocr:
+            doc = self._convert_with_adaptive_ocr(
+                doc_path, options, page_range, ocr_stats
             )
         else:
-            converter = self._get_standard_converter(
-                do_ocr=do_ocr,
-                force_full_page_ocr=force_full_page_ocr,
-                do_table_structure=do_table_structure,
-                do_cell_matching=do_cell_matching,
-                num_threads=num_threads,
-                vlm_framework=vlm_framework,
-                vlm_model=vlm_model,
+            source_path = self._preprocess_document(doc_path, output_folder)
+            converter = self.get_converter(options)
+            try:
+                doc = converter.convert(
+                    source_path, page_range=page_range or DEFAULT_PAGE_RANGE
+                ).document
+            finally:
+                if source_path != doc_path:
+                    source_path.unlink(missing_ok=True)
+            if ocr_stats is not None:
+                ocr_stats.pages += len(doc.pages)
+                if (
+                    do_ocr
+                    and force_full_page_ocr
+                    and self._get_document_type(doc_path)
+                    in (DocumentType.PDF, DocumentType.IMAGE)
+                ):
+                    ocr_stats.ocr_pages.extend(sorted(doc.pages))
+                    ocr_stats.reasons["forced"] = ocr_stats.reasons.get(
+                        "forced", 0
+                    ) + len(doc.pages)
+
+        if vlm_model is not None:
+            described = self._describe_pictures(
+                doc, output_folder, vlm_framework, vlm_model
+            )
+            if picture_stats is not None:
+                picture_stats.merge(described)
+            if described.failed:
+                # Keep the document out of the cache until it is complete
+                cache = None
+
+        if cache is not None:
+            self._store_in_cache(cache, cache_key, doc, doc_path)
+        return doc
+
+    def _describe_pictures(
+        self,
+        doc: DoclingDocument,
+        output_folder: Path,
+        vlm_framework: Literal["vllm", "lms"],
+        vlm_model: str,
+    ) -> PictureDescriptionStats:
+        """
+        Describe the pictures of a converted document with a VLM.
+        The rendered pictures are dropped afterwards, they are not part of
+        the extraction output.
+        Args:
+            doc: The converted document, updated in place.
+            output_folder: Path to the output folder.
+            vlm_framework: The framework serving the VLM.
+            vlm_model: The model to use for picture description.
+        Returns:
+            PictureDescriptionStats: The picture description statistics.
+        """
+        if vlm_framework == "lms":
+            endpoint = self._get_lms_picture_annotation_with_vlm(vlm_model)
+        else:
+            endpoint = self._get_vllm_picture_annotation_with_vlm(vlm_model)
+        cache_dir = None
+        if _settings.extraction.cache_enabled:
+            cache_dir = (
+                Path(_settings.extraction.cache_dir or output_folder / "cache")
+                / "pictures"
             )
+        try:
+            return picture_describer.describe(doc, endpoint, cache_dir)
+        finally:
+            for picture in doc.pictures:
+                picture.image = None
 
-        doc = converter.convert(doc_path).document
+    def _convert_with_adaptive_ocr(
+        self,
+        doc_path: Path,
+        options: ConverterOptions,
+        page_range: Optional[Tuple[int, int]] = None,
+        ocr_stats: Optional[OcrStats] = None,
+    ) -> DoclingDocument:
+        """
+        Convert a PDF, OCRing in full only the pages that need it.
+        Consecutive pages with the same verdict are converted together, the
+        pages with a usable text layer without forced OCR so that only their
+        bitmaps are OCRed.
+        Args:
+            doc_path: Path to the PDF.
+            options: The converter options.
+            page_range: First and last page (1-based, inclusive) to convert.
+            ocr_stats: Filled with the pages OCRed in full, when given.
+        Returns:
+            DoclingDocument: The converted document.
+        """
+        layers = analyze_text_layer(doc_path, page_range)
+        if not layers:
+            converter = self.get_converter(options)
+            return converter.convert(
+                doc_path, page_range=page_range or DEFAULT_PAGE_RANGE
+            ).document
+
+        # (needs OCR, first page, last page)
+        runs: List[List] = []
+        for layer in layers:
+            if runs and runs[-1][0] == layer.needs_ocr:
+                runs[-1][2] = layer.page_no
+            else:
+                runs.append([layer.needs_ocr, layer.page_no, layer.page_no])
+
+        docs = []
+        for needs_ocr, first, last in runs:
+            converter = self.get_converter(
+                replace(options, force_full_page_ocr=needs_ocr)
+            )
+            docs.append(converter.convert(doc_path, page_range=(first, last)).document)
+        doc = _merge_documents(docs)
+
+        stats = OcrStats(pages=len(layers))
+        for layer in layers:
+            if layer.needs_ocr:
+                stats.ocr_pages.append(layer.page_no)
+                stats.reasons[layer.reason] = stats.reasons.get(layer.reason, 0) + 1
+        logger.info(
+            f"Adaptive OCR of {doc_path}: {len(stats.ocr_pages)}/{stats.pages} "
+            f"pages OCRed in full {stats.reasons}"
+        )
+        if ocr_stats is not None:
+            ocr_stats.merge(stats)
         return doc
+
+    def _split_pages(
+        self, doc: DoclingDocument, num_pages: int
+    ) -> Iterator[ExtractedPage]:
+        """
+        Split a document into per-page results.
+        Args:
+            doc: The document, or a page window of it.
+            num_pages: The number of pages of the whole document.
+        Returns:
+            Iterator[ExtractedPage]: One result per page, in page order.
+        """
+        # Word documents have no pages, they are returned as a single page
+        page_nos = sorted(doc.pages) or [1]
+
+        tables: Dict[int, List[str]] = {}
+        for table in doc.tables:
+            page_no = table.prov[0].page_no if table.prov else page_nos[0]
+            tables.setdefault(page_no, []).append(table.export_to_markdown(doc))
+        pictures: Dict[int, List[ExtractedPicture]] = {}
+        for picture in doc.pictures:
+            page_no = picture.prov[0].page_no if picture.prov else page_nos[0]
+            description = None
+            if picture.meta is not None and picture.meta.description is not None:
+                description = picture.meta.description.text
+            pictures.setdefault(page_no, []).append(
+                ExtractedPicture(
+                    caption=picture.caption_text(doc), description=description
+                )
+            )
+
+        for page_no in page_nos:
+            yield ExtractedPage(
+                page_no=page_no,
+                num_pages=max(num_pages, 1),
+                text=doc.export_to_markdown(page_no=page_no if doc.pages else None),
+                tables=tables.get(page_no, []),
+                pictures=pictures.get(page_no, []),
+            )
+
+    def iter_pages(
+        self,
+        doc_path: Path,
+        output_folder: Path = Path("temp"),
+        window_pages: Optional[int] = None,
+        memory_budget_mb: Optional[int] = None,
+        memory_stats: Optional[MemoryStats] = None,
+        **extract_kwargs,
+    ) -> Iterator[ExtractedPage]:
+        """
+        Extract a document page by page.
+        PDFs are converted in windows of a few pages, and the pages of a
+        window are yielded as soon as it is converted, so consumers can start
+        before the rest of the document is processed. Other documents are
+        converted at once and then yielded page by page.
+        With a memory budget, PDF windows are resized to keep the process
+        under it, see ``_iter_pages_bounded``.
+        Args:
+            doc_path: Path to the document.
+            output_folder: Path to the output folder.
+            window_pages: Pages converted at a time
+                (default: ``extraction.stream_window_pages``).
+            memory_budget_mb: Resident set size the process should stay under
+                (default: ``extraction.memory_budget_mb``, 0 is unbounded).
+            memory_stats: Filled with the memory used by a bounded extraction.
+            extract_kwargs: Options passed to ``_extract_document``.
+        Returns:
+            Iterator[ExtractedPage]: One result per page, in page order.
+        """
+        if not doc_path.exists():
+            raise FileNotFoundError(f"Document not found: {doc_path}")
+
+        if self._get_document_type(doc_path) != DocumentType.PDF:
+            doc = self._extract_document(doc_path, output_folder, **extract_kwargs)
+            yield from self._split_pages(doc, len(doc.pages))
+            return
+
+        if memory_budget_mb is None:
+            memory_budget_mb = _settings.extraction.memory_budget_mb
+        if memory_budget_mb > 0:
+            yield from self._iter_pages_bounded(
+                doc_path,
+                output_folder,
+                window_pages or _settings.extraction.stream_window_pages,
+                memory_budget_mb,
+                memory_stats if memory_stats is not None else MemoryStats(),
+                **extract_kwargs,
+            )
+            return
+
+        cache, cache_key = self._get_cache_entry(
+            doc_path, output_folder, extract_kwargs
+        )
+        num_pages = _count_pdf_pages(doc_path)
+        if cache is not None:
+            doc = cache.get(cache_key)
+            if doc is not None:
+                yield from self._split_pages(doc, num_pages)
+                return
+
+        window_pages = window_pages or _settings.extraction.stream_window_pages
+        # Windows are only kept to store the whole document in the cache
+        windows: List[DoclingDocument] = []
+        picture_stats = PictureDescriptionStats()
+        for first in range(1, num_pages + 1, window_pages):
+            window = self._extract_document(
+                doc_path,
+                output_folder,
+                use_cache=False,
+                page_range=(first, min(first + window_pages - 1, num_pages)),
+                picture_stats=picture_stats,
+                **extract_kwargs,
+            )
+            yield from self._split_pages(window, num_pages)
+            if cache is not None:
+                windows.append(window)
+
+        if cache is not None and windows and not picture_stats.failed:
+            self._store_in_cache(cache, cache_key, _merge_documents(windows), doc_path)
+
+    def _iter_pages_bounded(
+        self,
+        doc_path: Path,
+        output_folder: Path,
+        window_pages: int,
+        memory_budget_mb: int,
+        memory_stats: MemoryStats,
+        **extract_kwargs,
+    ) -> Iterator[ExtractedPage]:
+        """
+        Extract a PDF page by page within a memory budget.
+        Only one window of pages is held at a time: it is released, and the
+        freed memory returned to the system, before the next one is
+        converted. Each window is sized from the memory per page the previous
+        one used and the memory left under the budget, so large pages get
+        small windows. The whole document is neither read from nor stored in
+        the cache, which would hold all of its pages at once.
+        Args:
+            doc_path: Path to the PDF.
+            output_folder: Path to the output folder.
+            window_pages: Pages of the first window.
+            memory_budget_mb: Resident set size the process should stay under.
+            memory_stats: Filled with the memory used by the extraction.
+            extract_kwargs: Options passed to ``_extract_document``.
+        Returns:
+            Iterator[ExtractedPage]: One result per page, in page order.
+        """
+        config = _settings.extraction
+        extract_kwargs.pop("use_cache", None)
+        budget = memory_budget_mb * 2**20
+        num_pages = _count_pdf_pages(doc_path)
+
+        release_memory()
+        memory_stats.budget_mb = memory_budget_mb
+        memory_stats.baseline_rss_mb = get_rss_bytes() / 2**20
+        first = 1
+        while first <= num_pages:
+            last = min(first + window_pages - 1, num_pages)
+            rss_before = get_rss_bytes()
+            # Without a resettable peak, the current size after the window is
+            # the best estimate of what it used
+            peak_resettable = reset_peak_rss()
+            window = self._extract_document(
+                doc_path,
+                output_folder,
+                use_cache=False,
+                page_range=(first, last),
+                **extract_kwargs,
+            )
+            peak = get_peak_rss_bytes() if peak_resettable else get_rss_bytes()
+            for page in self._split_pages(window, num_pages):
+                yield page
+            del window
+            release_memory()
+
+            memory_stats.window_pages.append(last - first + 1)
+            memory_stats.peak_rss_mb = max(memory_stats.peak_rss_mb, peak / 2**20)
+            rss = get_rss_bytes()
+            if rss > budget:
+                memory_stats.over_budget += 1
+                logger.warning(
+                    f"{doc_path.name} pages {first}-{last}: resident set size "
+                    f"{rss / 2**20:.0f} MB over the {memory_budget_mb} MB budget"
+                )
+            page_bytes = max(peak - rss_before, 1) / (last - first + 1)
+            fit = int((budget - rss) * config.memory_window_headroom / page_bytes)
+            window_pages = max(1, min(config.memory_max_window_pages, fit))
+            first = last + 1
+
+        logger.info(
+            f"Extracted {doc_path.name}: {num_pages} pages in "
+            f"{len(memory_stats.window_pages)} windows, peak resident set size "
+            f"{memory_stats.peak_rss_mb:.0f} MB of {memory_budget_mb} MB"
+        )
+
+    def extract_to_file(
+        self,
+        doc_path: Path,
+        pages_path: Path,
+        output_folder: Path = Path("temp"),
+        memory_budget_mb: Optional[int] = None,
+        on_page: Optional[Callable[[ExtractedPage], None]] = None,
+        **extract_kwargs,
+    ) -> ExtractionResult:
+        """
+        Extract a document page by page into a JSON Lines file.
+        Every page is written as soon as it is extracted, so with a memory
+        budget the pages done so far live on disk instead of in memory.
+        Args:
+            doc_path: Path to the document.
+            pages_path: Path to the JSON Lines file, one ``ExtractedPage`` per line.
+            output_folder: Path to the output folder.
+            memory_budget_mb: Resident set size the process should stay under
+                (default: ``extraction.memory_budget_mb``, 0 is unbounded).
+            on_page: Called with every page once it is written.
+            extract_kwargs: Options passed to ``iter_pages``.
+        Returns:
+            ExtractionResult: The result, without the document.
+        """
+        started = time.perf_counter()
+        memory_stats = MemoryStats()
+        pages_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = pages_path.with_name(pages_path.name + ".tmp")
+        num_pages = 0
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                for page in self.iter_pages(
+                    doc_path,
+                    output_folder,
+                    memory_budget_mb=memory_budget_mb,
+                    memory_stats=memory_stats,
+                    **extract_kwargs,
+                ):
+                    file.write(page.model_dump_json() + "\n")
+                    num_pages += 1
+                    if on_page is not None:
+                        on_page(page)
+            tmp_path.replace(pages_path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return ExtractionResult(
+            doc_path=doc_path,
+            output_path=pages_path,
+            num_pages=num_pages,
+            elapsed=time.perf_counter() - started,
+            memory_stats=memory_stats if memory_stats.window_pages else None,
+        )
+
+    def _plan_shards(self, num_pages: int, max_workers: int) -> List[Tuple[int, int]]:
+        """
+        Split a document into contiguous page ranges.
+        Shards are small enough to give every worker a few of them, so a slow
+        shard does not leave the other cores idle, but large enough to keep
+        the per-shard overhead low.
+        Args:
+            num_pages: The number of pages of the document.
+            max_workers: The number of worker processes.
+        Returns:
+            List[Tuple[int, int]]: First and last page (1-based, inclusive) of
+                every shard, in page order.
+        """
+        config = _settings.extraction
+        shard_size = math.ceil(num_pages / (max_workers * config.shards_per_worker))
+        shard_size = min(
+            max(shard_size, config.shard_min_pages), config.shard_max_pages
+        )
+        return [
+            (start, min(start + shard_size - 1, num_pages))
+            for start in range(1, num_pages + 1, shard_size)
+        ]
+
+    def extract_sharded(
+        self,
+        doc_path: Path,
+        output_folder: Path = Path("temp"),
+        max_workers: Optional[int] = None,
+        ocr_stats: Optional[OcrStats] = None,
+        **extract_kwargs,
+    ) -> DoclingDocument:
+        """
+        Extract a large PDF by converting page ranges in parallel worker processes.
+        The shard documents are merged back in page order, keeping the page
+        numbers of the original document. Other documents, and PDFs with
+        fewer than ``shard_min_document_pages`` pages, are extracted in this
+        process.
+        Args:
+            doc_path: Path to the document.
+            output_folder: Path to the output folder.
+            max_workers: The number of worker processes (default: all cores).
+            ocr_stats: Filled with the pages OCRed in full, when given.
+            extract_kwargs: Options passed to ``_extract_document``.
+        Returns:
+            DoclingDocument: The merged document.
+        """
+        if not doc_path.exists():
+            raise FileNotFoundError(f"Document not found: {doc_path}")
+
+        max_workers = max_workers or _settings.extraction.max_workers or get_cpu_count()
+        num_pages = 0
+        if self._get_document_type(doc_path) == DocumentType.PDF:
+            num_pages = _count_pdf_pages(doc_path)
+        if (
+            max_workers <= 1
+            or num_pages < _settings.extraction.shard_min_document_pages
+        ):
+            return self._extract_document(
+                doc_path, output_folder, ocr_stats=ocr_stats, **extract_kwargs
+            )
+
+        cache, cache_key = self._get_cache_entry(
+            doc_path, output_folder, extract_kwargs
+        )
+        if cache is not None:
+            doc = cache.get(cache_key)
+            if doc is not None:
+                return doc
+
+        shards = self._plan_shards(num_pages, max_workers)
+        max_workers = min(max_workers, len(shards))
+        _set_worker_profile(extract_kwargs, max_workers)
+        extract_kwargs.update(use_cache=False, output_folder=output_folder)
+
+        started = time.perf_counter()
+        executor = _new_worker_pool(max_workers, extract_kwargs)
+        try:
+            futures = [
+                executor.submit(
+                    _extract_shard_in_worker, doc_path, shard, extract_kwargs
+                )
+                for shard in shards
+            ]
+            shard_docs = []
+            picture_stats = PictureDescriptionStats()
+            for future in futures:
+                shard_doc, shard_ocr_stats, shard_picture_stats = future.result()
+                shard_docs.append(shard_doc)
+                picture_stats.merge(shard_picture_stats)
+                if ocr_stats is not None:
+                    ocr_stats.merge(shard_ocr_stats)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        doc = _merge_documents(shard_docs)
+        logger.info(
+            f"Extracted {num_pages} pages of {doc_path} in {len(shards)} shards "
+            f"on {max_workers} workers in {time.perf_counter() - started:.1f}s"
+        )
+
+        # Keep the document out of the cache until all its pictures are described
+        if cache is not None and not picture_stats.failed:
+            self._store_in_cache(cache, cache_key, doc, doc_path)
+        return doc
+
+    def extract_many(
+        self,
+        doc_paths: Iterable[Path],
+        output_folder: Optional[Path] = None,
+        max_workers: Optional[int] = None,
+        **extract_kwargs,
+    ) -> Iterator[ExtractionResult]:
+        """
+        Extract many documents in parallel worker processes.
+        Each worker keeps one warm converter. Documents are submitted while
+        fewer than two per worker are in flight and the machine has at least
+        ``min_free_memory_mb`` available. A failing document only fails its
+        own result.
+        Args:
+            doc_paths: Paths to the documents.
+            output_folder: Folder receiving one Docling JSON file per document.
+                If omitted, documents are returned in the results instead.
+            max_workers: The number of worker processes (default: all cores).
+            extract_kwargs: Options passed to ``_extract_document``.
+        Returns:
+            Iterator[ExtractionResult]: Results in completion order.
+        """
+        max_workers = max_workers or _settings.extraction.max_workers or get_cpu_count()
+        _set_worker_profile(extract_kwargs, max_workers)
+        max_in_flight = max_workers * 2
+        min_free_memory = _settings.extraction.min_free_memory_mb * 1024 * 1024
+
+        if output_folder is not None:
+            output_folder.mkdir(parents=True, exist_ok=True)
+
+        paths = iter(doc_paths)
+        executor = _new_worker_pool(max_workers, extract_kwargs)
+        in_flight: Dict[Future, Path] = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    if in_flight and get_available_memory_bytes() < min_free_memory:
+                        break
+                    doc_path = next(paths, None)
+                    if doc_path is None:
+                        exhausted = True
+                        break
+                    future = executor.submit(
+                        _extract_in_worker,
+                        Path(doc_path),
+                        output_folder,
+                        extract_kwargs,
+                    )
+                    in_flight[future] = Path(doc_path)
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                pool_broken = False
+                for future in done:
+                    doc_path = in_flight.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. OOM-killed), which fails every
+                        # document it shared the pool with
+                        pool_broken = True
+                        yield ExtractionResult(doc_path=doc_path, error=repr(e))
+
+                if pool_broken:
+                    for future, doc_path in in_flight.items():
+                        yield ExtractionResult(
+                            doc_path=doc_path, error="Worker pool terminated"
+                        )
+                    in_flight.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = _new_worker_pool(max_workers, extract_kwargs)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Extraction service of the current worker process
+_worker_service: Optional[DoclingExtractionService] = None
+
+
+def _new_worker_pool(max_workers: int, extract_kwargs: dict) -> ProcessPoolExecutor:
+    # Fork is unsafe once torch has started its thread pools
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(extract_kwargs,),
+        max_tasks_per_child=_settings.extraction.max_tasks_per_worker,
+    )
+
+
+def _set_worker_profile(extract_kwargs: dict, max_workers: int) -> None:
+    # Split the cores between workers instead of oversubscribing them
+    profile = get_accelerator_profile(workers=max_workers)
+    extract_kwargs.setdefault("num_threads", profile.num_threads)
+    extract_kwargs.setdefault("ocr_batch_size", profile.ocr_batch_size)
+    extract_kwargs.setdefault("layout_batch_size", profile.layout_batch_size)
+    extract_kwargs.setdefault("table_batch_size", profile.table_batch_size)
+
+
+def _init_worker(extract_kwargs: dict) -> None:
+    """Limit torch threads and warm the converter of a worker process."""
+    global _worker_service
+
+    torch.set_num_threads(extract_kwargs["num_threads"])
+    _worker_service = DoclingExtractionService()
+    options = ConverterOptions(
+        **{
+            name: value
+            for name, value in extract_kwargs.items()
+            if name in CONVERTER_OPTION_NAMES
+        }
+    )
+    try:
+        _worker_service.warm_up(options)
+    except Exception as e:
+        logger.warning(f"Failed to warm up extraction worker: {e}")
+
+
+def _bound_pipeline_queues(pipeline_options: PdfPipelineOptions) -> None:
+    """Limit the pages buffered between the stages of the PDF pipeline.
+
+    A stage blocks when the queue to the next one is full, so a fast stage
+    cannot load pages faster than a slow one releases them. The queues still
+    hold a whole batch, or batches would never fill.
+    """
+    pipeline_options.queue_max_size = max(
+        _settings.extraction.pipeline_queue_max_size,
+        pipeline_options.ocr_batch_size,
+        pipeline_options.layout_batch_size,
+        pipeline_options.table_batch_size,
+    )
+
+
+def _count_pdf_pages(doc_path: Path) -> int:
+    pdf = pdfium.PdfDocument(doc_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _merge_documents(docs: List[DoclingDocument]) -> DoclingDocument:
+    """Concatenate contiguous page ranges of one document, in page order."""
+    if len(docs) == 1:
+        return docs[0]
+    doc = DoclingDocument.concatenate(docs)
+    doc.name = docs[0].name
+    doc.origin = docs[0].origin
+    return doc
+
+
+def _ocr_variant(adaptive_ocr: bool) -> str:
+    # Adaptive OCR changes the output without changing the converter options
+    return "adaptive-ocr" if adaptive_ocr else ""
+
+
+def _extract_shard_in_worker(
+    doc_path: Path, page_range: Tuple[int, int], extract_kwargs: dict
+) -> Tuple[DoclingDocument, OcrStats, PictureDescriptionStats]:
+    """Extract one page range of a document inside a worker process."""
+    ocr_stats = OcrStats()
+    picture_stats = PictureDescriptionStats()
+    doc = _worker_service._extract_document(
+        doc_path,
+        page_range=page_range,
+        ocr_stats=ocr_stats,
+        picture_stats=picture_stats,
+        **extract_kwargs,
+    )
+    return doc, ocr_stats, picture_stats
+
+
+def _extract_in_worker(
+    doc_path: Path, output_folder: Optional[Path], extract_kwargs: dict
+) -> ExtractionResult:
+    """Extract one document inside a worker process."""
+    started = time.perf_counter()
+    ocr_stats = OcrStats()
+    try:
+        doc = _worker_service._extract_document(
+            doc_path, ocr_stats=ocr_stats, **extract_kwargs
+        )
+    except Exception as e:
+        return ExtractionResult(
+            doc_path=doc_path,
+            elapsed=time.perf_counter() - started,
+            error=f"{type(e).__name__}: {e}",
+        )
+
+    result = ExtractionResult(
+        doc_path=doc_path,
+        num_pages=len(doc.pages),
+        elapsed=time.perf_counter() - started,
+        # Left empty for documents served from the cache
+        ocr_stats=ocr_stats if ocr_stats.pages else None,
+    )
+    if output_folder is None:
+        result.document = doc
+    else:
+        # Documents with the same name may come from different folders
+        path_hash = hashlib.sha1(str(doc_path.resolve()).encode()).hexdigest()[:8]
+        result.output_path = output_folder / f"{doc_path.stem}-{path_hash}.json"
+        doc.save_as_json(result.output_path)
+    return result
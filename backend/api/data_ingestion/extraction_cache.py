@@ -0,0 +1,246 @@
+"""Content-addressed cache of extracted Docling documents.
+
+Entries are keyed by the SHA-256 of the file bytes and a fingerprint of the
+options that shape the extraction, so the same document uploaded twice, under
+any name, is only converted once. Every entry is one JSON file written
+atomically. Reads refresh the file mtime, and the least recently used entries
+are removed once the cache grows past its size limit.
+
+Validating a large ``DoclingDocument`` from JSON takes hundreds of
+milliseconds, so the most recently used documents are also kept decoded in
+memory. Callers get a deep copy of those, so they may modify the document.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from docling_core.types.doc import DoclingDocument
+from loguru import logger
+
+from backend.api.data_ingestion.converter_registry import ConverterOptions
+from backend.config.settings import _settings
+
+# Bump when the cached output changes for the same options (e.g. new models)
+CACHE_VERSION = 1
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ExtractionCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    # Time spent answering hits
+    hit_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def options_fingerprint(options: ConverterOptions, variant: str = "") -> str:
+    """Return a stable fingerprint of the options that affect the output.
+
+    Batch sizes and thread counts only change how fast a document is
+    converted, so they are left out.
+
+    Args:
+        options: Converter options.
+        variant: Extraction mode not captured by the converter options.
+    """
+    options = asdict(options.normalized())
+    for name in (
+        "num_threads",
+        "ocr_batch_size",
+        "layout_batch_size",
+        "table_batch_size",
+    ):
+        options.pop(name)
+    options["cache_version"] = CACHE_VERSION
+    if variant:
+        options["variant"] = variant
+    payload = json.dumps(options, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """Size-bounded LRU of serialized ``DoclingDocument`` files on disk."""
+
+    def __init__(self, directory: Path, max_size_mb: int, memory_entries: int = 0):
+        self._directory = Path(directory)
+        self._max_size_bytes = max_size_mb * 1024 * 1024
+        self._memory_entries = memory_entries
+        self._memory: "OrderedDict[str, DoclingDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Lazily computed, then kept up to date by put() and evict()
+        self._size_bytes: Optional[int] = None
+        self.stats = ExtractionCacheStats()
+
+    def key(self, doc_path: Path, options: ConverterOptions, variant: str = "") -> str:
+        """Build the cache key of a document extracted with ``options``."""
+        return f"{hash_file(doc_path)}-{options_fingerprint(options, variant)}"
+
+    def _path(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self._directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[DoclingDocument]:
+        """Return the cached document, or None on a miss.
+
+        The document belongs to the caller, it is not shared with other callers.
+        """
+        started = time.perf_counter()
+        path = self._path(key)
+        with self._lock:
+            doc = self._memory.get(key)
+            if doc is not None:
+                self._memory.move_to_end(key)
+        if doc is not None:
+            # Still refresh the file so the disk LRU sees the access
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            doc = doc.model_copy(deep=True)
+            self._count_hit(key, started)
+            return doc
+
+        try:
+            payload = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            self._count_miss(key)
+            return None
+
+        try:
+            doc = DoclingDocument.model_validate_json(payload)
+        except ValueError as e:
+            logger.warning(f"Dropping unreadable extraction cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            self._count_miss(key)
+            return None
+
+        self._remember(key, doc)
+        self._count_hit(key, started)
+        return doc
+
+    def _remember(self, key: str, doc: DoclingDocument) -> None:
+        if self._memory_entries <= 0:
+            return
+        # A copy, the caller keeps using its document
+        doc = doc.model_copy(deep=True)
+        with self._lock:
+            self._memory[key] = doc
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count_hit(self, key: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.hit_seconds += elapsed
+        logger.debug(f"Extraction cache hit {key} in {elapsed * 1000:.1f}ms")
+
+    def _count_miss(self, key: str) -> None:
+        with self._lock:
+            self.stats.misses += 1
+        logger.debug(f"Extraction cache miss {key}")
+
+    def put(self, key: str, doc: DoclingDocument) -> None:
+        """Store a document, replacing any previous entry atomically."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = doc.model_dump_json().encode("utf-8")
+
+        # Write next to the target so os.replace stays on one filesystem
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(payload)
+            previous_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._remember(key, doc)
+
+        with self._lock:
+            self.stats.writes += 1
+            if self._size_bytes is not None:
+                self._size_bytes += len(payload) - previous_size
+        self.evict(keep=path)
+
+    def _scan_size(self) -> int:
+        return sum(path.stat().st_size for path in self._directory.glob("*/*.json"))
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Remove the least recently used entries until under the size limit.
+
+        Args:
+            keep: Entry that must survive, e.g. the one just written.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = self._scan_size()
+            if self._size_bytes <= self._max_size_bytes:
+                return 0
+
+            entries = []
+            for path in self._directory.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+
+            size = sum(entry[1] for entry in entries)
+            removed = 0
+            for _, entry_size, path in entries:
+                if size <= self._max_size_bytes:
+                    break
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                self._memory.pop(path.stem, None)
+                size -= entry_size
+                removed += 1
+            self._size_bytes = size
+            self.stats.evictions += removed
+
+        logger.info(f"Evicted {removed} extraction cache entries")
+        return removed
+
+
+@lru_cache(maxsize=None)
+def get_extraction_cache(directory: Path) -> ExtractionCache:
+    """Return the cache stored in ``directory``, shared within the process."""
+    return ExtractionCache(
+        directory,
+        max_size_mb=_settings.extraction.cache_max_size_mb,
+        memory_entries=_settings.extraction.cache_memory_entries,
+    )
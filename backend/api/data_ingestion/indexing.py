@@ -0,0 +1,302 @@
+"""Writes embedded chunks to Qdrant.
+
+Points are upserted in batches of ``qdrant_batch_size``, with up to
+``qdrant_max_in_flight`` requests at a time, over gRPC by default (see
+``get_qdrant_client``). A request failing with a transient error, such as a
+timeout, a throttled or an unavailable server, is retried with exponential
+backoff; other errors fail the writer at the next ``add`` or ``flush``.
+
+Point ids are derived from the document and the hash of the embedded text,
+so writing the same chunks again overwrites the same points.
+"""
+
+import hashlib
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional
+
+import grpc
+from loguru import logger
+from qdrant_client import QdrantClient, models
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from backend.api.data_ingestion.embedding import EmbeddedBatch, embedding_text
+from backend.api.data_ingestion.model import DocumentChunk
+from backend.config.settings import _settings
+from backend.databases.qdrant import get_qdrant_client
+
+# Namespace of the point ids, fixed so ids are stable across processes
+POINT_NAMESPACE = uuid.UUID("6f3c2f0e-4a53-5d0c-9a44-1c2b7f0e8d51")
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_RETRY_GRPC_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+)
+
+
+def chunk_hash(chunk: DocumentChunk) -> str:
+    """Hash of the text embedded for a chunk."""
+    return hashlib.sha256(embedding_text(chunk).encode()).hexdigest()
+
+
+def point_id(document_id: str, digest: str) -> str:
+    """Id of the point of a chunk, the same every time it is indexed."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{document_id}/{digest}"))
+
+
+def _is_local(client: QdrantClient) -> bool:
+    """Whether the client runs qdrant-client's local mode instead of a server."""
+    options = client.init_options
+    return options.get("location") == ":memory:" or options.get("path") is not None
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in _RETRY_STATUS_CODES
+    if isinstance(error, grpc.RpcError):
+        return error.code() in _RETRY_GRPC_CODES
+    # Connection errors and timeouts of the REST client
+    return isinstance(error, (ResponseHandlingException, ConnectionError, TimeoutError))
+
+
+class QdrantIndexWriter:
+    """Upserts the embedded chunks of a document into a collection.
+
+    ``flush`` is the commit barrier: once it returns, every point added
+    before is stored. Used as a context manager, the writer flushes on a
+    clean exit.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        document_id: str,
+        client: Optional[QdrantClient] = None,
+        batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+    ):
+        config = _settings.qdrant
+        self.collection = collection
+        self.document_id = document_id
+        self.client = client or get_qdrant_client()
+        self.batch_size = batch_size or config.qdrant_batch_size
+        self.max_in_flight = max_in_flight or config.qdrant_max_in_flight
+        if _is_local(self.client):
+            # The local mode does not support concurrent writes
+            self.max_in_flight = 1
+        self.max_retries = (
+            config.qdrant_max_retries if max_retries is None else max_retries
+        )
+        self.retry_delay = (
+            config.qdrant_retry_delay if retry_delay is None else retry_delay
+        )
+        self.dense_name = config.dense_vector_name
+        self.sparse_name = config.sparse_vector_name
+        self.num_points = 0
+        self._buffer: List[models.PointStruct] = []
+        self._in_flight: Deque[Future] = deque()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="qdrant-writer"
+        )
+        self._lock = threading.Lock()
+
+    def ensure_collection(
+        self, dimension: int, sparse: bool = True, sparse_idf: bool = True
+    ) -> None:
+        """Create the collection when it does not exist.
+
+        Args:
+            dimension: Size of the dense vectors.
+            sparse: Whether points also have a sparse vector.
+            sparse_idf: Whether the server weights sparse vectors by inverse
+                document frequency, not when the query vectors carry it.
+        """
+        if self.client.collection_exists(self.collection):
+            return
+        try:
+            self.client.create_collection(
+                self.collection,
+                vectors_config={
+                    self.dense_name: models.VectorParams(
+                        size=dimension, distance=models.Distance.COSINE
+                    )
+                },
+                sparse_vectors_config=(
+                    {
+                        self.sparse_name: models.SparseVectorParams(
+                            modifier=models.Modifier.IDF if sparse_idf else None
+                        )
+                    }
+                    if sparse
+                    else None
+                ),
+            )
+            if not _is_local(self.client):
+                self.client.create_payload_index(
+                    self.collection,
+                    "document_id",
+                    field_schema=models.PayloadSchemaType.KEYWORD,
+                )
+                # LSH index of the near-duplicate detection
+                self.client.create_payload_index(
+                    self.collection,
+                    "minhash_bands",
+                    field_schema=models.PayloadSchemaType.INTEGER,
+                )
+        except Exception:
+            # Created by another writer in the meantime
+            if not self.client.collection_exists(self.collection):
+                raise
+
+    def _points(
+        self, batch: EmbeddedBatch, payloads: Optional[List[dict]] = None
+    ) -> List[models.PointStruct]:
+        points = []
+        for row, chunk in enumerate(batch.chunks):
+            digest = chunk_hash(chunk)
+            vector = {self.dense_name: batch.dense[row].tolist()}
+            if batch.sparse is not None:
+                indices, values = batch.sparse.row(row)
+                vector[self.sparse_name] = models.SparseVector(
+                    indices=indices.tolist(), values=values.tolist()
+                )
+            points.append(
+                models.PointStruct(
+                    id=point_id(self.document_id, digest),
+                    vector=vector,
+                    payload={
+                        "document_id": self.document_id,
+                        "chunk_hash": digest,
+                        **chunk.model_dump(),
+                        **(payloads[row] if payloads else {}),
+                    },
+                )
+            )
+        return points
+
+    def _with_retries(self, request: Callable[[], object], description: str) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                request()
+                return
+            except Exception as e:
+                if attempt == self.max_retries or not _is_transient(e):
+                    raise
+                delay = self.retry_delay * 2**attempt * (0.5 + random.random())
+                logger.warning(f"{description} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def _upsert(self, points: List[models.PointStruct]) -> None:
+        self._with_retries(
+            lambda: self.client.upsert(self.collection, points=points, wait=True),
+            f"Upsert of {len(points)} points into {self.collection}",
+        )
+
+    def _submit(self, points: List[models.PointStruct]) -> None:
+        # Wait for the oldest request when as many as allowed are in flight
+        if len(self._in_flight) >= self.max_in_flight:
+            self._in_flight.popleft().result()
+        self._in_flight.append(self._executor.submit(self._upsert, points))
+        self.num_points += len(points)
+
+    def add(self, batch: EmbeddedBatch, payloads: Optional[List[dict]] = None) -> None:
+        """Queue the points of an embedded batch, sending full batches.
+
+        Raises the error of a failed request sent before.
+
+        Args:
+            batch: The embedded chunks.
+            payloads: Extra payload fields of every chunk.
+        """
+        with self._lock:
+            self._buffer.extend(self._points(batch, payloads))
+            while len(self._buffer) >= self.batch_size:
+                points = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                self._submit(points)
+
+    def flush(self) -> int:
+        """Send the queued points and wait until every request is done.
+
+        Returns:
+            int: Points written since the writer was created.
+        """
+        with self._lock:
+            if self._buffer:
+                self._submit(self._buffer)
+                self._buffer = []
+            while self._in_flight:
+                self._in_flight.popleft().result()
+            return self.num_points
+
+    def delete(self, point_ids: List[str]) -> None:
+        """Delete points of the document, in batches, once queued points are sent."""
+        self.flush()
+        for start in range(0, len(point_ids), self.batch_size):
+            batch = point_ids[start : start + self.batch_size]
+            self._with_retries(
+                lambda: self.client.delete(
+                    self.collection,
+                    points_selector=models.PointIdsList(points=batch),
+                    wait=True,
+                ),
+                f"Delete of {len(batch)} points from {self.collection}",
+            )
+
+    def set_payloads(self, payloads: Dict[str, dict]) -> None:
+        """Overwrite payload fields of points, in batches.
+
+        Points not in the collection are skipped.
+
+        Args:
+            payloads: Point id -> the fields to set.
+        """
+        self.flush()
+        items = list(payloads.items())
+        for start in range(0, len(items), self.batch_size):
+            operations = [
+                models.SetPayloadOperation(
+                    # A filter, unlike a list of ids, matches missing points
+                    # without failing the request
+                    set_payload=models.SetPayload(
+                        payload=payload,
+                        filter=models.Filter(
+                            must=[models.HasIdCondition(has_id=[point])]
+                        ),
+                    )
+                )
+                for point, payload in items[start : start + self.batch_size]
+            ]
+            self._with_retries(
+                lambda: self.client.batch_update_points(
+                    self.collection, operations, wait=True
+                ),
+                f"Payload update of {len(operations)} points in {self.collection}",
+            )
+
+    def close(self) -> None:
+        """Stop the writer without sending the queued points."""
+        with self._lock:
+            self._buffer = []
+            for future in self._in_flight:
+                future.cancel()
+            self._in_flight.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "QdrantIndexWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
@@ -0,0 +1,123 @@
+"""Submission and status of ingestion jobs.
+
+Job ids are derived from the source, collection and options, so submitting
+the same document twice returns the running or finished job instead of
+queueing a duplicate. Failed jobs are queued again on resubmission and resume
+after their last completed stage. A Redis lock on the job id makes the check
+and the queueing atomic across API workers.
+"""
+
+import json
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from celery.result import AsyncResult
+
+from backend.api.data_ingestion.model import IngestionJobStatus
+from backend.api.data_ingestion.tasks import process_file
+from backend.celery_app import celery_app
+from backend.config.settings import _settings
+from backend.exceptions.model import InvalidRequestException
+
+# States in which resubmitting queues the job again
+_RESUBMITTABLE_STATES = ("PENDING", "FAILURE", "REVOKED")
+
+
+def get_job_id(source: str, collection: str, options: dict) -> str:
+    """Derive the id of the job ingesting ``source`` with ``options``."""
+    key = json.dumps(
+        {"source": source, "collection": collection, "options": options},
+        sort_keys=True,
+    )
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+@lru_cache(maxsize=1)
+def _get_redis():
+    if not _settings.redis.url:
+        return None
+    import redis
+
+    return redis.Redis.from_url(_settings.redis.url)
+
+
+@contextmanager
+def _submit_lock(job_id: str) -> Iterator[bool]:
+    """Hold the submission lock of a job, yielding whether it was acquired.
+
+    Without Redis, e.g. eager local runs, there is a single submitter and the
+    lock is always acquired.
+    """
+    client = _get_redis()
+    if client is None:
+        yield True
+        return
+    config = _settings.process_file
+    lock = client.lock(
+        f"{config.submit_lock_prefix}:{job_id}", timeout=config.submit_lock_seconds
+    )
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+def submit_job(
+    source: str,
+    collection: str,
+    priority: str = "normal",
+    options: Optional[dict] = None,
+) -> str:
+    """Queue an ingestion job unless the same job is already queued or done.
+
+    Args:
+        source: URL of the document, or path of a file on shared storage.
+        collection: Qdrant collection receiving the chunks.
+        priority: One of ``celery.priorities`` ("high", "normal", "low").
+        options: Extraction options.
+
+    Returns:
+        str: The job id.
+    """
+    priorities = _settings.celery.priorities
+    if priority not in priorities:
+        raise InvalidRequestException(f"Unknown priority: {priority}")
+    options = options or {}
+    job_id = get_job_id(source, collection, options)
+
+    with _submit_lock(job_id) as acquired:
+        # Not acquired: the same job is being queued by another request
+        if not acquired:
+            return job_id
+        if AsyncResult(job_id, app=celery_app).state not in _RESUBMITTABLE_STATES:
+            return job_id
+
+        # Results only exist once a worker picks the job, record it as queued now
+        celery_app.backend.store_result(job_id, {"job_id": job_id}, "QUEUED")
+        process_file.apply_async(
+            args=(source, collection, options),
+            task_id=job_id,
+            priority=priorities[priority],
+        )
+    return job_id
+
+
+def get_job_status(job_id: str) -> IngestionJobStatus:
+    """Return the state, stage and progress of a job."""
+    result = AsyncResult(job_id, app=celery_app)
+    status = IngestionJobStatus(job_id=job_id, state=result.state)
+    if result.state == "SUCCESS":
+        status.progress = 1.0
+        status.result = result.result
+    elif result.state == "FAILURE":
+        status.error = repr(result.result)
+    elif isinstance(result.info, dict):
+        status.stage = result.info.get("stage")
+        status.progress = result.info.get("progress", 0.0)
+        status.page_no = result.info.get("page_no")
+        status.num_pages = result.info.get("num_pages")
+    return status
@@ -1,4 +1,12 @@
+from dataclasses import dataclass, field
 from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, HttpUrl
+
+from backend.config.settings import _settings
+from backend.exceptions.model import NotImplementedException
 
 
 class DocumentType(str, Enum):
@@ -11,6 +19,15 @@ class DocumentType(str, Enum):
     AUDIO = "audio"
     VIDEO = "video"
 
+    @classmethod
+    def from_path(cls, doc_path: Path) -> "DocumentType":
+        """Get the document type from the file extension."""
+        suffix = doc_path.suffix.lower()
+        for document_type in cls:
+            if suffix in DocumentSuffix[document_type.name].value:
+                return document_type
+        raise NotImplementedException(f"Unsupported document type: {suffix}")
+
 
 class DocumentSuffix(str, Enum):
     PDF = [".pdf"]
@@ -21,3 +38,167 @@ class DocumentSuffix(str, Enum):
     IMAGE = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".ico", ".webp"]
     AUDIO = [".mp3", ".wav", ".ogg", ".aac", ".m4a", ".wma", ".flac"]
     VIDEO = [".mp4", ".avi", ".mov", ".wmv", ".flv", ".mkv", ".webm"]
+
+
+@dataclass
+class OcrStats:
+    pages: int = 0
+    # Pages rasterized and OCRed in full, and how many were OCRed for each reason
+    ocr_pages: List[int] = field(default_factory=list)
+    reasons: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def text_layer_pages(self) -> int:
+        return self.pages - len(self.ocr_pages)
+
+    def merge(self, other: "OcrStats") -> None:
+        self.pages += other.pages
+        self.ocr_pages.extend(other.ocr_pages)
+        for reason, count in other.reasons.items():
+            self.reasons[reason] = self.reasons.get(reason, 0) + count
+
+
+@dataclass
+class PictureDescriptionStats:
+    # Pictures large enough to be described
+    pictures: int = 0
+    # Requests sent to the VLM, pictures served from the cache, pictures
+    # sharing their description with an identical one of the same document
+    described: int = 0
+    cached: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    def merge(self, other: "PictureDescriptionStats") -> None:
+        self.pictures += other.pictures
+        self.described += other.described
+        self.cached += other.cached
+        self.duplicates += other.duplicates
+        self.failed += other.failed
+        self.seconds += other.seconds
+
+
+@dataclass
+class MemoryStats:
+    budget_mb: int = 0
+    # Resident set size before the first window and at its highest
+    baseline_rss_mb: float = 0.0
+    peak_rss_mb: float = 0.0
+    # Pages of every window, in order
+    window_pages: List[int] = field(default_factory=list)
+    # Windows that ended with the resident set size above the budget
+    over_budget: int = 0
+
+
+@dataclass
+class ExtractionResult:
+    doc_path: Path
+    # DoclingDocument, left empty when the document was written to output_path
+    document: Optional[Any] = None
+    output_path: Optional[Path] = None
+    num_pages: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    ocr_stats: Optional[OcrStats] = None
+    memory_stats: Optional[MemoryStats] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ExtractedPicture(BaseModel):
+    caption: str = ""
+    description: Optional[str] = None
+
+
+class ExtractedPage(BaseModel):
+    """Content of one page, as streamed while the document is converted."""
+
+    page_no: int
+    num_pages: int
+    text: str = Field(..., description="Page content as Markdown")
+    tables: List[str] = Field(default_factory=list, description="Markdown tables")
+    pictures: List[ExtractedPicture] = Field(default_factory=list)
+
+
+class ChunkBoundingBox(BaseModel):
+    """Box of a document item on a page, origin at the top left."""
+
+    page_no: int
+    # Named like docling's BoundingBox.l/t/r/b, chunk payloads store them as is
+    l: float  # noqa: E741
+    t: float
+    r: float
+    b: float
+
+
+class DocumentChunk(BaseModel):
+    """Piece of a document sized for embedding."""
+
+    index: int
+    text: str
+    num_tokens: int
+    headings: Dict[str, str] = Field(
+        default_factory=dict, description="Enclosing headers by configured name"
+    )
+    page_nos: List[int] = Field(default_factory=list)
+    bboxes: List[ChunkBoundingBox] = Field(default_factory=list)
+
+
+class ChunkDuplicate(BaseModel):
+    """Chunk left out of the index because it repeats another one."""
+
+    index: int = Field(..., description="Index of the chunk in its document")
+    num_tokens: int
+    similarity: float = Field(..., description="Estimated Jaccard similarity")
+    point_id: Optional[str] = Field(
+        None, description="Point repeated, from another document"
+    )
+    chunk_index: Optional[int] = Field(
+        None, description="Earlier chunk repeated, from the same document"
+    )
+
+
+class DedupReport(BaseModel):
+    chunks: int = 0
+    duplicates: int = 0
+    # Repeating chunks of other documents, the others repeat their own document
+    cross_document: int = 0
+    skipped_tokens: int = 0
+    total_tokens: int = 0
+
+    @property
+    def skipped_ratio(self) -> float:
+        return self.skipped_tokens / self.total_tokens if self.total_tokens else 0.0
+
+
+class IngestionJobRequest(BaseModel):
+    source: HttpUrl = Field(..., description="URL of the document to ingest")
+    collection: str = Field(
+        _settings.qdrant.default_collection, description="Target collection"
+    )
+    priority: Literal["high", "normal", "low"] = Field(
+        "normal", description="Queue priority"
+    )
+    do_ocr: bool = Field(True, description="OCR pages without a usable text layer")
+    document_id: Optional[str] = Field(
+        None,
+        description="Id of the document across versions, the source by default; "
+        "a new version only re-indexes the chunks that changed",
+    )
+    revision: Optional[str] = Field(
+        None, description="Set to ingest the source again once its content changed"
+    )
+
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    state: str = Field(..., description="QUEUED, PROGRESS, SUCCESS, FAILURE, ...")
+    stage: Optional[str] = Field(None, description="Pipeline stage being run")
+    progress: float = Field(0.0, description="Overall progress between 0 and 1")
+    page_no: Optional[int] = Field(None, description="Last extracted page")
+    num_pages: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
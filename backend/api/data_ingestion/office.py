@@ -0,0 +1,284 @@
+"""Conversion of legacy Office documents through persistent LibreOffice servers.
+
+DOCX, XLSX and PPTX are parsed natively by Docling. The binary DOC, XLS and
+PPT formats are first converted to their Open XML counterparts by headless
+LibreOffice. Starting LibreOffice takes seconds, so a small pool of
+``unoserver`` processes is started on first use and reused across documents.
+Hosts without ``unoserver`` fall back to one ``soffice --convert-to`` per file.
+"""
+
+import atexit
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.config.settings import _settings
+from backend.exceptions.model import NotImplementedException
+
+# Legacy suffix -> format handled by a native Docling backend
+LEGACY_OFFICE_FORMATS: Dict[str, str] = {
+    ".doc": "docx",
+    ".xls": "xlsx",
+    ".ppt": "pptx",
+}
+
+
+class LibreOfficePool:
+    """Pool of persistent headless LibreOffice servers.
+
+    Servers listen on free ports picked by the system, so several processes,
+    e.g. prefork Celery workers, each run their own pool side by side.
+    """
+
+    def __init__(self, size: int, timeout_seconds: int):
+        self._size = size
+        self._timeout_seconds = timeout_seconds
+        # Slot -> (server, XML-RPC port)
+        self._servers: Dict[int, Tuple[subprocess.Popen, int]] = {}
+        # Slots of the servers not converting anything right now
+        self._idle: "queue.Queue[int]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            for slot in range(self._size):
+                self._idle.put(slot)
+            # Conversions run in threads so that a wedged server times out
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._size, thread_name_prefix="libreoffice"
+            )
+            self._started = True
+
+    def _ensure_server(self, slot: int) -> int:
+        """Start the server of a slot unless it is running.
+
+        Returns:
+            int: XML-RPC port of the server.
+        """
+        entry = self._servers.get(slot)
+        if entry is not None and entry[0].poll() is None:
+            return entry[1]
+
+        executable = shutil.which("unoserver")
+        if executable is None:
+            raise NotImplementedException("unoserver is not installed")
+        for _ in range(3):
+            # unoserver listens on an XML-RPC port and talks UNO on another
+            port, uno_port = _free_port(), _free_port()
+            logger.info(f"Starting LibreOffice server on port {port}")
+            server = subprocess.Popen(
+                [
+                    executable,
+                    "--interface",
+                    "127.0.0.1",
+                    "--port",
+                    str(port),
+                    "--uno-port",
+                    str(uno_port),
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self._servers[slot] = (server, port)
+            deadline = time.monotonic() + self._timeout_seconds
+            # A server that exited lost its port to another process, anything
+            # answering on the port is not this server
+            while time.monotonic() < deadline and server.poll() is None:
+                try:
+                    with socket.create_connection(("127.0.0.1", port), timeout=1):
+                        return port
+                except OSError:
+                    time.sleep(0.2)
+            self._stop_server(slot)
+            if time.monotonic() >= deadline:
+                break
+            logger.warning(f"LibreOffice server on port {port} exited, retrying")
+        raise TimeoutError("LibreOffice server did not start")
+
+    def convert(self, doc_path: Path, output_folder: Path, convert_to: str) -> Path:
+        """Convert a document with one of the pooled servers.
+
+        Args:
+            doc_path: Path to the document.
+            output_folder: Folder receiving the converted document.
+            convert_to: Target format, e.g. "docx" or "pdf".
+
+        Returns:
+            Path: The converted document.
+
+        Raises:
+            TimeoutError: The conversion took longer than the timeout, the
+                server is restarted for the next document.
+        """
+        output_folder.mkdir(parents=True, exist_ok=True)
+        output_path = output_folder / f"{doc_path.stem}.{convert_to}"
+        if shutil.which("unoserver") is None:
+            return _convert_with_soffice(
+                doc_path, output_path, convert_to, self._timeout_seconds
+            )
+
+        from unoserver.client import UnoClient
+
+        self._start()
+        slot = self._idle.get()
+        try:
+            port = self._ensure_server(slot)
+            started = time.perf_counter()
+            future = self._executor.submit(
+                UnoClient(server="127.0.0.1", port=str(port)).convert,
+                inpath=str(doc_path),
+                outpath=str(output_path),
+                convert_to=convert_to,
+            )
+            try:
+                future.result(timeout=self._timeout_seconds)
+            except FutureTimeoutError:
+                raise TimeoutError(
+                    f"Converting {doc_path.name} to {convert_to} took longer "
+                    f"than {self._timeout_seconds}s"
+                ) from None
+            logger.debug(
+                f"Converted {doc_path.name} to {convert_to} in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+        except Exception:
+            # The server may be wedged, restart it for the next document.
+            # Stopping it also ends a request still waiting for it
+            self._stop_server(slot)
+            raise
+        finally:
+            self._idle.put(slot)
+        return output_path
+
+    def _stop_server(self, slot: int) -> None:
+        server, _ = self._servers.pop(slot, (None, None))
+        if server is not None and server.poll() is None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    def close(self) -> None:
+        """Stop every server."""
+        for slot in list(self._servers):
+            self._stop_server(slot)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _convert_with_soffice(
+    doc_path: Path, output_path: Path, convert_to: str, timeout_seconds: int
+) -> Path:
+    executable = shutil.which("soffice") or shutil.which("libreoffice")
+    if executable is None:
+        raise NotImplementedException(
+            f"LibreOffice is required to extract {doc_path.suffix} documents"
+        )
+    logger.warning("unoserver is not installed, starting LibreOffice for this file")
+    # A private profile lets several conversions run side by side
+    with tempfile.TemporaryDirectory() as profile:
+        subprocess.run(
+            [
+                executable,
+                f"-env:UserInstallation=file://{profile}",
+                "--headless",
+                "--convert-to",
+                convert_to,
+                "--outdir",
+                str(output_path.parent),
+                str(doc_path),
+            ],
+            check=True,
+            capture_output=True,
+            timeout=timeout_seconds,
+        )
+    return output_path
+
+
+def convert_legacy_office(doc_path: Path, output_folder: Path) -> Optional[Path]:
+    """Convert a DOC, XLS or PPT document to the matching Open XML format.
+
+    Args:
+        doc_path: Path to the document.
+        output_folder: Folder receiving the converted document.
+
+    Returns:
+        Optional[Path]: The converted document, None for other formats.
+    """
+    convert_to = LEGACY_OFFICE_FORMATS.get(doc_path.suffix.lower())
+    if convert_to is None:
+        return None
+    return office_pool.convert(doc_path, output_folder, convert_to)
+
+
+def benchmark_office_formats(
+    doc_paths: Iterable[Path], output_folder: Path
+) -> List[dict]:
+    """Compare native extraction of Office documents with a round trip via PDF.
+
+    Both paths skip the extraction cache and use the default converter
+    options, with OCR enabled as production does.
+
+    Args:
+        doc_paths: DOCX, XLSX or PPTX documents.
+        output_folder: Scratch folder for converted documents.
+
+    Returns:
+        List[dict]: Per-document timings and throughput in pages per second.
+    """
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+    service = DoclingExtractionService()
+    results = []
+    for doc_path in doc_paths:
+        started = time.perf_counter()
+        native = service._extract_document(doc_path, output_folder, use_cache=False)
+        native_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pdf_path = office_pool.convert(doc_path, output_folder, "pdf")
+        via_pdf = service._extract_document(pdf_path, output_folder, use_cache=False)
+        via_pdf_seconds = time.perf_counter() - started
+
+        num_pages = len(via_pdf.pages)
+        results.append(
+            {
+                "document": doc_path.name,
+                "pages": num_pages,
+                "native_seconds": native_seconds,
+                "via_pdf_seconds": via_pdf_seconds,
+                "native_pages_per_second": num_pages / max(native_seconds, 1e-9),
+                "via_pdf_pages_per_second": num_pages / max(via_pdf_seconds, 1e-9),
+                "native_characters": len(native.export_to_text()),
+                "via_pdf_characters": len(via_pdf.export_to_text()),
+            }
+        )
+    return results
+
+
+office_pool = LibreOfficePool(
+    size=_settings.extraction.office_pool_size,
+    timeout_seconds=_settings.extraction.office_timeout_seconds,
+)
+atexit.register(office_pool.close)
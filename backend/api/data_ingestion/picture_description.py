@@ -0,0 +1,430 @@
+"""Picture descriptions from an OpenAI-compatible VLM server.
+
+Docling's API description model sends one request at a time and describes
+every occurrence of a picture. Here the converter only renders the pictures;
+they are described afterwards through a keep-alive connection pool with
+bounded concurrency. Pictures are deduplicated by a perceptual hash, so a
+logo repeated on every page is described once, and descriptions are kept in
+memory and on disk across documents. Identical pictures requested by several
+documents at the same time share one request.
+
+All requests run on one event loop thread owned by the describer, so the
+connection pool outlives a single document and a single caller thread.
+"""
+
+import asyncio
+import atexit
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from docling_core.types.doc import (
+    DescriptionMetaField,
+    DoclingDocument,
+    PictureItem,
+    PictureMeta,
+)
+from loguru import logger
+from PIL import Image
+
+from backend.api.data_ingestion.model import PictureDescriptionStats
+from backend.config.settings import _settings
+
+# Side of the difference hash grid, the hash has HASH_SIZE ** 2 bits
+HASH_SIZE = 32
+# Side of the grid of average colours added to the hash
+COLOR_GRID_SIZE = 2
+# Status codes worth retrying, the server is busy or restarting
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+@dataclass(frozen=True)
+class VlmEndpoint:
+    """An OpenAI-compatible chat completions endpoint and its request options."""
+
+    url: str
+    model: str
+    prompt: str
+    seed: int = 42
+    max_completion_tokens: int = 512
+
+    def fingerprint(self) -> str:
+        """Return a digest of the options that shape the descriptions."""
+        options = asdict(self)
+        # The same model served elsewhere describes pictures the same way
+        options.pop("url")
+        encoded = json.dumps(options, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class ImageHash:
+    """Perceptual hash of a picture."""
+
+    # Difference hash, HASH_SIZE ** 2 bits
+    bits: int
+    # Coarse average colours and aspect ratio, only pictures in the same
+    # bucket are compared
+    bucket: str
+
+    def distance(self, other: "ImageHash") -> int:
+        """Return the number of differing bits."""
+        return (self.bits ^ other.bits).bit_count()
+
+    def __str__(self) -> str:
+        return f"{self.bits:0{HASH_SIZE ** 2 // 4}x}-{self.bucket}"
+
+
+def image_hash(image: Image.Image) -> ImageHash:
+    """Return the perceptual hash of an image.
+
+    The image is reduced to a grayscale grid and every bit records whether a
+    cell is brighter than its right neighbour, so the same picture rendered
+    at another scale or re-encoded differs by a few bits at most. The
+    difference hash ignores colours, so icons differing only by colour are
+    told apart by their bucket.
+    """
+    grid = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = list(grid.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for column in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    colors = image.convert("RGB").resize((COLOR_GRID_SIZE, COLOR_GRID_SIZE), Image.BOX)
+    # 16 levels per channel
+    color = "".join(f"{value >> 4:x}" for rgb in colors.getdata() for value in rgb)
+    ratio = round(image.width / max(image.height, 1), 1)
+    return ImageHash(bits=bits, bucket=f"{color}-{ratio}")
+
+
+def _find_similar(
+    candidates: Iterable[Tuple[ImageHash, str]], hashed: ImageHash, max_distance: int
+) -> Optional[str]:
+    for candidate, key in candidates:
+        if candidate.distance(hashed) <= max_distance:
+            return key
+    return None
+
+
+def _encode_image(image: Image.Image) -> str:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class PictureDescriber:
+    """Describes the pictures of documents with a VLM server."""
+
+    def __init__(
+        self,
+        concurrency: int,
+        timeout_seconds: int,
+        max_retries: int,
+        min_area: float,
+        max_hash_distance: int,
+        memory_entries: int,
+    ):
+        self._concurrency = concurrency
+        self._timeout_seconds = timeout_seconds
+        self._max_retries = max_retries
+        self._min_area = min_area
+        self._max_hash_distance = max_hash_distance
+        self._memory_entries = memory_entries
+        # Key -> (endpoint fingerprint, hash, description), least recent first
+        self._memory: "OrderedDict[str, Tuple[str, ImageHash, str]]" = OrderedDict()
+        # (endpoint fingerprint, bucket) -> keys of the remembered descriptions
+        self._buckets: Dict[Tuple[str, str], Dict[str, ImageHash]] = {}
+        self._memory_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Created on the event loop thread, used only there
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="picture-describer",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self._concurrency,
+                    max_keepalive_connections=self._concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self._client
+
+    def _is_describable(self, doc: DoclingDocument, picture: PictureItem) -> bool:
+        if picture.meta is not None and picture.meta.description is not None:
+            return False
+        if not picture.prov:
+            return True
+        prov = picture.prov[0]
+        page = doc.pages.get(prov.page_no)
+        if page is None:
+            return True
+        page_area = page.size.width * page.size.height
+        return page_area <= 0 or prov.bbox.area() / page_area >= self._min_area
+
+    def _get_cached(
+        self,
+        key: str,
+        fingerprint: str,
+        hashed: ImageHash,
+        cache_dir: Optional[Path],
+    ) -> Optional[str]:
+        with self._memory_lock:
+            if key not in self._memory:
+                # A description of the same picture rendered differently
+                bucket = self._buckets.get((fingerprint, hashed.bucket), {})
+                key = (
+                    _find_similar(
+                        ((other, key) for key, other in bucket.items()),
+                        hashed,
+                        self._max_hash_distance,
+                    )
+                    or key
+                )
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][2]
+        if cache_dir is None:
+            return None
+        try:
+            text = (cache_dir / key[:2] / f"{key}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cached picture description {key}: {e}")
+            return None
+        self._remember(key, fingerprint, hashed, text)
+        return text
+
+    def _remember(
+        self, key: str, fingerprint: str, hashed: ImageHash, text: str
+    ) -> None:
+        with self._memory_lock:
+            self._memory[key] = (fingerprint, hashed, text)
+            self._memory.move_to_end(key)
+            self._buckets.setdefault((fingerprint, hashed.bucket), {})[key] = hashed
+            while len(self._memory) > self._memory_entries:
+                old_key, (old_fingerprint, old_hashed, _) = self._memory.popitem(
+                    last=False
+                )
+                bucket_key = (old_fingerprint, old_hashed.bucket)
+                self._buckets[bucket_key].pop(old_key, None)
+                if not self._buckets[bucket_key]:
+                    del self._buckets[bucket_key]
+
+    def _store(
+        self,
+        key: str,
+        fingerprint: str,
+        hashed: ImageHash,
+        text: str,
+        cache_dir: Optional[Path],
+    ) -> None:
+        self._remember(key, fingerprint, hashed, text)
+        if cache_dir is None:
+            return
+        path = cache_dir / key[:2] / f"{key}.txt"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to cache picture description {key}: {e}")
+
+    async def _request(self, endpoint: VlmEndpoint, image_b64: str) -> str:
+        client = self._get_client()
+        payload = {
+            "model": endpoint.model,
+            "seed": endpoint.seed,
+            "max_completion_tokens": endpoint.max_completion_tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:image/png;base64,{image_b64}"},
+                        },
+                        {"type": "text", "text": endpoint.prompt},
+                    ],
+                }
+            ],
+        }
+        async with self._semaphore:
+            for attempt in range(self._max_retries + 1):
+                try:
+                    response = await client.post(endpoint.url, json=payload)
+                    if (
+                        response.status_code not in _RETRY_STATUS_CODES
+                        or attempt == self._max_retries
+                    ):
+                        response.raise_for_status()
+                        content = response.json()["choices"][0]["message"]["content"]
+                        return content.strip()
+                except httpx.TransportError:
+                    if attempt == self._max_retries:
+                        raise
+                await asyncio.sleep(2**attempt)
+        raise AssertionError("unreachable")
+
+    async def _describe_one(
+        self, key: str, endpoint: VlmEndpoint, image_b64: str
+    ) -> str:
+        # Pictures requested by several documents at once share one request
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(endpoint, image_b64))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _describe_all(
+        self, endpoint: VlmEndpoint, images: Dict[str, str]
+    ) -> List:
+        return await asyncio.gather(
+            *(
+                self._describe_one(key, endpoint, image_b64)
+                for key, image_b64 in images.items()
+            ),
+            return_exceptions=True,
+        )
+
+    def describe(
+        self,
+        doc: DoclingDocument,
+        endpoint: VlmEndpoint,
+        cache_dir: Optional[Path] = None,
+    ) -> PictureDescriptionStats:
+        """Describe the pictures of a document in place.
+
+        Pictures must have been rendered by the converter
+        (``generate_picture_images``). A picture that cannot be described is
+        left without a description and counted as failed.
+
+        Args:
+            doc: The converted document.
+            endpoint: The VLM endpoint.
+            cache_dir: Folder of the persistent description cache.
+
+        Returns:
+            PictureDescriptionStats: Counts of described, cached, duplicate
+                and failed pictures.
+        """
+        started = time.perf_counter()
+        stats = PictureDescriptionStats()
+        fingerprint = endpoint.fingerprint()
+        pictures: Dict[str, List[PictureItem]] = {}
+        # Bucket -> hashes and keys of the distinct pictures of the document
+        distinct: Dict[str, List[Tuple[ImageHash, str]]] = {}
+        hashes: Dict[str, ImageHash] = {}
+        images: Dict[str, str] = {}
+        descriptions: Dict[str, str] = {}
+        for picture in doc.pictures:
+            if not self._is_describable(doc, picture):
+                continue
+            image = picture.get_image(doc)
+            if image is None:
+                continue
+            stats.pictures += 1
+            hashed = image_hash(image)
+            key = _find_similar(
+                distinct.get(hashed.bucket, ()), hashed, self._max_hash_distance
+            )
+            if key is not None:
+                stats.duplicates += 1
+                pictures[key].append(picture)
+                continue
+
+            key = hashlib.sha256(f"{fingerprint}-{hashed}".encode()).hexdigest()
+            distinct.setdefault(hashed.bucket, []).append((hashed, key))
+            hashes[key] = hashed
+            pictures[key] = [picture]
+            text = self._get_cached(key, fingerprint, hashed, cache_dir)
+            if text is not None:
+                stats.cached += 1
+                descriptions[key] = text
+            else:
+                images[key] = _encode_image(image)
+
+        if images:
+            results = asyncio.run_coroutine_threadsafe(
+                self._describe_all(endpoint, images), self._get_loop()
+            ).result()
+            for key, result in zip(images, results):
+                if isinstance(result, Exception):
+                    stats.failed += len(pictures[key])
+                    logger.warning(f"Failed to describe a picture: {result!r}")
+                    continue
+                stats.described += 1
+                self._store(key, fingerprint, hashes[key], result, cache_dir)
+                descriptions[key] = result
+
+        for key, text in descriptions.items():
+            for picture in pictures[key]:
+                if picture.meta is None:
+                    picture.meta = PictureMeta()
+                picture.meta.description = DescriptionMetaField(
+                    text=text, created_by=endpoint.model
+                )
+
+        stats.seconds = time.perf_counter() - started
+        if stats.pictures:
+            logger.info(
+                f"Described {stats.pictures} pictures in {stats.seconds:.1f}s: "
+                f"{stats.described} requested, {stats.cached} cached, "
+                f"{stats.duplicates} duplicates, {stats.failed} failed"
+            )
+        return stats
+
+    def close(self) -> None:
+        """Close the connection pool and stop the event loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+
+picture_describer = PictureDescriber(
+    concurrency=_settings.extraction.vlm_concurrency,
+    timeout_seconds=_settings.extraction.vlm_timeout_seconds,
+    max_retries=_settings.extraction.vlm_max_retries,
+    min_area=_settings.extraction.picture_min_area,
+    max_hash_distance=_settings.extraction.picture_max_hash_distance,
+    memory_entries=_settings.extraction.picture_memory_entries,
+)
+atexit.register(picture_describer.close)
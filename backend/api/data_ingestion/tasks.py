@@ -0,0 +1,731 @@
+"""Ingestion pipeline tasks.
+
+Stages: download -> extract -> chunk -> diff -> dedup -> embed -> index.
+
+A job runs as one ``process_file`` task whose id is the job id. Every stage
+writes its output into the job folder and then a marker file, so a retried
+job, or one redelivered after its worker died, resumes after the last
+completed stage instead of starting over. The folder is removed once the job
+succeeds. Progress is published through the task state.
+
+A document ingested again, under the same ``document_id`` option, is diffed
+against its previous version: only its new and changed chunks are embedded,
+and the points of the chunks it lost are deleted.
+
+Extraction dependencies are imported inside the stages, so importing this
+module to submit jobs stays cheap.
+"""
+
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+from celery import Task
+from loguru import logger
+
+from backend.celery_app import celery_app
+from backend.config.settings import _settings
+
+STAGES = ("download", "extract", "chunk", "diff", "dedup", "embed", "index")
+# Errors worth retrying, anything else fails the job at once
+TRANSIENT_ERRORS = (OSError, TimeoutError, httpx.TransportError)
+
+
+def get_job_folder(job_id: str) -> Path:
+    return Path(_settings.process_file.root_download_folder) / "jobs" / job_id
+
+
+class JobContext:
+    """State shared by the stages of one job."""
+
+    def __init__(
+        self, task: Task, job_id: str, source: str, collection: str, options: dict
+    ):
+        self.task = task
+        self.job_id = job_id
+        self.source = source
+        self.collection = collection
+        self.options = options
+        self.folder = get_job_folder(job_id)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.stage_index = 0
+        self._last_report = 0.0
+
+    @property
+    def document_id(self) -> str:
+        """Id of the document across its versions, the source by default."""
+        return self.options.get("document_id") or self.source
+
+    @property
+    def document_path(self) -> Path:
+        """Downloaded document, or the source itself when it is a local file."""
+        if _is_url(self.source):
+            suffix = Path(urlparse(self.source).path).suffix.lower()
+            return self.folder / f"source{suffix}"
+        return Path(self.source)
+
+    @property
+    def pages_path(self) -> Path:
+        return self.folder / "pages.jsonl"
+
+    @property
+    def chunks_path(self) -> Path:
+        return self.folder / "chunks.jsonl"
+
+    @property
+    def diff_path(self) -> Path:
+        """Folder of the added chunks, the moved ones and of diff.json."""
+        return self.folder / "diff"
+
+    @property
+    def changed_chunks_path(self) -> Path:
+        """Chunks new since the previous version, and the ones checked again."""
+        return self.diff_path / "chunks.jsonl"
+
+    @property
+    def dedup_path(self) -> Path:
+        """Folder of the kept chunks, their minhash.npy, duplicates and report."""
+        return self.folder / "dedup"
+
+    @property
+    def unique_chunks_path(self) -> Path:
+        """Chunks to embed and index, once duplicates are left out."""
+        return self.dedup_path / "chunks.jsonl"
+
+    @property
+    def embeddings_path(self) -> Path:
+        """Folder of dense.npy, and of sparse.npz with a sparse encoder."""
+        return self.folder / "embeddings"
+
+    @property
+    def removed_texts_path(self) -> Path:
+        """Texts of the removed chunks, read before their points are deleted."""
+        return self.folder / "removed_texts.json"
+
+    def is_done(self, stage: str) -> bool:
+        return (self.folder / f"{stage}.done").exists()
+
+    def mark_done(self, stage: str) -> None:
+        (self.folder / f"{stage}.done").touch()
+
+    def report(self, stage_progress: float, force: bool = False, **meta) -> None:
+        """Publish the progress of the current stage, at most twice a second."""
+        now = time.monotonic()
+        if not force and now - self._last_report < 0.5:
+            return
+        self._last_report = now
+        self.task.update_state(
+            task_id=self.job_id,
+            state="PROGRESS",
+            meta={
+                "job_id": self.job_id,
+                "stage": STAGES[self.stage_index],
+                "stages": list(STAGES),
+                "stage_progress": stage_progress,
+                "progress": (self.stage_index + stage_progress) / len(STAGES),
+                **meta,
+            },
+        )
+
+
+def _is_url(source: str) -> bool:
+    return urlparse(source).scheme in ("http", "https")
+
+
+def _write_atomic(path: Path, write: Callable[[Path], None]) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class DownloadRejectedError(ValueError):
+    """A document URL the workers must not, or did not, download."""
+
+
+def _check_download_url(url: httpx.URL) -> None:
+    """Reject URLs resolving to addresses internal to the deployment.
+
+    Raises:
+        DownloadRejectedError: If the URL is not http(s), or its host resolves
+            to a private, loopback, link-local, reserved or multicast address
+            and is not in the ``allowed_download_hosts`` setting.
+    """
+    if url.scheme not in ("http", "https"):
+        raise DownloadRejectedError(f"Unsupported URL scheme: {url.scheme}")
+    if url.host in _settings.process_file.allowed_download_hosts:
+        return
+    port = url.port or (443 if url.scheme == "https" else 80)
+    for *_, sockaddr in socket.getaddrinfo(url.host, port, proto=socket.IPPROTO_TCP):
+        address = ipaddress.ip_address(sockaddr[0])
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise DownloadRejectedError(
+                f"{url.host} resolves to the non-public address {address}"
+            )
+
+
+def _download(context: JobContext) -> None:
+    if not _is_url(context.source):
+        if not context.document_path.exists():
+            raise FileNotFoundError(f"Document not found: {context.source}")
+        return
+
+    config = _settings.process_file
+    too_large = f"{context.source} is larger than {config.max_download_bytes} bytes"
+
+    def save(response: httpx.Response, tmp_path: Path) -> None:
+        response.raise_for_status()
+        total = int(response.headers.get("Content-Length") or 0)
+        if total > config.max_download_bytes:
+            raise DownloadRejectedError(too_large)
+        size = 0
+        with open(tmp_path, "wb") as file:
+            for data in response.iter_bytes(1024 * 1024):
+                size += len(data)
+                if size > config.max_download_bytes:
+                    raise DownloadRejectedError(too_large)
+                file.write(data)
+                if total:
+                    context.report(response.num_bytes_downloaded / total)
+
+    def write(tmp_path: Path) -> None:
+        with httpx.Client(timeout=config.download_timeout) as client:
+            url = httpx.URL(context.source)
+            # Redirects are followed by hand, to check every host on the way
+            for _ in range(config.max_download_redirects + 1):
+                _check_download_url(url)
+                response = client.send(client.build_request("GET", url), stream=True)
+                if not response.is_redirect:
+                    break
+                response.close()
+                url = response.next_request.url
+            else:
+                raise DownloadRejectedError(f"Too many redirects for {context.source}")
+            try:
+                save(response, tmp_path)
+            finally:
+                response.close()
+
+    try:
+        _write_atomic(context.document_path, write)
+    except DownloadRejectedError:
+        # Up to max_download_bytes would be left in the job folder otherwise
+        context.document_path.with_name(f"{context.document_path.name}.tmp").unlink(
+            missing_ok=True
+        )
+        raise
+
+
+def _extract(context: JobContext) -> None:
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+    from backend.api.data_ingestion.model import ExtractedPage
+
+    def report(page: ExtractedPage) -> None:
+        context.report(
+            page.page_no / page.num_pages,
+            page_no=page.page_no,
+            num_pages=page.num_pages,
+        )
+
+    result = DoclingExtractionService().extract_to_file(
+        context.document_path,
+        context.pages_path,
+        output_folder=Path(_settings.process_file.root_download_folder),
+        memory_budget_mb=context.options.get("memory_budget_mb"),
+        on_page=report,
+        do_ocr=context.options.get("do_ocr", True),
+    )
+    if result.memory_stats is not None:
+        context.report(
+            1.0, force=True, peak_rss_mb=round(result.memory_stats.peak_rss_mb)
+        )
+
+
+def _chunk(context: JobContext) -> None:
+    from backend.api.data_ingestion.chunking import Chunker
+    from backend.api.data_ingestion.model import ExtractedPage
+
+    def read_pages(file) -> Iterator[ExtractedPage]:
+        for line in file:
+            page = ExtractedPage.model_validate_json(line)
+            context.report(page.page_no / page.num_pages, page_no=page.page_no)
+            yield page
+
+    def write(tmp_path: Path) -> None:
+        with open(context.pages_path, encoding="utf-8") as pages, open(
+            tmp_path, "w", encoding="utf-8"
+        ) as file:
+            for chunk in Chunker().chunk_pages(read_pages(pages)):
+                file.write(chunk.model_dump_json() + "\n")
+
+    _write_atomic(context.chunks_path, write)
+
+
+def _diff(context: JobContext) -> None:
+    from backend.api.data_ingestion.indexing import chunk_hash, point_id
+    from backend.api.data_ingestion.model import DocumentChunk
+    from backend.api.data_ingestion.versions import (
+        diff_chunks,
+        document_version_service,
+    )
+    from backend.databases.db import SessionLocal
+    from backend.databases.qdrant import get_qdrant_client
+
+    with SessionLocal() as db_session:
+        previous = document_version_service.get_latest(
+            db_session, context.collection, context.document_id
+        )
+        previous_version = previous.version if previous else None
+        previous_hashes = list(previous.chunk_hashes) if previous else []
+
+    with open(context.chunks_path, encoding="utf-8") as file:
+        chunks = [DocumentChunk.model_validate_json(line) for line in file]
+    hashes = [chunk_hash(chunk) for chunk in chunks]
+    diff = diff_chunks(previous_hashes, hashes)
+    diff.previous_version = previous_version
+
+    # Unchanged chunks left out as duplicates have no point, the chunks they
+    # repeat may be gone or changed since, so they are checked again
+    client = get_qdrant_client() if previous is not None else None
+    if client is not None and client.collection_exists(context.collection):
+        added = set(diff.added)
+        unchanged = {
+            point_id(context.document_id, digest): index
+            for index, digest in reversed(list(enumerate(hashes)))
+            if index not in added
+        }
+        ids = list(unchanged)
+        for start in range(0, len(ids), 256):
+            for point in client.retrieve(
+                context.collection, ids[start : start + 256], with_payload=False
+            ):
+                unchanged.pop(str(point.id), None)
+        diff.rechecked = sorted(unchanged.values())
+
+    tmp_path = context.folder / "diff.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+    for name, indices in (
+        ("chunks.jsonl", sorted(diff.added + diff.rechecked)),
+        ("moved.jsonl", diff.moved),
+    ):
+        with open(tmp_path / name, "w", encoding="utf-8") as file:
+            for index in indices:
+                file.write(chunks[index].model_dump_json() + "\n")
+    (tmp_path / "diff.json").write_text(diff.model_dump_json())
+    if previous is not None:
+        logger.info(
+            f"Job {context.job_id}: {len(diff.added)} chunks added, "
+            f"{len(diff.removed)} removed and {diff.unchanged} unchanged, "
+            f"{len(diff.rechecked)} of them without a point, "
+            f"since version {previous_version} of {context.document_id}"
+        )
+
+    shutil.rmtree(context.diff_path, ignore_errors=True)
+    os.replace(tmp_path, context.diff_path)
+
+
+def _dedup(context: JobContext) -> None:
+    import numpy as np
+
+    from backend.api.data_ingestion.dedup import Deduplicator
+    from backend.api.data_ingestion.model import DedupReport, DocumentChunk
+    from backend.api.data_ingestion.versions import ChunkDiff
+
+    config = _settings.dedup
+    tmp_path = context.folder / "dedup.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+    report = DedupReport()
+
+    if not config.enabled:
+        shutil.copyfile(context.changed_chunks_path, tmp_path / "chunks.jsonl")
+    else:
+        deduplicator = Deduplicator(context.collection, context.document_id)
+        signatures: List[np.ndarray] = []
+        # Unchanged chunks with a point, repeated by the checked ones
+        diff = ChunkDiff.model_validate_json(
+            (context.diff_path / "diff.json").read_text()
+        )
+        if diff.previous_version is not None:
+            changed = set(diff.added + diff.rechecked)
+            with open(context.chunks_path, encoding="utf-8") as file:
+                indexed: List[DocumentChunk] = []
+                for index, line in enumerate(file):
+                    if index in changed:
+                        continue
+                    indexed.append(DocumentChunk.model_validate_json(line))
+                    if len(indexed) == config.batch_size:
+                        deduplicator.remember(indexed)
+                        indexed = []
+                if indexed:
+                    deduplicator.remember(indexed)
+
+        def check(chunks: List[DocumentChunk]) -> None:
+            batch_signatures, duplicates = deduplicator.check(chunks)
+            for row, (chunk, duplicate) in enumerate(zip(chunks, duplicates)):
+                report.chunks += 1
+                report.total_tokens += chunk.num_tokens
+                if duplicate is None:
+                    unique.write(chunk.model_dump_json() + "\n")
+                    signatures.append(batch_signatures[row])
+                    continue
+                report.duplicates += 1
+                report.skipped_tokens += chunk.num_tokens
+                report.cross_document += duplicate.point_id is not None
+                duplicates_file.write(duplicate.model_dump_json() + "\n")
+            context.report(
+                report.chunks / max(num_chunks, 1),
+                chunks=report.chunks,
+                duplicates=report.duplicates,
+            )
+
+        with open(context.changed_chunks_path, encoding="utf-8") as file:
+            num_chunks = sum(1 for _ in file)
+        with open(context.changed_chunks_path, encoding="utf-8") as file, open(
+            tmp_path / "chunks.jsonl", "w", encoding="utf-8"
+        ) as unique, open(
+            tmp_path / "duplicates.jsonl", "w", encoding="utf-8"
+        ) as duplicates_file:
+            batch: List[DocumentChunk] = []
+            for line in file:
+                batch.append(DocumentChunk.model_validate_json(line))
+                if len(batch) == config.batch_size:
+                    check(batch)
+                    batch = []
+            if batch:
+                check(batch)
+        np.save(
+            tmp_path / "minhash.npy",
+            np.array(signatures, dtype=np.uint32).reshape(-1, config.num_perm),
+        )
+        logger.info(
+            f"Job {context.job_id}: {report.duplicates} of {report.chunks} chunks "
+            f"are duplicates, {report.cross_document} of other documents, "
+            f"{report.skipped_ratio:.1%} of the tokens not embedded"
+        )
+    (tmp_path / "report.json").write_text(report.model_dump_json())
+
+    shutil.rmtree(context.dedup_path, ignore_errors=True)
+    os.replace(tmp_path, context.dedup_path)
+
+
+def _embed(context: JobContext) -> None:
+    import numpy as np
+
+    from backend.api.data_ingestion.embedding import SparseVectors, get_embedder
+    from backend.api.data_ingestion.model import DocumentChunk
+
+    embedder = get_embedder()
+    with open(context.unique_chunks_path, encoding="utf-8") as file:
+        num_chunks = sum(1 for _ in file)
+    tmp_path = context.folder / "embeddings.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+
+    # Written in place on disk, one row per line of chunks.jsonl
+    dense = np.lib.format.open_memmap(
+        tmp_path / "dense.npy",
+        mode="w+",
+        dtype=np.float32,
+        shape=(num_chunks, embedder.dense_encoder.dimension),
+    )
+    sparse: List[SparseVectors] = []
+    row = 0
+    with open(context.unique_chunks_path, encoding="utf-8") as file:
+        chunks = (DocumentChunk.model_validate_json(line) for line in file)
+        for batch in embedder.embed(chunks):
+            dense[row : row + len(batch.chunks)] = batch.dense
+            row += len(batch.chunks)
+            if batch.sparse is not None:
+                sparse.append(batch.sparse)
+            context.report(row / max(num_chunks, 1), chunks=row)
+    dense.flush()
+    del dense
+    if sparse:
+        SparseVectors.concatenate(sparse).save(tmp_path / "sparse.npz")
+
+    shutil.rmtree(context.embeddings_path, ignore_errors=True)
+    os.replace(tmp_path, context.embeddings_path)
+
+
+def _index(context: JobContext) -> None:
+    import numpy as np
+
+    from backend.api.data_ingestion.dedup import (
+        MinHasher,
+        forget_duplicates,
+        hand_over_duplicates,
+        record_duplicates,
+    )
+    from backend.api.data_ingestion.embedding import (
+        EmbeddedBatch,
+        SparseVectors,
+        embedding_text,
+        get_embedder,
+    )
+    from backend.api.data_ingestion.indexing import (
+        QdrantIndexWriter,
+        chunk_hash,
+        point_id,
+    )
+    from backend.api.data_ingestion.model import ChunkDuplicate, DocumentChunk
+    from backend.api.data_ingestion.versions import ChunkDiff, document_version_service
+    from backend.databases.db import SessionLocal
+
+    dense = np.load(context.embeddings_path / "dense.npy", mmap_mode="r")
+    sparse_path = context.embeddings_path / "sparse.npz"
+    sparse = SparseVectors.load(sparse_path) if sparse_path.exists() else None
+    num_chunks = len(dense)
+    sparse_encoder = get_embedder().sparse_encoder
+    # Signatures of the kept chunks, without near-duplicate detection
+    minhash_path = context.dedup_path / "minhash.npy"
+    minhash = np.load(minhash_path, mmap_mode="r") if minhash_path.exists() else None
+    hasher = MinHasher() if minhash is not None else None
+
+    with QdrantIndexWriter(context.collection, context.document_id) as writer:
+        writer.ensure_collection(
+            dense.shape[1],
+            sparse=sparse is not None,
+            sparse_idf=sparse_encoder is None or sparse_encoder.server_idf,
+        )
+        with open(context.unique_chunks_path, encoding="utf-8") as file:
+            chunks: List[DocumentChunk] = []
+            for row, line in enumerate(file):
+                chunks.append(DocumentChunk.model_validate_json(line))
+                if len(chunks) < writer.batch_size and row + 1 < num_chunks:
+                    continue
+                start = row + 1 - len(chunks)
+                batch_sparse = None
+                if sparse is not None:
+                    indptr = sparse.indptr[start : row + 2]
+                    batch_sparse = SparseVectors(
+                        indptr - indptr[0],
+                        sparse.indices[indptr[0] : indptr[-1]],
+                        sparse.values[indptr[0] : indptr[-1]],
+                    )
+                writer.add(
+                    EmbeddedBatch(chunks, dense[start : row + 1], batch_sparse),
+                    hasher.payloads(minhash[start : row + 1]) if hasher else None,
+                )
+                context.report((row + 1) / max(num_chunks, 1), chunks=row + 1)
+                chunks = []
+
+        # Unchanged chunks at a new position keep their point and vectors
+        with open(context.diff_path / "moved.jsonl", encoding="utf-8") as file:
+            moved = [DocumentChunk.model_validate_json(line) for line in file]
+        writer.set_payloads(
+            {
+                point_id(context.document_id, chunk_hash(chunk)): chunk.model_dump(
+                    include={"index", "page_nos", "bboxes"}
+                )
+                for chunk in moved
+            }
+        )
+
+        # Deleted once the new chunks are stored, searches never miss both
+        diff = ChunkDiff.model_validate_json(
+            (context.diff_path / "diff.json").read_text()
+        )
+        removed_ids = [point_id(context.document_id, digest) for digest in diff.removed]
+        # Points repeated by other documents are copied over to one of them,
+        # their texts stay in the index
+        handed_over = set(
+            hand_over_duplicates(writer.client, context.collection, removed_ids)
+        )
+        if handed_over:
+            logger.info(
+                f"Job {context.job_id}: {len(handed_over)} removed points handed "
+                f"over to the documents repeating them"
+            )
+        # Texts of the removed chunks, for encoders keeping statistics. Kept
+        # in the job folder, a rerun of the stage finds the points deleted
+        if (
+            sparse_encoder is not None
+            and not sparse_encoder.server_idf
+            and not context.removed_texts_path.exists()
+        ):
+            removed_texts = []
+            dropped_ids = [point for point in removed_ids if point not in handed_over]
+            for start in range(0, len(dropped_ids), writer.batch_size):
+                for point in writer.client.retrieve(
+                    context.collection,
+                    dropped_ids[start : start + writer.batch_size],
+                    with_payload=["text", "headings"],
+                ):
+                    removed_texts.append(
+                        embedding_text(
+                            DocumentChunk(index=0, num_tokens=0, **point.payload)
+                        )
+                    )
+            _write_atomic(
+                context.removed_texts_path,
+                lambda tmp_path: tmp_path.write_text(
+                    json.dumps(removed_texts), encoding="utf-8"
+                ),
+            )
+        writer.delete(removed_ids)
+
+    with open(context.chunks_path, encoding="utf-8") as file:
+        chunk_hashes = [
+            chunk_hash(DocumentChunk.model_validate_json(line)) for line in file
+        ]
+    # Removed and checked again, the chunks checked again are recorded anew
+    forget_duplicates(
+        writer.client,
+        context.collection,
+        context.document_id,
+        diff.removed + [chunk_hashes[index] for index in diff.rechecked],
+    )
+    duplicates_path = context.dedup_path / "duplicates.jsonl"
+    if duplicates_path.exists():
+        with open(duplicates_path, encoding="utf-8") as file:
+            repeating = {
+                duplicate.index: duplicate.point_id
+                for duplicate in map(ChunkDuplicate.model_validate_json, file)
+                if duplicate.point_id
+            }
+        with open(context.changed_chunks_path, encoding="utf-8") as file:
+            chunks = map(DocumentChunk.model_validate_json, file)
+            record_duplicates(
+                writer.client,
+                context.collection,
+                context.document_id,
+                {
+                    repeating[chunk.index]: chunk
+                    for chunk in chunks
+                    if chunk.index in repeating
+                },
+            )
+
+    # Counted once the points are stored, for encoders keeping statistics,
+    # and once per job: a rerun of the stage finds the marker
+    if sparse_encoder is not None and not context.is_done("statistics"):
+        if sparse is not None:
+            with open(context.unique_chunks_path, encoding="utf-8") as file:
+                texts = []
+                for line in file:
+                    chunk = DocumentChunk.model_validate_json(line)
+                    texts.append(embedding_text(chunk))
+                    if len(texts) == writer.batch_size:
+                        sparse_encoder.add_documents(texts)
+                        texts = []
+                if texts:
+                    sparse_encoder.add_documents(texts)
+        if context.removed_texts_path.exists():
+            removed_texts = json.loads(
+                context.removed_texts_path.read_text(encoding="utf-8")
+            )
+            for start in range(0, len(removed_texts), writer.batch_size):
+                sparse_encoder.remove_documents(
+                    removed_texts[start : start + writer.batch_size]
+                )
+        sparse_encoder.save()
+        context.mark_done("statistics")
+
+    with SessionLocal() as db_session:
+        version = document_version_service.add_version(
+            db_session,
+            context.collection,
+            context.document_id,
+            context.job_id,
+            chunk_hashes,
+            source=context.source,
+        )
+    logger.info(
+        f"Job {context.job_id}: indexed {writer.num_points} points into "
+        f"{context.collection}, deleted {len(removed_ids)}, "
+        f"version {version.version} of {context.document_id}"
+    )
+
+
+STAGE_HANDLERS: Dict[str, Callable[[JobContext], None]] = {
+    "download": _download,
+    "extract": _extract,
+    "chunk": _chunk,
+    "diff": _diff,
+    "dedup": _dedup,
+    "embed": _embed,
+    "index": _index,
+}
+
+
+@celery_app.task(
+    bind=True,
+    name="process_file",
+    acks_late=True,
+    autoretry_for=TRANSIENT_ERRORS,
+    dont_autoretry_for=(FileNotFoundError,),
+    max_retries=_settings.process_file.max_retries,
+    retry_backoff=_settings.process_file.retry_delay,
+    retry_jitter=True,
+)
+def process_file(
+    self: Task, source: str, collection: str, options: Optional[dict] = None
+) -> dict:
+    """Run the ingestion pipeline for one document.
+
+    Args:
+        source: URL of the document, or path of a file on shared storage.
+        collection: Qdrant collection receiving the chunks.
+        options: Extraction options, e.g. ``{"do_ocr": False}``, and the
+            ``document_id`` of the document across versions.
+
+    Returns:
+        dict: Job summary with per-stage durations and the duplicates left out.
+    """
+    from backend.api.data_ingestion.model import DedupReport
+    from backend.api.data_ingestion.versions import ChunkDiff
+
+    job_id = self.request.id
+    context = JobContext(self, job_id, source, collection, options or {})
+    durations: Dict[str, float] = {}
+    skipped: List[str] = []
+
+    for index, stage in enumerate(STAGES):
+        context.stage_index = index
+        if context.is_done(stage):
+            skipped.append(stage)
+            continue
+        context.report(0.0, force=True)
+        started = time.perf_counter()
+        STAGE_HANDLERS[stage](context)
+        durations[stage] = time.perf_counter() - started
+        context.mark_done(stage)
+        logger.info(f"Job {job_id}: {stage} done in {durations[stage]:.1f}s")
+
+    with open(context.chunks_path, encoding="utf-8") as chunks:
+        num_chunks = sum(1 for _ in chunks)
+    report = DedupReport.model_validate_json(
+        (context.dedup_path / "report.json").read_text()
+    )
+    diff = ChunkDiff.model_validate_json((context.diff_path / "diff.json").read_text())
+    # The stage outputs, and a downloaded document, only serve to resume a
+    # failed job; the embeddings alone take 12 KB per chunk
+    shutil.rmtree(context.folder, ignore_errors=True)
+
+    return {
+        "job_id": job_id,
+        "collection": collection,
+        "num_chunks": num_chunks,
+        "document_id": context.document_id,
+        "diff": {
+            "previous_version": diff.previous_version,
+            "added": len(diff.added),
+            "removed": len(diff.removed),
+            "moved": len(diff.moved),
+            "unchanged": diff.unchanged,
+            "rechecked": len(diff.rechecked),
+        },
+        "dedup": {**report.model_dump(), "skipped_ratio": report.skipped_ratio},
+        "durations": durations,
+        "resumed_after": skipped,
+    }
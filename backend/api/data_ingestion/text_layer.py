@@ -0,0 +1,120 @@
+"""Per-page quality checks of a PDF's embedded text layer.
+
+Born-digital pages carry text that is better than anything OCR produces, and
+rasterizing and OCRing them costs most of the extraction time. Each page is
+classified from its text layer alone, without rendering:
+
+- pages with too few characters, or with characters that are invalid or look
+  like a broken font encoding, are OCRed in full;
+- every other page keeps its text layer, and only the bitmaps placed on it
+  (scanned figures, screenshots) are OCRed.
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from backend.config.settings import _settings
+
+
+@dataclass
+class PageTextLayer:
+    page_no: int
+    num_chars: int = 0
+    # Share of characters that are replacement, private-use or control characters
+    invalid_ratio: float = 0.0
+    # Share of non-space characters that are letters or digits
+    alnum_ratio: float = 0.0
+    # Share of the page area covered by text lines and by images
+    text_coverage: float = 0.0
+    image_coverage: float = 0.0
+    needs_ocr: bool = False
+    reason: Optional[str] = None
+
+
+def _is_invalid_char(char: str) -> bool:
+    if char == "�":
+        return True
+    category = unicodedata.category(char)
+    # Private-use glyphs come from fonts without a usable ToUnicode map
+    return category == "Co" or (category == "Cc" and char not in "\r\n\t")
+
+
+def _classify(layer: PageTextLayer) -> PageTextLayer:
+    config = _settings.extraction
+    if layer.num_chars < config.ocr_min_chars:
+        # A blank page needs no OCR, a page that is only an image does
+        if layer.image_coverage >= config.ocr_min_image_coverage:
+            layer.needs_ocr, layer.reason = True, "no text layer"
+    elif layer.invalid_ratio > config.ocr_max_invalid_ratio:
+        layer.needs_ocr, layer.reason = True, "invalid glyphs"
+    elif layer.alnum_ratio < config.ocr_min_alnum_ratio:
+        layer.needs_ocr, layer.reason = True, "garbled text"
+    elif (
+        layer.image_coverage >= config.ocr_scanned_image_coverage
+        and layer.text_coverage < config.ocr_min_text_coverage
+    ):
+        # Full-page scan with a sparse text layer, e.g. a stamped header
+        layer.needs_ocr, layer.reason = True, "scanned page"
+    return layer
+
+
+def _analyze_page(page: pdfium.PdfPage, page_no: int) -> PageTextLayer:
+    width, height = page.get_size()
+    page_area = max(width * height, 1.0)
+    layer = PageTextLayer(page_no=page_no)
+
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range()
+        chars = [char for char in text if not char.isspace()]
+        layer.num_chars = len(chars)
+        if chars:
+            layer.invalid_ratio = sum(map(_is_invalid_char, chars)) / len(chars)
+            layer.alnum_ratio = sum(char.isalnum() for char in chars) / len(chars)
+        text_area = 0.0
+        for index in range(textpage.count_rects()):
+            left, bottom, right, top = textpage.get_rect(index)
+            text_area += max(right - left, 0) * max(top - bottom, 0)
+        layer.text_coverage = min(text_area / page_area, 1.0)
+    finally:
+        textpage.close()
+
+    image_area = 0.0
+    for image in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE], max_depth=2):
+        left, bottom, right, top = image.get_bounds()
+        image_area += max(right - left, 0) * max(top - bottom, 0)
+    layer.image_coverage = min(image_area / page_area, 1.0)
+
+    return _classify(layer)
+
+
+def analyze_text_layer(
+    doc_path: Path, page_range: Optional[Tuple[int, int]] = None
+) -> List[PageTextLayer]:
+    """Classify the pages of a PDF by the quality of their text layer.
+
+    Args:
+        doc_path: Path to the PDF.
+        page_range: First and last page (1-based, inclusive), default all pages.
+
+    Returns:
+        List[PageTextLayer]: One entry per page, in page order.
+    """
+    pdf = pdfium.PdfDocument(doc_path)
+    try:
+        first, last = page_range or (1, len(pdf))
+        layers = []
+        for page_no in range(first, min(last, len(pdf)) + 1):
+            page = pdf[page_no - 1]
+            try:
+                layers.append(_analyze_page(page, page_no))
+            finally:
+                page.close()
+        return layers
+    finally:
+        pdf.close()
@@ -0,0 +1,247 @@
+"""Thread and batch size profile of the Docling pipelines for this host.
+
+The profile starts from the resources the process can actually use: the
+CPUs it may run on capped by the container CPU quota, and the memory
+available under the container memory limit. Threads are split between
+worker processes, and batches are as large as the parallelism can use
+while their page images fit in the memory left for each worker.
+
+A short calibration run can then try smaller and larger batches on a
+synthetic corpus and keep the fastest. Calibrated profiles are stored per
+host, keyed by the resources they were measured with, so a container
+restarted with other limits is calibrated again.
+"""
+
+import json
+import os
+import platform
+import socket
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+from backend.config.settings import _settings
+from backend.utils.resources import (
+    get_available_memory_bytes,
+    get_cpu_count,
+    get_cpu_quota,
+    get_memory_limit_bytes,
+)
+
+# Batch size multipliers tried by the calibration run
+CALIBRATION_SCALES = (0.5, 1.0, 2.0)
+
+
+@dataclass(frozen=True)
+class HostResources:
+    cpus: int
+    cpu_quota: Optional[float]
+    # Container memory limit, or the memory of the machine
+    total_memory_mb: int
+    available_memory_mb: int
+    cuda: bool
+
+    def key(self) -> str:
+        """Identify the host and the resources a profile was tuned for."""
+        memory_gb = round(self.total_memory_mb / 1024)
+        return (
+            f"{socket.gethostname()}-{platform.machine()}-cpus{self.cpus}-"
+            f"mem{memory_gb}g-{'cuda' if self.cuda else 'cpu'}"
+        )
+
+
+@dataclass(frozen=True)
+class AcceleratorProfile:
+    num_threads: int
+    ocr_batch_size: int
+    layout_batch_size: int
+    table_batch_size: int
+    # "default", "heuristic" or "calibrated"
+    source: str = "heuristic"
+
+
+DEFAULT_PROFILE = AcceleratorProfile(
+    num_threads=4,
+    ocr_batch_size=4,
+    layout_batch_size=64,
+    table_batch_size=4,
+    source="default",
+)
+
+
+def detect_resources() -> HostResources:
+    """Detect the CPUs and memory this process can use."""
+    import torch
+
+    total_memory = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    memory_limit = get_memory_limit_bytes()
+    if memory_limit is not None:
+        total_memory = min(total_memory, memory_limit)
+    return HostResources(
+        cpus=get_cpu_count(),
+        cpu_quota=get_cpu_quota(),
+        total_memory_mb=total_memory // 2**20,
+        available_memory_mb=get_available_memory_bytes() // 2**20,
+        cuda=torch.cuda.is_available(),
+    )
+
+
+def _floor_power_of_two(value: float, minimum: int, maximum: int) -> int:
+    value = int(max(minimum, min(maximum, value)))
+    return 1 << (value.bit_length() - 1)
+
+
+def heuristic_profile(resources: HostResources, workers: int = 1) -> AcceleratorProfile:
+    """Derive a profile from the host resources.
+
+    On CPU, a batch larger than a few items per thread only adds latency and
+    memory. On GPU, layout and table batches amortize the transfers and are
+    larger. OCR runs in tesseract processes, one page per thread.
+
+    Args:
+        resources: The host resources.
+        workers: Worker processes sharing the host.
+
+    Returns:
+        AcceleratorProfile: The profile of one worker.
+    """
+    config = _settings.extraction
+    num_threads = max(1, resources.cpus // workers)
+    # Memory left for batches once every worker has loaded its models
+    batch_memory_mb = (
+        resources.available_memory_mb * config.tuning_memory_fraction / workers
+        - config.tuning_base_memory_mb
+    )
+    pages_fit = max(1, batch_memory_mb // config.tuning_page_memory_mb)
+    tables_fit = max(1, batch_memory_mb // config.tuning_table_memory_mb)
+
+    if resources.cuda:
+        layout_batch_size = min(64, pages_fit)
+        table_batch_size = min(16, tables_fit)
+    else:
+        layout_batch_size = min(max(4, 2 * num_threads), pages_fit)
+        table_batch_size = min(max(2, num_threads // 2), tables_fit)
+    return AcceleratorProfile(
+        num_threads=num_threads,
+        ocr_batch_size=_floor_power_of_two(min(num_threads, pages_fit), 1, 64),
+        layout_batch_size=_floor_power_of_two(layout_batch_size, 1, 128),
+        table_batch_size=_floor_power_of_two(table_batch_size, 1, 32),
+    )
+
+
+def _load_profiles(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable accelerator profiles {path}: {e}")
+        return {}
+
+
+def _save_profile(path: Path, key: str, profile: AcceleratorProfile) -> None:
+    profiles = _load_profiles(path)
+    profiles[key] = {**asdict(profile), "calibrated_at": time.time()}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(profiles, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _scaled(profile: AcceleratorProfile, scale: float) -> AcceleratorProfile:
+    return replace(
+        profile,
+        ocr_batch_size=max(1, int(profile.ocr_batch_size * scale)),
+        layout_batch_size=max(1, int(profile.layout_batch_size * scale)),
+        table_batch_size=max(1, int(profile.table_batch_size * scale)),
+    )
+
+
+def calibrate(
+    resources: HostResources, workers: int = 1, pages: int = 2
+) -> AcceleratorProfile:
+    """Time the heuristic profile with smaller and larger batches.
+
+    Every candidate extracts the same small synthetic corpus with the
+    threaded pipeline after a warm-up conversion, and the fastest one is
+    stored for this host.
+
+    Args:
+        resources: The host resources.
+        workers: Worker processes sharing the host.
+        pages: Pages per synthetic document.
+
+    Returns:
+        AcceleratorProfile: The fastest profile.
+    """
+    from backend.api.data_ingestion.benchmark import generate_corpus
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+    base = heuristic_profile(resources, workers)
+    candidates: List[AcceleratorProfile] = []
+    for scale in CALIBRATION_SCALES:
+        candidate = _scaled(base, scale)
+        if candidate not in candidates:
+            candidates.append(candidate)
+
+    service = DoclingExtractionService()
+    best, best_rate = base, 0.0
+    with tempfile.TemporaryDirectory(prefix="calibration-") as folder:
+        doc_paths = generate_corpus(Path(folder) / "corpus", pages=pages)
+        for candidate in candidates:
+            options = dict(
+                is_accelerator=True,
+                num_threads=candidate.num_threads,
+                ocr_batch_size=candidate.ocr_batch_size,
+                layout_batch_size=candidate.layout_batch_size,
+                table_batch_size=candidate.table_batch_size,
+                use_cache=False,
+            )
+            # Loads the models, which is not what is being compared
+            service._extract_document(doc_paths[0], Path(folder), **options)
+            started = time.perf_counter()
+            num_pages = sum(
+                len(service._extract_document(doc_path, Path(folder), **options).pages)
+                for doc_path in doc_paths
+            )
+            rate = num_pages / max(time.perf_counter() - started, 1e-9)
+            logger.info(f"Calibration {candidate}: {rate:.2f} pages/s")
+            if rate > best_rate:
+                best, best_rate = candidate, rate
+
+    best = replace(best, source="calibrated")
+    _save_profile(
+        Path(_settings.extraction.tuning_profile_path),
+        f"{resources.key()}-w{workers}",
+        best,
+    )
+    get_accelerator_profile.cache_clear()
+    return best
+
+
+@lru_cache(maxsize=None)
+def get_accelerator_profile(workers: int = 1) -> AcceleratorProfile:
+    """Get the profile of one of ``workers`` processes sharing this host.
+
+    The calibrated profile stored for this host when there is one, else the
+    heuristic profile, else the static defaults when auto-tuning is off.
+    """
+    if not _settings.extraction.auto_tune:
+        return DEFAULT_PROFILE
+
+    resources = detect_resources()
+    key = f"{resources.key()}-w{workers}"
+    stored = _load_profiles(Path(_settings.extraction.tuning_profile_path)).get(key)
+    if stored is not None:
+        stored.pop("calibrated_at", None)
+        return AcceleratorProfile(**stored)
+
+    profile = heuristic_profile(resources, workers)
+    logger.info(f"Accelerator profile for {key}: {profile}")
+    return profile
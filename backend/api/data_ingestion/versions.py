@@ -0,0 +1,149 @@
+"""Versions of indexed documents, for incremental re-ingestion.
+
+Every ingested version of a document records the hashes of its chunks, in
+order. A new version is diffed against the previous one by hash: only added
+chunks are embedded and indexed, the points of removed chunks are deleted,
+and unchanged chunks keep their points, since point ids are derived from the
+document and the chunk hash. Unchanged chunks at a new position only have
+their position updated.
+
+Unchanged chunks without a point, left out as duplicates, are checked for
+duplicates again, as the chunks they repeat may have changed since.
+"""
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import JSON, Column, DateTime, Integer, UnicodeText, UniqueConstraint
+from sqlalchemy.orm import Session
+
+from backend.databases.db import Base, get_utc_now
+
+
+class DocumentVersion(Base):
+    __tablename__ = "Document_Version"
+    __table_args__ = (UniqueConstraint("collection", "document_id", "version"),)
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    collection = Column(UnicodeText, nullable=False, index=True)
+    document_id = Column(UnicodeText, nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    job_id = Column(UnicodeText, nullable=False, unique=True)
+    source = Column(UnicodeText, nullable=True)
+    # Hashes of the chunks, in document order
+    chunk_hashes = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ChunkDiff(BaseModel):
+    """Changes of the chunks of a document since its previous version."""
+
+    previous_version: Optional[int] = None
+    added: List[int] = Field(
+        default_factory=list, description="Indices of the new or changed chunks"
+    )
+    removed: List[str] = Field(
+        default_factory=list, description="Hashes of the chunks gone"
+    )
+    moved: List[int] = Field(
+        default_factory=list, description="Indices of unchanged chunks that moved"
+    )
+    rechecked: List[int] = Field(
+        default_factory=list,
+        description="Indices of unchanged chunks without a point, checked again",
+    )
+    unchanged: int = 0
+
+
+def diff_chunks(previous: List[str], current: List[str]) -> ChunkDiff:
+    """Diff the chunk hashes of two versions of a document.
+
+    Args:
+        previous: Chunk hashes of the previous version, in order.
+        current: Chunk hashes of the new version, in order.
+
+    Returns:
+        ChunkDiff: Added and moved chunks by index in the new version, and
+            the hashes of the removed ones.
+    """
+    previous_positions: Dict[str, int] = {}
+    for position, digest in enumerate(previous):
+        previous_positions.setdefault(digest, position)
+    current_hashes = set(current)
+
+    diff = ChunkDiff(
+        removed=[
+            digest for digest in previous_positions if digest not in current_hashes
+        ]
+    )
+    seen = set()
+    for index, digest in enumerate(current):
+        if digest in seen:
+            # Repeated within the document, the first occurrence has the point
+            continue
+        seen.add(digest)
+        position = previous_positions.get(digest)
+        if position is None:
+            diff.added.append(index)
+            continue
+        diff.unchanged += 1
+        if position != index:
+            diff.moved.append(index)
+    return diff
+
+
+class DocumentVersionService:
+    """Stores the chunk hashes of every indexed version of a document."""
+
+    def get_latest(
+        self, db_session: Session, collection: str, document_id: str
+    ) -> Optional[DocumentVersion]:
+        """Retrieve the last indexed version of a document, if any."""
+        return (
+            db_session.query(DocumentVersion)
+            .filter(
+                DocumentVersion.collection == collection,
+                DocumentVersion.document_id == document_id,
+            )
+            .order_by(DocumentVersion.version.desc())
+            .first()
+        )
+
+    def add_version(
+        self,
+        db_session: Session,
+        collection: str,
+        document_id: str,
+        job_id: str,
+        chunk_hashes: List[str],
+        source: Optional[str] = None,
+    ) -> DocumentVersion:
+        """Record an indexed version of a document.
+
+        Recording the same job again returns the version recorded before, so
+        a retried job does not add a version.
+        """
+        existing = (
+            db_session.query(DocumentVersion)
+            .filter(DocumentVersion.job_id == job_id)
+            .first()
+        )
+        if existing is not None:
+            return existing
+        latest = self.get_latest(db_session, collection, document_id)
+        version = DocumentVersion(
+            collection=collection,
+            document_id=document_id,
+            version=latest.version + 1 if latest else 1,
+            job_id=job_id,
+            source=source,
+            chunk_hashes=chunk_hashes,
+            created_at=get_utc_now(),
+        )
+        db_session.add(version)
+        db_session.commit()
+        db_session.refresh(version)
+        return version
+
+
+document_version_service = DocumentVersionService()
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, File, Form, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from starlette.requests import Request
+
+from backend.api.data_ingestion.jobs import get_job_status, submit_job
+from backend.api.data_ingestion.model import (
+    DocumentType,
+    IngestionJobRequest,
+    IngestionJobStatus,
+)
+from backend.api.user.permissions import Permission, require
+from backend.config.settings import _settings
+from backend.utils.constants import Message
+from backend.utils.dependency import get_current_user
+
+if TYPE_CHECKING:
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+router = APIRouter(
+    prefix="/data-ingestion",
+    tags=["Data Ingestion"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@lru_cache(maxsize=None)
+def get_extraction_service() -> "DoclingExtractionService":
+    """Get the extraction service, importing torch and docling on first use."""
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+    return DoclingExtractionService()
+
+
+def _sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _stream_pages(
+    doc_path: Path, work_dir: Path, extract_kwargs: dict
+) -> Iterator[str]:
+    """Yield one server-sent event per extracted page, then a final event."""
+    num_pages = 0
+    try:
+        for page in get_extraction_service().iter_pages(
+            doc_path,
+            output_folder=Path(_settings.process_file.root_download_folder),
+            **extract_kwargs,
+        ):
+            num_pages += 1
+            yield _sse_event("page", page.model_dump_json())
+        yield _sse_event("done", json.dumps({"num_pages": num_pages}))
+    except Exception as e:
+        logger.exception(f"Streaming extraction of {doc_path.name} failed: {e}")
+        message = getattr(e, "message", Message.MESSAGE_INTERNAL_SERVER_ERROR)
+        yield _sse_event("error", json.dumps({"message": message}))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+@router.post("/extract/stream")
+async def extract_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    do_ocr: bool = Form(True),
+    do_table_structure: bool = Form(True),
+):
+    """Extract an uploaded document and stream its pages as server-sent events.
+
+    Every converted page is sent as a ``page`` event as soon as it is ready,
+    followed by a ``done`` event with the page count, or an ``error`` event.
+
+    Args:
+        request: FastAPI request object.
+        file: The document to extract.
+        do_ocr: Whether to OCR pages without a usable text layer.
+        do_table_structure: Whether to recognize table structure.
+
+    Returns:
+        StreamingResponse: ``text/event-stream`` of ``ExtractedPage`` payloads.
+    """
+    logger.info(f"User {request.state.user_id} streaming extraction of {file.filename}")
+
+    # Keep the original suffix, the document type is derived from it
+    work_dir = Path(tempfile.mkdtemp(prefix="extract-"))
+    doc_path = work_dir / Path(file.filename or "document").name
+    try:
+        DocumentType.from_path(doc_path)
+        with open(doc_path, "wb") as buffer:
+            await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    return StreamingResponse(
+        _stream_pages(
+            doc_path,
+            work_dir,
+            {"do_ocr": do_ocr, "do_table_structure": do_table_structure},
+        ),
+        media_type="text/event-stream",
+        # Disable proxy buffering so pages reach the client as they are sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _save_upload(file: BinaryIO, suffix: str) -> Path:
+    """Store an upload under its content hash, where workers can read it."""
+    upload_folder = Path(_settings.process_file.root_download_folder) / "uploads"
+    upload_folder.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=upload_folder, delete=False) as buffer:
+        digest = hashlib.sha256()
+        for data in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(data)
+            buffer.write(data)
+    doc_path = upload_folder / f"{digest.hexdigest()}{suffix}"
+    os.replace(buffer.name, doc_path)
+    return doc_path
+
+
+def _job_options(**options) -> dict:
+    # Unset options are left out, they would change the job ids
+    return {key: value for key, value in options.items() if value is not None}
+
+
+@router.post(
+    "/jobs",
+    response_model=IngestionJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require(Permission.INGEST_DOCUMENTS))],
+    description="Queue the ingestion of a document URL",
+)
+async def create_job(request: Request, job_request: IngestionJobRequest):
+    """Queue a document for ingestion.
+
+    Submitting the same document with the same options again returns the
+    existing job, a failed job is queued again and resumes where it stopped.
+    """
+    job_id = await run_in_threadpool(
+        submit_job,
+        str(job_request.source),
+        job_request.collection,
+        job_request.priority,
+        _job_options(
+            do_ocr=job_request.do_ocr,
+            document_id=job_request.document_id,
+            revision=job_request.revision,
+        ),
+    )
+    logger.info(f"User {request.state.user_id} queued ingestion job {job_id}")
+    return await run_in_threadpool(get_job_status, job_id)
+
+
+@router.post(
+    "/jobs/upload",
+    response_model=IngestionJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require(Permission.INGEST_DOCUMENTS))],
+    description="Queue the ingestion of an uploaded document",
+)
+async def create_upload_job(
+    request: Request,
+    file: UploadFile = File(...),
+    collection: str = Form(_settings.qdrant.default_collection),
+    priority: Literal["high", "normal", "low"] = Form("normal"),
+    do_ocr: bool = Form(True),
+    document_id: Optional[str] = Form(None),
+):
+    """Store an uploaded document and queue it for ingestion.
+
+    Uploads are stored under the hash of their content, pass ``document_id``
+    to index a new version of a document in place of the previous one.
+    """
+    # Keep the original suffix, the document type is derived from it
+    suffix = Path(file.filename or "document").suffix.lower()
+    DocumentType.from_path(Path(f"document{suffix}"))
+    doc_path = await run_in_threadpool(_save_upload, file.file, suffix)
+
+    job_id = await run_in_threadpool(
+        submit_job,
+        str(doc_path),
+        collection,
+        priority,
+        _job_options(do_ocr=do_ocr, document_id=document_id),
+    )
+    logger.info(
+        f"User {request.state.user_id} queued ingestion job {job_id} "
+        f"for {file.filename}"
+    )
+    return await run_in_threadpool(get_job_status, job_id)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=IngestionJobStatus,
+    description="Get the state and progress of an ingestion job",
+)
+async def read_job(job_id: str):
+    """Return the state, current stage and progress of an ingestion job."""
+    return await run_in_threadpool(get_job_status, job_id)
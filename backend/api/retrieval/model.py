@@ -0,0 +1,39 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from backend.config.settings import _settings
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, description="Text to search for")
+    collections: Optional[List[str]] = Field(
+        None, description="Collections to search, the configured ones by default"
+    )
+    limit: int = Field(_settings.retrieval.limit, ge=1, le=100)
+    budget_ms: Optional[int] = Field(
+        None, ge=1, description="Latency budget, the configured one by default"
+    )
+
+
+class SearchHit(BaseModel):
+    id: str = Field(..., description="Point id of the chunk")
+    collection: str
+    score: float = Field(..., description="Reciprocal rank fusion score")
+    document_id: Optional[str] = None
+    text: str = ""
+    headings: Dict[str, str] = Field(default_factory=dict)
+    page_nos: List[int] = Field(default_factory=list)
+    duplicate_documents: List[str] = Field(
+        default_factory=list, description="Other documents repeating the chunk"
+    )
+
+
+class SearchResponse(BaseModel):
+    hits: List[SearchHit]
+    # Queries that failed or did not answer within the budget
+    partial: bool = False
+    missing: List[str] = Field(
+        default_factory=list, description="Unanswered queries as collection/vector"
+    )
+    elapsed_ms: float = 0.0
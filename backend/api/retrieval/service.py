@@ -0,0 +1,215 @@
+"""Hybrid search over several Qdrant collections.
+
+A query is embedded once with the dense and the sparse encoder of the
+ingestion pipeline, then every collection is queried with both vectors at the
+same time. The ranked lists are fused with reciprocal rank fusion and the
+chunks found by several queries are merged. Queries still running when the
+latency budget is spent are dropped, and the response says which ones, so a
+slow collection degrades the results instead of the latency.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from qdrant_client import QdrantClient, models
+
+from backend.api.data_ingestion.dedup import (
+    BANDS_FIELD,
+    DUPLICATES_FIELD,
+    SIGNATURE_FIELD,
+)
+from backend.api.data_ingestion.embedding import Embedder, get_embedder
+from backend.api.retrieval.model import SearchHit, SearchRequest, SearchResponse
+from backend.config.settings import _settings
+from backend.databases.qdrant import get_qdrant_client
+
+# The MinHash fields and the repeating chunks are only read by the
+# near-duplicate detection
+_PAYLOAD_SELECTOR = models.PayloadSelectorExclude(
+    exclude=[SIGNATURE_FIELD, BANDS_FIELD, DUPLICATES_FIELD]
+)
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[models.ScoredPoint]], k: int
+) -> List[Tuple[float, models.ScoredPoint]]:
+    """Fuse ranked lists, scoring each point ``sum(1 / (k + rank))``.
+
+    A point found by several lists is kept once, with the payload of its best
+    ranked occurrence.
+
+    Args:
+        rankings: Ranked lists of points, best first.
+        k: Fusion constant, larger values flatten the top ranks.
+
+    Returns:
+        List[Tuple[float, ScoredPoint]]: Fused scores and points, best first.
+    """
+    scores: Dict[str, float] = {}
+    best: Dict[str, Tuple[int, models.ScoredPoint]] = {}
+    for ranking in rankings:
+        for rank, point in enumerate(ranking, 1):
+            key = str(point.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, point)
+    return sorted(
+        ((score, best[key][1]) for key, score in scores.items()),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+
+
+class RetrievalService:
+    """Searches collections with dense and sparse vectors concurrently."""
+
+    def __init__(
+        self,
+        client: Optional[QdrantClient] = None,
+        query_embedder: Optional[Embedder] = None,
+    ):
+        config = _settings.retrieval
+        self._client = client
+        self._embedder = query_embedder or get_embedder()
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.max_workers, thread_name_prefix="retrieval"
+        )
+        # Query -> (dense vector, sparse vector or None), least recent first
+        self._query_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._query_cache_entries = config.query_cache_entries
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            self._client = get_qdrant_client()
+        return self._client
+
+    def _embed_query(self, query: str, timeout: float) -> tuple:
+        with self._lock:
+            vectors = self._query_cache.get(query)
+            if vectors is not None:
+                self._query_cache.move_to_end(query)
+                return vectors
+
+        dense, sparse = self._embedder.encode_queries([query], timeout=timeout)
+        sparse_vector = None
+        if sparse is not None:
+            indices, values = sparse.row(0)
+            sparse_vector = models.SparseVector(
+                indices=indices.tolist(), values=values.tolist()
+            )
+        vectors = (np.asarray(dense[0], dtype=np.float32).tolist(), sparse_vector)
+        with self._lock:
+            self._query_cache[query] = vectors
+            while len(self._query_cache) > self._query_cache_entries:
+                self._query_cache.popitem(last=False)
+        return vectors
+
+    def _query(
+        self, collection: str, using: str, vector, limit: int
+    ) -> List[models.ScoredPoint]:
+        return self.client.query_points(
+            collection,
+            query=vector,
+            using=using,
+            limit=limit,
+            with_payload=_PAYLOAD_SELECTOR,
+        ).points
+
+    def search(self, request: SearchRequest) -> SearchResponse:
+        """Search collections with the dense and sparse vectors of a query.
+
+        Args:
+            request: The query, collections, limit and latency budget.
+
+        Returns:
+            SearchResponse: The fused hits, and the queries left out of them.
+        """
+        config = _settings.retrieval
+        qdrant = _settings.qdrant
+        started = time.perf_counter()
+        budget = (request.budget_ms or config.budget_ms) / 1000
+        deadline = started + budget
+        collections = request.collections or config.collections
+        query = request.query.strip()
+
+        def elapsed_ms() -> float:
+            return (time.perf_counter() - started) * 1000
+
+        try:
+            dense, sparse = self._embed_query(query, timeout=budget)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                logger.warning(f"Query embedding took longer than {budget:.2f}s")
+            else:
+                logger.warning(f"Query embedding failed: {e!r}")
+            return SearchResponse(
+                hits=[], partial=True, missing=["embedding"], elapsed_ms=elapsed_ms()
+            )
+
+        futures: Dict[Future, str] = {}
+        candidates = max(config.candidates, request.limit)
+        for collection in collections:
+            vectors = [(qdrant.dense_vector_name, dense)]
+            if sparse is not None:
+                vectors.append((qdrant.sparse_vector_name, sparse))
+            for using, vector in vectors:
+                future = self._executor.submit(
+                    self._query, collection, using, vector, candidates
+                )
+                futures[future] = f"{collection}/{using}"
+
+        done, _ = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+
+        missing = []
+        rankings: List[List[models.ScoredPoint]] = []
+        collection_of: Dict[str, str] = {}
+        for future, name in futures.items():
+            if future not in done:
+                future.cancel()
+                missing.append(name)
+                continue
+            try:
+                points = future.result()
+            except Exception as e:
+                logger.warning(f"Search of {name} failed: {e}")
+                missing.append(name)
+                continue
+            rankings.append(points)
+            for point in points:
+                collection_of.setdefault(str(point.id), name.rpartition("/")[0])
+
+        hits = []
+        for score, point in reciprocal_rank_fusion(rankings, config.rrf_k)[
+            : request.limit
+        ]:
+            payload = point.payload or {}
+            hits.append(
+                SearchHit(
+                    id=str(point.id),
+                    collection=collection_of[str(point.id)],
+                    score=score,
+                    document_id=payload.get("document_id"),
+                    text=payload.get("text", ""),
+                    headings=payload.get("headings") or {},
+                    page_nos=payload.get("page_nos") or [],
+                    duplicate_documents=payload.get("duplicate_documents") or [],
+                )
+            )
+        if missing:
+            logger.warning(
+                f"Search answered without {', '.join(sorted(missing))} "
+                f"after {elapsed_ms():.0f}ms"
+            )
+        return SearchResponse(
+            hits=hits,
+            partial=bool(missing),
+            missing=sorted(missing),
+            elapsed_ms=elapsed_ms(),
+        )
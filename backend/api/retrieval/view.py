@@ -0,0 +1,38 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+from starlette.requests import Request
+
+from backend.api.retrieval.model import SearchRequest, SearchResponse
+from backend.utils.dependency import get_current_user
+
+if TYPE_CHECKING:
+    from backend.api.retrieval.service import RetrievalService
+
+router = APIRouter(
+    prefix="/retrieval",
+    tags=["Retrieval"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@lru_cache(maxsize=None)
+def get_retrieval_service() -> "RetrievalService":
+    """Get the retrieval service, importing Qdrant and the embedder on first use."""
+    from backend.api.retrieval.service import RetrievalService
+
+    return RetrievalService()
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(request: Request, search_request: SearchRequest):
+    """Search the collections with the dense and sparse vectors of a query.
+
+    Results of the queries answered within the latency budget are fused with
+    reciprocal rank fusion; ``partial`` is set when some were not.
+    """
+    logger.info(f"User {request.state.user_id} searching {search_request.collections}")
+    return await run_in_threadpool(get_retrieval_service().search, search_request)
@@ -1,58 +1,34 @@
 from click.testing import CliRunner
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 from loguru import logger
-from sqlalchemy.orm import Session
 from starlette.requests import Request
 
+from backend.api.user.permissions import Permission, require
 from backend.cli import downgrade_database, upgrade_database
-from backend.utils.constants import Message, RoleType
-from backend.utils.dependency import get_current_user, get_db
+from backend.utils.dependency import get_current_user
 
 database_router = APIRouter(
     prefix="/revision", tags=["Revision"], dependencies=[Depends(get_current_user)]
 )
 
 
-def _check_admin_permission(request: Request, db_session: Session):
-    """Check if the current user has admin permissions.
-    
-    Args:
-        request: FastAPI request object containing user state.
-        db_session: Database session for querying user roles.
-        
-    Raises:
-        HTTPException: If user doesn't have admin role.
-    """
-    from backend.api.user.service import user_service
-    
-    roles = user_service.get_user_roles_by_id(db_session, request.state.user_id)
-    role_ids = [role.id for role in roles]
-    if RoleType.ADMIN.value not in role_ids:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=Message.MESSAGE_PERMISSION_DENIED,
-        )
-
-
-@database_router.post("/upgrade")
+@database_router.post(
+    "/upgrade", dependencies=[Depends(require(Permission.MANAGE_DATABASE))]
+)
 async def upgrade_database_api(
     request: Request,
     revision: str = "head",
-    db_session: Session = Depends(get_db),
 ):
     """Upgrade database to a specific revision.
     
     Args:
         request: FastAPI request object.
         revision: Target revision (default: "head" for latest).
-        db_session: Database session.
         
     Returns:
         JSONResponse with upgrade result.
     """
-    _check_admin_permission(request, db_session)
-    
     logger.info(f"User {request.state.user_id} initiating database upgrade to revision: {revision}")
     
     try:
@@ -86,24 +62,22 @@ async def upgrade_database_api(
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
-@database_router.post("/downgrade")
+@database_router.post(
+    "/downgrade", dependencies=[Depends(require(Permission.MANAGE_DATABASE))]
+)
 async def downgrade_database_api(
     request: Request,
     revision: str = "-1",
-    db_session: Session = Depends(get_db),
 ):
     """Downgrade database to a specific revision.
     
     Args:
         request: FastAPI request object.
         revision: Target revision (default: "-1" for one step back).
-        db_session: Database session.
         
     Returns:
         JSONResponse with downgrade result.
     """
-    _check_admin_permission(request, db_session)
-    
     logger.warning(
         f"User {request.state.user_id} initiating database downgrade to revision: {revision}"
     )
@@ -44,7 +44,7 @@ def generate_access_token(
 
     Returns:
         JWT-encoded access token.
-        
+
     Raises:
         ObjectNotFoundException: If user not found.
     """
@@ -8,6 +8,7 @@ from backend.api.user.model import (
     UserCreateRequest,
     UserResponse,
 )
+from backend.api.user.permissions import Permission, role_catalog
 from backend.api.user.service import user_service
 from backend.utils.authentic import verify_access_token
 from backend.utils.constants import Message, RoleType
@@ -66,15 +67,16 @@ async def register(
     register_request: UserCreateRequest, db_session: Session = Depends(get_db)
 ):
     if register_request.roles is not None:
-        role_types = [role.value for role in RoleType]
         for role in register_request.roles:
-            if role not in role_types:
+            if not role_catalog.has_role(role):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail=Message.MESSAGE_PERMISSION_DENIED,
                 )
         # Check role permission
-        if RoleType.ADMIN.value in register_request.roles:
+        if role_catalog.permissions_for(register_request.roles) & (
+            Permission.MANAGE_USERS
+        ):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=Message.MESSAGE_PERMISSION_DENIED,
@@ -0,0 +1,168 @@
+"""Write-behind recorder for login and logout timestamps.
+
+``login_user`` and ``logout_user`` only record the event in memory. A
+background thread writes pending timestamps in batches, one
+``UPDATE ... FROM (VALUES ...)`` per batch, every few seconds or as soon as
+enough users are pending. Whatever is left is flushed on shutdown.
+"""
+
+import atexit
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import text
+
+from backend.api.user.cache import user_profile_cache
+from backend.config.settings import _settings
+from backend.databases.db import SessionLocal
+
+# user_id -> (last_login, first_login candidate or None for logouts)
+PendingActivity = Dict[int, Tuple[datetime, Optional[datetime]]]
+
+
+def _build_update_statement(size: int):
+    rows = ", ".join(
+        f"(CAST(:id_{i} AS INTEGER), CAST(:last_{i} AS TIMESTAMPTZ), "
+        f"CAST(:first_{i} AS TIMESTAMPTZ))"
+        for i in range(size)
+    )
+    return text(
+        'UPDATE "User" AS u '
+        "SET last_login = GREATEST(u.last_login, v.last_login), "
+        "first_login = COALESCE(u.first_login, v.first_login) "
+        f"FROM (VALUES {rows}) AS v(id, last_login, first_login) "
+        "WHERE u.id = v.id"
+    )
+
+
+class ActivityRecorder:
+    """Buffers ``first_login``/``last_login`` updates and writes them in batches."""
+
+    def __init__(
+        self,
+        flush_interval_seconds: float,
+        max_pending: int,
+        batch_size: int,
+    ):
+        self._flush_interval_seconds = flush_interval_seconds
+        self._max_pending = max_pending
+        self._batch_size = batch_size
+        self._pending: PendingActivity = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record_login(self, user_id: int, at: datetime) -> None:
+        """Record a successful login."""
+        self._record(user_id, at, at)
+
+    def record_logout(self, user_id: int, at: datetime) -> None:
+        """Record a logout, which only moves ``last_login``."""
+        self._record(user_id, at, None)
+
+    def _record(
+        self, user_id: int, last_login: datetime, first_login: Optional[datetime]
+    ) -> None:
+        self.start()
+        with self._lock:
+            self._merge(user_id, last_login, first_login)
+            pending = len(self._pending)
+        if pending >= self._max_pending:
+            self._wake.set()
+
+    def _merge(
+        self, user_id: int, last_login: datetime, first_login: Optional[datetime]
+    ) -> None:
+        previous = self._pending.get(user_id)
+        if previous is not None:
+            last_login = max(last_login, previous[0])
+            if previous[1] is not None:
+                first_login = (
+                    previous[1]
+                    if first_login is None
+                    else min(first_login, previous[1])
+                )
+        self._pending[user_id] = (last_login, first_login)
+
+    def start(self) -> None:
+        """Start the background flusher if it is not running yet."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="activity-recorder", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background flusher and write every pending entry."""
+        thread = self._thread
+        if thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self._flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending entries to the database.
+
+        Returns:
+            int: Number of users written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            items = list(pending.items())
+            written = 0
+            for start in range(0, len(items), self._batch_size):
+                batch = items[start : start + self._batch_size]
+                try:
+                    self._write(batch)
+                    written += len(batch)
+                except Exception as e:
+                    logger.error(f"Failed to write login activity: {e}")
+                    # Put the unwritten entries back for the next attempt
+                    with self._lock:
+                        for user_id, (last_login, first_login) in items[start:]:
+                            self._merge(user_id, last_login, first_login)
+                    break
+
+            for user_id, _ in items[:written]:
+                user_profile_cache.invalidate(user_id)
+            logger.debug(f"Wrote login activity for {written} users")
+            return written
+
+    def _write(self, batch: List[Tuple[int, Tuple[datetime, Optional[datetime]]]]):
+        params = {}
+        for i, (user_id, (last_login, first_login)) in enumerate(batch):
+            params[f"id_{i}"] = user_id
+            params[f"last_{i}"] = last_login
+            params[f"first_{i}"] = first_login
+        with SessionLocal() as db_session:
+            db_session.execute(_build_update_statement(len(batch)), params)
+            db_session.commit()
+
+
+activity_recorder = ActivityRecorder(
+    flush_interval_seconds=_settings.activity.flush_interval_seconds,
+    max_pending=_settings.activity.max_pending,
+    batch_size=_settings.activity.batch_size,
+)
+# Safety net for processes that do not run the application lifespan
+atexit.register(activity_recorder.stop)
@@ -0,0 +1,333 @@
+"""Bulk import of users from CSV or JSONL files.
+
+Rows are validated with ``UserCreateRequest`` and their passwords hashed in a
+process pool. Valid rows are loaded with ``COPY`` into a temporary staging
+table and merged into ``User`` and ``User_Roles`` with set-based statements,
+one transaction per batch. Rows that fail validation, duplicate an earlier
+row or an existing user, or reference an unknown role are written to a rejects
+file instead.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from backend.api.user.model import UserCreateRequest
+from backend.databases.db import engine
+from backend.exceptions.model import BusinessBaseException
+from backend.utils.authentic import get_hash_password
+from backend.utils.constants import RoleType
+
+# (line_no, raw row), or (line_no, reason) for a line that could not be parsed
+RawRow = Tuple[int, Union[Dict, str]]
+# (line_no, email, username, reason)
+RejectedRow = Tuple[int, Optional[str], Optional[str], str]
+
+STAGING_COLUMNS = (
+    "line_no",
+    "email",
+    "username",
+    "password",
+    "full_name",
+    "date_of_birth",
+    "phone_number",
+    "country",
+    "gender",
+    "role_ids",
+)
+
+_CREATE_STAGING_TABLE = """
+CREATE TEMP TABLE import_users (
+    line_no INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    full_name TEXT,
+    date_of_birth TIMESTAMPTZ,
+    phone_number TEXT,
+    country TEXT,
+    gender TEXT,
+    role_ids INTEGER[] NOT NULL
+) ON COMMIT DROP
+"""
+
+# Keep the first occurrence of every email/username, drop the rest along with
+# rows clashing with existing users or naming unknown roles.
+_REMOVE_REJECTED_ROWS = """
+WITH ranked AS (
+    SELECT
+        line_no,
+        row_number() OVER (PARTITION BY lower(email) ORDER BY line_no) AS email_rank,
+        row_number() OVER (PARTITION BY lower(username) ORDER BY line_no)
+            AS username_rank
+    FROM import_users
+),
+rejected AS (
+    SELECT
+        s.line_no,
+        CASE
+            WHEN r.email_rank > 1 THEN 'duplicate email in file'
+            WHEN r.username_rank > 1 THEN 'duplicate username in file'
+            WHEN existing_email.id IS NOT NULL THEN 'email already exists'
+            WHEN existing_username.id IS NOT NULL THEN 'username already exists'
+            ELSE 'unknown role'
+        END AS reason
+    FROM import_users s
+    JOIN ranked r ON r.line_no = s.line_no
+    LEFT JOIN "User" existing_email ON lower(existing_email.email) = lower(s.email)
+    LEFT JOIN "User" existing_username
+        ON lower(existing_username.username) = lower(s.username)
+    WHERE r.email_rank > 1
+        OR r.username_rank > 1
+        OR existing_email.id IS NOT NULL
+        OR existing_username.id IS NOT NULL
+        OR NOT s.role_ids <@ ARRAY(SELECT id FROM "Role")
+)
+DELETE FROM import_users s
+USING rejected
+WHERE s.line_no = rejected.line_no
+RETURNING s.line_no, s.email, s.username, rejected.reason
+"""
+
+_MERGE_STAGING_ROWS = """
+WITH inserted AS (
+    INSERT INTO "User" (
+        email, password, full_name, username, date_of_birth, phone_number,
+        country, gender, deleted, created_at, updated_at
+    )
+    SELECT
+        email, password, full_name, username, date_of_birth, phone_number,
+        country, gender, FALSE, now(), now()
+    FROM import_users
+    ORDER BY line_no
+    ON CONFLICT DO NOTHING
+    RETURNING id, username
+),
+linked AS (
+    INSERT INTO "User_Roles" (user_id, role_id)
+    SELECT inserted.id, role.id
+    FROM inserted
+    JOIN import_users s ON s.username = inserted.username
+    CROSS JOIN LATERAL unnest(s.role_ids) AS role(id)
+    ON CONFLICT DO NOTHING
+    RETURNING user_id
+)
+-- Rows skipped by ON CONFLICT, e.g. a user created since they were checked
+SELECT s.line_no, s.email, s.username, 'conflicts with an existing user'
+FROM import_users s
+LEFT JOIN inserted ON inserted.username = s.username
+WHERE inserted.id IS NULL
+"""
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    imported: int = 0
+    rejected: int = 0
+    elapsed: float = 0.0
+
+
+def iter_rows(path: Path) -> Iterator[RawRow]:
+    """Stream raw rows from a CSV (with header) or JSONL file.
+
+    A malformed JSONL line is yielded as the reason it was rejected, so it
+    ends up in the rejects file instead of aborting the import.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, "Invalid JSON: expected an object"
+                    continue
+                yield line_no, row
+        else:
+            # Line 1 is the header
+            for line_no, row in enumerate(csv.DictReader(file), start=2):
+                yield line_no, row
+
+
+def _parse_roles(value) -> List[int]:
+    if value is None or value == "":
+        return [RoleType.USER.value]
+    if isinstance(value, str):
+        return [int(role) for role in value.replace(";", ",").split(",") if role]
+    return [int(role) for role in value]
+
+
+def prepare_rows(rows: List[RawRow]) -> Tuple[List[tuple], List[RejectedRow]]:
+    """Validate rows and hash their passwords.
+
+    Runs in worker processes, so it must stay a module-level function.
+
+    Args:
+        rows: Raw rows with their line numbers.
+
+    Returns:
+        tuple: Staging rows ordered as ``STAGING_COLUMNS`` and rejected rows.
+    """
+    prepared = []
+    rejected = []
+    for line_no, row in rows:
+        if isinstance(row, str):
+            rejected.append((line_no, None, None, row))
+            continue
+        row = {key: (None if value == "" else value) for key, value in row.items()}
+        try:
+            row["roles"] = _parse_roles(row.get("roles"))
+            user_in = UserCreateRequest(**row)
+        except ValidationError as e:
+            reason = "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )
+            rejected.append((line_no, row.get("email"), row.get("username"), reason))
+            continue
+        except (BusinessBaseException, ValueError, TypeError) as e:
+            reason = getattr(e, "message", str(e))
+            rejected.append((line_no, row.get("email"), row.get("username"), reason))
+            continue
+
+        prepared.append(
+            (
+                line_no,
+                user_in.email,
+                user_in.username,
+                get_hash_password(user_in.password),
+                user_in.full_name,
+                user_in.date_of_birth.isoformat() if user_in.date_of_birth else None,
+                user_in.phone_number,
+                user_in.country,
+                user_in.gender,
+                "{" + ",".join(str(role) for role in user_in.roles) + "}",
+            )
+        )
+    return prepared, rejected
+
+
+def _copy_and_merge(rows: List[tuple]) -> Tuple[int, List[RejectedRow]]:
+    """Load one batch through the staging table in a single transaction."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(_CREATE_STAGING_TABLE)
+            cursor.copy_expert(
+                f"COPY import_users ({', '.join(STAGING_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            cursor.execute(_REMOVE_REJECTED_ROWS)
+            rejected = [tuple(row) for row in cursor.fetchall()]
+            staged = len(rows) - len(rejected)
+            cursor.execute(_MERGE_STAGING_ROWS)
+            conflicts = [tuple(row) for row in cursor.fetchall()]
+            rejected.extend(conflicts)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return staged - len(conflicts), rejected
+
+
+def _chunks(rows: Iterator[RawRow], size: int) -> Iterator[List[RawRow]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _prepare_in_order(
+    chunks: Iterator[List[RawRow]], workers: int
+) -> Iterator[Tuple[List[tuple], List[RejectedRow]]]:
+    """Prepare chunks in a process pool, keeping file order and a bounded backlog."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield prepare_rows(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: Deque[Future] = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(prepare_rows, chunk))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def import_users(
+    path: Path,
+    rejects_path: Path,
+    batch_size: int = 50_000,
+    workers: Optional[int] = None,
+    chunk_size: int = 2_000,
+) -> ImportReport:
+    """Import users from a CSV or JSONL file.
+
+    Args:
+        path: Input file, CSV with a header row or one JSON object per line.
+        rejects_path: CSV file receiving rejected rows and the reason.
+        batch_size: Rows loaded per COPY and merge transaction.
+        workers: Processes used for validation and hashing (default: all cores).
+        chunk_size: Rows handed to a worker process at a time.
+
+    Returns:
+        ImportReport: Counts of processed, imported and rejected rows.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    report = ImportReport()
+
+    with open(rejects_path, "w", newline="", encoding="utf-8") as rejects_file:
+        rejects = csv.writer(rejects_file)
+        rejects.writerow(["line_no", "email", "username", "reason"])
+
+        batch: List[tuple] = []
+        for prepared, rejected in _prepare_in_order(
+            _chunks(iter_rows(path), chunk_size), workers
+        ):
+            report.total += len(prepared) + len(rejected)
+            report.rejected += len(rejected)
+            rejects.writerows(rejected)
+            batch.extend(prepared)
+            if len(batch) >= batch_size:
+                imported, rejected = _copy_and_merge(batch)
+                report.imported += imported
+                report.rejected += len(rejected)
+                rejects.writerows(sorted(rejected))
+                batch = []
+
+        if batch:
+            imported, rejected = _copy_and_merge(batch)
+            report.imported += imported
+            report.rejected += len(rejected)
+            rejects.writerows(sorted(rejected))
+
+    report.elapsed = time.perf_counter() - started
+    return report
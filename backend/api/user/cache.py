@@ -0,0 +1,167 @@
+"""Cache of serialized ``UserResponse`` payloads.
+
+Profiles are cached on read and refreshed or dropped by every service method
+that changes a user. The "memory" backend keeps an LRU per worker and, when
+Redis is configured, broadcasts invalidations to the other workers over
+pub/sub. The "redis" backend shares one cache between all workers.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from backend.api.user.model import User, UserResponse
+from backend.config.settings import _settings
+
+
+class LRUProfileStore:
+    """Thread-safe LRU with a per-entry time to live."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return payload
+
+    def set(self, user_id: int, payload: str) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self._ttl_seconds, payload)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+class RedisProfileStore:
+    """Profiles stored in Redis with an expiry, shared by all workers."""
+
+    def __init__(self, client, key_prefix: str, ttl_seconds: int):
+        self._client = client
+        self._key_prefix = key_prefix
+        self._ttl_seconds = ttl_seconds
+
+    def _key(self, user_id: int) -> str:
+        return f"{self._key_prefix}:{user_id}"
+
+    def get(self, user_id: int) -> Optional[str]:
+        payload = self._client.get(self._key(user_id))
+        return payload.decode() if payload is not None else None
+
+    def set(self, user_id: int, payload: str) -> None:
+        self._client.set(self._key(user_id), payload, ex=self._ttl_seconds)
+
+    def delete(self, user_id: int) -> None:
+        self._client.delete(self._key(user_id))
+
+
+class UserProfileCache:
+    """Read-through, write-through cache of user profile payloads."""
+
+    def __init__(self, store, redis_client=None, channel: Optional[str] = None):
+        self._store = store
+        self._redis = redis_client
+        self._channel = channel
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[str]:
+        """Return the cached JSON payload of a user, if any."""
+        self._ensure_listener()
+        try:
+            return self._store.get(user_id)
+        except Exception as e:
+            logger.warning(f"User cache read failed for user {user_id}: {e}")
+            return None
+
+    def set(self, user: User) -> str:
+        """Serialize a user, cache the payload and return it."""
+        payload = UserResponse.model_validate(user).model_dump_json()
+        try:
+            self._store.set(user.id, payload)
+        except Exception as e:
+            logger.warning(f"User cache write failed for user {user.id}: {e}")
+        self._publish(user.id)
+        return payload
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user from this worker's cache and from every other worker."""
+        try:
+            self._store.delete(user_id)
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed for user {user_id}: {e}")
+        self._publish(user_id)
+
+    def _publish(self, user_id: int) -> None:
+        if self._channel is None:
+            return
+        try:
+            self._redis.publish(self._channel, f"{self._origin}:{user_id}")
+        except Exception as e:
+            logger.warning(f"User cache invalidation broadcast failed: {e}")
+
+    def _ensure_listener(self) -> None:
+        if self._channel is None or self._listener is not None:
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="user-cache-invalidation", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    origin, _, user_id = message["data"].decode().partition(":")
+                    if origin != self._origin:
+                        self._store.delete(int(user_id))
+            except Exception as e:
+                logger.warning(f"User cache invalidation listener failed: {e}")
+                time.sleep(1)
+
+
+def build_user_profile_cache() -> UserProfileCache:
+    """Create the profile cache configured for this deployment."""
+    config = _settings.user_cache
+    redis_client = None
+    if _settings.redis.url:
+        import redis
+
+        redis_client = redis.Redis.from_url(_settings.redis.url)
+
+    if config.backend == "redis" and redis_client is not None:
+        store = RedisProfileStore(redis_client, config.key_prefix, config.ttl_seconds)
+        return UserProfileCache(store)
+
+    store = LRUProfileStore(config.max_entries, config.ttl_seconds)
+    if redis_client is None:
+        return UserProfileCache(store)
+    return UserProfileCache(
+        store, redis_client=redis_client, channel=config.invalidation_channel
+    )
+
+
+user_profile_cache = build_user_profile_cache()
@@ -1,50 +1,220 @@
-"""Helper utilities for role-based access control."""
+"""Helper utilities for role-based access control.
 
-from fastapi import HTTPException, status
+Roles are mapped to permission bitsets once, from a catalog of the ``Role``
+table loaded at startup, so guarded endpoints check permissions without
+querying roles. The role ids of users are resolved on the server, from a short
+lived per-user cache, so revoking a role applies to tokens already issued.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from enum import IntFlag, auto
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
 from loguru import logger
+from sqlalchemy import event, inspect, select
 from sqlalchemy.orm import Session
 from starlette.requests import Request
 
+from backend.api.user.model import Role, User, user_roles
+from backend.config.settings import _settings
+from backend.databases.db import SessionLocal
 from backend.utils.constants import Message, RoleType
+from backend.utils.dependency import get_current_user, get_db
+
+
+class Permission(IntFlag):
+    READ_SELF = auto()
+    UPDATE_SELF = auto()
+    READ_USERS = auto()
+    MANAGE_USERS = auto()
+    MANAGE_DATABASE = auto()
+    INGEST_DOCUMENTS = auto()
+
+
+ROLE_PERMISSIONS: Dict[int, Permission] = {
+    RoleType.ADMIN.value: (
+        Permission.READ_SELF
+        | Permission.UPDATE_SELF
+        | Permission.READ_USERS
+        | Permission.MANAGE_USERS
+        | Permission.MANAGE_DATABASE
+        | Permission.INGEST_DOCUMENTS
+    ),
+    RoleType.USER.value: Permission.READ_SELF | Permission.UPDATE_SELF,
+}
+
+
+class RoleCatalog:
+    """In-memory copy of the ``Role`` table with precomputed permission masks."""
+
+    def __init__(self, refresh_seconds: int):
+        self._refresh_seconds = refresh_seconds
+        self._roles: Dict[int, Role] = {}
+        self._masks: Dict[frozenset, Permission] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def load(self, db_session: Optional[Session] = None) -> None:
+        """(Re)load every role and reset the permission masks.
+
+        Args:
+            db_session: Database session to use, a new one is opened if omitted.
+        """
+        session = db_session or SessionLocal()
+        try:
+            roles = session.query(Role).all()
+            for role in roles:
+                session.expunge(role)
+        finally:
+            if db_session is None:
+                session.close()
+
+        with self._lock:
+            self._roles = {role.id: role for role in roles}
+            self._masks = {}
+            self._loaded_at = time.monotonic()
+        logger.info(f"Role catalog loaded with {len(roles)} roles")
+
+    def mark_stale(self) -> None:
+        """Force a reload on the next lookup."""
+        self._loaded_at = None
+
+    def _ensure_loaded(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self._refresh_seconds:
+            self.load()
+
+    def has_role(self, role_id: int) -> bool:
+        self._ensure_loaded()
+        return role_id in self._roles
+
+    def get_roles(self, role_ids: Iterable[int]) -> List[Role]:
+        """Return the detached ``Role`` objects for the given ids."""
+        self._ensure_loaded()
+        return [self._roles[role_id] for role_id in role_ids if role_id in self._roles]
+
+    def permissions_for(self, role_ids: Iterable[int]) -> Permission:
+        """Return the union of permissions granted by a set of roles."""
+        self._ensure_loaded()
+        key = frozenset(role_ids)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = Permission(0)
+            for role_id in key:
+                if role_id in self._roles:
+                    mask |= ROLE_PERMISSIONS.get(role_id, Permission(0))
+            self._masks[key] = mask
+        return mask
+
+
+class UserRoleCache:
+    """LRU of the role ids of users, with a time to live per entry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[float, FrozenSet[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_session: Session, user_id: int) -> FrozenSet[int]:
+        """Return the role ids of a user, loading them on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        role_ids = frozenset(
+            db_session.scalars(
+                select(user_roles.c.role_id).where(user_roles.c.user_id == user_id)
+            )
+        )
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self._ttl_seconds, role_ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return role_ids
 
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+role_catalog = RoleCatalog(_settings.permission.role_catalog_refresh_seconds)
+user_role_cache = UserRoleCache(
+    _settings.permission.user_roles_max_entries,
+    _settings.permission.user_roles_ttl_seconds,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_role_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Role):
+            session.info["roles_changed"] = True
+        elif isinstance(obj, User) and obj.id is not None:
+            # Attribute history is still available until the flush ends
+            if obj in session.deleted or inspect(obj).attrs.roles.history.has_changes():
+                session.info.setdefault("role_users", set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_role_catalog(session):
+    if session.info.pop("roles_changed", False):
+        role_catalog.mark_stale()
+    user_role_cache.invalidate(session.info.pop("role_users", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_role_changes(session):
+    session.info.pop("roles_changed", None)
+    session.info.pop("role_users", None)
+
+
+def require(permission: Permission):
+    """Build a dependency that rejects users lacking ``permission``.
 
-def check_admin_role(request: Request, db_session: Session) -> None:
-    """Check if the current user has admin role.
-    
     Args:
-        request: FastAPI request object containing user state.
-        db_session: Database session for querying user roles.
-        
-    Raises:
-        HTTPException: If user doesn't have admin role (403 Forbidden).
+        permission: Permission (or union of permissions) the endpoint needs.
+
+    Returns:
+        Callable: FastAPI dependency raising 403 Forbidden when not granted.
     """
-    from backend.api.user.service import user_service
-    
-    roles = user_service.get_user_roles_by_id(db_session, request.state.user_id)
-    role_ids = [role.id for role in roles]
-    admin_role_id = RoleType.ADMIN.value
-    
-    logger.debug(f"User {request.state.user_id} role IDs: {role_ids}")
-    
-    if admin_role_id not in role_ids:
-        logger.warning(
-            f"User {request.state.user_id} attempted admin action without admin role"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=Message.MESSAGE_PERMISSION_DENIED,
+
+    def check_permission(
+        request: Request,
+        db_session: Session = Depends(get_db),
+        _: None = Depends(get_current_user),
+    ) -> None:
+        granted = role_catalog.permissions_for(
+            user_role_cache.get(db_session, request.state.user_id)
         )
+        if granted & permission != permission:
+            logger.warning(
+                f"User {request.state.user_id} attempted action requiring {permission!r}"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=Message.MESSAGE_PERMISSION_DENIED,
+            )
+
+    return check_permission
 
 
 def check_user_permission(request: Request, target_user_id: int) -> None:
     """Check if the current user can access target user's resources.
-    
+
     Users can only access their own resources unless they are admin.
-    
+
     Args:
         request: FastAPI request object containing user state.
         target_user_id: ID of the user being accessed.
-        
+
     Raises:
         HTTPException: If user doesn't have permission (401 Unauthorized).
     """
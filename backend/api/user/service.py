@@ -3,18 +3,21 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from backend.api.token.service import generate_tokens
+from backend.api.user.activity import activity_recorder
+from backend.api.user.cache import user_profile_cache
 from backend.api.user.model import (
     ChangePasswordRequest,
     ChangePasswordResponse,
     LoginRequest,
     LoginResponse,
-    Role,
     SelfUserInformationUpdateRequest,
     SelfUserInformationUpdateResponse,
     User,
     UserCreateRequest,
+    UserResponse,
     UserUpdateRequest,
 )
+from backend.api.user.permissions import role_catalog
 from backend.databases.db import get_by_id, get_utc_now, insert_row
 from backend.exceptions.model import InvalidRequestException, ObjectNotFoundException
 from backend.utils.constants import Message
@@ -68,6 +71,22 @@ class UserService:
             raise ObjectNotFoundException(message=Message.MESSAGE_USER_NOT_FOUND)
         return user
 
+    def get_user_profile_by_id(self, db_session: Session, user_id: int) -> str:
+        """Retrieve the serialized profile of a user, served from cache when possible.
+
+        Args:
+            db_session (Session): SQLAlchemy database session.
+            user_id (int): User's unique identifier.
+
+        Returns:
+            str: JSON-encoded UserResponse payload.
+        """
+        payload = user_profile_cache.get(user_id)
+        if payload is None:
+            user = self.get_user_by_id(db_session, user_id)
+            payload = user_profile_cache.set(user)
+        return payload
+
     def get_user_roles_by_id(self, db_session: Session, user_id: int):
         """Retrieve the roles assigned to a user.
 
@@ -121,8 +140,11 @@ class UserService:
         )
         new_user.set_password(user_in.password)
 
-        roles = db_session.query(Role).filter(Role.id.in_(user_in.roles)).all()
-        new_user.roles = roles
+        # Attach roles from the catalog without querying the Role table
+        new_user.roles = [
+            db_session.merge(role, load=False)
+            for role in role_catalog.get_roles(user_in.roles)
+        ]
         new_user.created_at = get_utc_now()
         new_user.updated_at = get_utc_now()
         try:
@@ -187,6 +209,7 @@ class UserService:
         try:
             db_session.commit()
             db_session.refresh(user)
+            user_profile_cache.set(user)
             return user
         except PermissionError as e:
             db_session.rollback()
@@ -210,6 +233,7 @@ class UserService:
         try:
             db_session.commit()
             db_session.refresh(user)
+            user_profile_cache.set(user)
             return user
         except PermissionError as e:
             db_session.rollback()
@@ -238,15 +262,21 @@ class UserService:
                 raise ObjectNotFoundException(message=Message.MESSAGE_USER_NOT_FOUND)
         if not user.check_password(login_request.password):
             raise InvalidRequestException(message=Message.MESSAGE_INVALID_PASSWORD)
-        if not user.first_login:
-            user.first_login = get_utc_now()
-        user.last_login = get_utc_now()
-        refresh_token, access_token = generate_tokens(db_session, user.id, user.email)
+
+        # Login timestamps are written in the background by the activity recorder
+        now = get_utc_now()
+        user_response = UserResponse.model_validate(user).model_copy(
+            update={"first_login": user.first_login or now, "last_login": now}
+        )
         try:
-            db_session.commit()
-            db_session.refresh(user)
+            refresh_token, access_token = generate_tokens(
+                db_session, user.id, user.email
+            )
+            activity_recorder.record_login(user_response.id, now)
             return LoginResponse(
-                user=user, refresh_token=refresh_token, access_token=access_token
+                user=user_response,
+                refresh_token=refresh_token,
+                access_token=access_token,
             )
         except PermissionError as e:
             db_session.rollback()
@@ -258,28 +288,19 @@ class UserService:
     def logout_user(self, db_session: Session, user_id: int):
         """Log out a user by updating their last login timestamp.
 
+        The timestamp is recorded by the activity recorder and written to the
+        database in the background.
+
         Args:
             db_session (Session): SQLAlchemy database session.
             user_id (int): ID of the user to log out.
 
         Returns:
-            User: Updated user object.
+            User: User object.
         """
         user = self.get_user_by_id(db_session, user_id)
-        user.last_login = get_utc_now()
-        try:
-            # Commit transaction
-            db_session.commit()
-            # Refresh user
-            db_session.refresh(user)
-            return user
-        except PermissionError as e:
-            # Rollback transaction
-            db_session.rollback()
-            raise e
-        except SQLAlchemyError as e:
-            db_session.rollback()
-            raise e
+        activity_recorder.record_logout(user.id, get_utc_now())
+        return user
 
     def change_password_user(
         self,
@@ -304,6 +325,7 @@ class UserService:
             try:
                 db_session.commit()
                 db_session.refresh(user)
+                user_profile_cache.invalidate(user_id)
                 return ChangePasswordResponse(
                     message=Message.MESSAGE_PASSWORD_CHANGED_SUCCESSFULLY
                 )
@@ -351,6 +373,7 @@ class UserService:
         try:
             db_session.commit()
             db_session.refresh(user)
+            user_profile_cache.set(user)
             return SelfUserInformationUpdateResponse(
                 message=Message.MESSAGE_USER_INFORMATION_UPDATED_SUCCESSFULLY
             )
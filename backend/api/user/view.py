@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from loguru import logger
 from sqlalchemy.orm import Session
 
@@ -12,7 +12,12 @@ from backend.api.user.model import (
     UserResponse,
     UserUpdateRequest,
 )
-from backend.api.user.permissions import check_admin_role, check_user_permission
+from backend.api.user.permissions import (
+    Permission,
+    check_user_permission,
+    require,
+    role_catalog,
+)
 from backend.api.user.service import user_service
 from backend.utils.constants import Message
 from backend.utils.dependency import get_current_user, get_db
@@ -43,8 +48,8 @@ async def get_self_user(
 ):
     """Get self user information."""
     check_user_permission(request, user_id)
-    user = user_service.get_user_by_id(db_session, user_id)
-    return user
+    payload = user_service.get_user_profile_by_id(db_session, user_id)
+    return Response(content=payload, media_type="application/json")
 
 
 @router.put(
@@ -103,44 +108,45 @@ async def update_self_user_information(
 
 
 # API for admin
-@router.get("/{user_id}", response_model=UserResponse, description="Get a user by ID")
-async def get_user(
-    request: Request, user_id: int, db_session: Session = Depends(get_db)
-):
+@router.get(
+    "/{user_id}",
+    response_model=UserResponse,
+    description="Get a user by ID",
+    dependencies=[Depends(require(Permission.READ_USERS))],
+)
+async def get_user(user_id: int, db_session: Session = Depends(get_db)):
     """Get a user by ID (admin only)."""
-    check_admin_role(request, db_session)
-    
     # Get user by ID
-    user = user_service.get_user_by_id(db_session, user_id)
-    return user
+    payload = user_service.get_user_profile_by_id(db_session, user_id)
+    return Response(content=payload, media_type="application/json")
 
 
 @router.put(
-    "/{user_id}", response_model=UserResponse, description="Update a user by ID"
+    "/{user_id}",
+    response_model=UserResponse,
+    description="Update a user by ID",
+    dependencies=[Depends(require(Permission.MANAGE_USERS))],
 )
 async def update_user(
-    request: Request,
     user_id: int,
     user_update_request: UserUpdateRequest,
     db_session: Session = Depends(get_db),
 ):
     """Update a user by ID (admin only).
-    
+
     Args:
-        request: FastAPI request object.
         user_id: ID of the user to update.
         user_update_request: User update request data.
         db_session: Database session.
-        
+
     Returns:
         Updated user object.
     """
-    check_admin_role(request, db_session)
-
     # Check roles of user to be updated (prevent updating other admins)
     user_roles = user_service.get_user_roles_by_id(db_session, user_id)
-    user_role_ids = [role.id for role in user_roles]
-    if RoleType.ADMIN.value in user_role_ids:
+    if role_catalog.permissions_for(role.id for role in user_roles) & (
+        Permission.MANAGE_USERS
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=Message.MESSAGE_PERMISSION_DENIED,
@@ -156,22 +162,20 @@ async def update_user(
     "/{user_id}",
     status_code=status.HTTP_200_OK,
     description="Delete a user by ID",
+    dependencies=[Depends(require(Permission.MANAGE_USERS))],
 )
-async def delete_user(
-    request: Request, user_id: int, db_session: Session = Depends(get_db)
-):
+async def delete_user(user_id: int, db_session: Session = Depends(get_db)):
     """Delete a user by ID (admin only)."""
-    check_admin_role(request, db_session)
-
     # Check roles of user to be deleted (prevent deleting other admins)
     user_roles = user_service.get_user_roles_by_id(db_session, user_id)
-    user_role_ids = [role.id for role in user_roles]
-    if RoleType.ADMIN.value in user_role_ids:
+    if role_catalog.permissions_for(role.id for role in user_roles) & (
+        Permission.MANAGE_USERS
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=Message.MESSAGE_PERMISSION_DENIED,
         )
-        
+
     # Delete user by ID
     logger.info(f"Deleting user by ID: {user_id}")
     user_service.delete_user_by_id(db_session, user_id)
@@ -0,0 +1,26 @@
+"""Celery application running the ingestion pipeline.
+
+Start a worker with::
+
+    celery -A backend.celery_app worker -Q pipeline_processing --concurrency 1
+
+One document is converted at a time per worker process, extraction already
+spreads a large document over the cores.
+"""
+
+from dataclasses import asdict
+
+from celery import Celery
+
+from backend.config.settings import _settings
+
+_celery_config = asdict(_settings.celery)
+_app_name = _celery_config.pop("app_name")
+_include = _celery_config.pop("include")
+# Not a Celery setting, priority names accepted by the job API
+_celery_config.pop("priorities")
+
+celery_app = Celery(_app_name, include=_include)
+celery_app.conf.update(**_celery_config)
+# Let "celery -A backend.celery_app" find the application
+app = celery_app
@@ -36,6 +36,12 @@ def chatfile_server():
     pass
 
 
+@chatfile_cli.group("ingestion")
+def chatfile_ingestion():
+    """Command-line interface to Chatbot ingestion commands."""
+    pass
+
+
 @chatfile_server.command("start")
 def server_start():
     uvicorn.run("app.main:app", port=8300, host="0.0.0.0")
@@ -46,6 +52,47 @@ def server_develop():
     uvicorn.run("app.main:socket_app", reload=True, port=8000, host="0.0.0.0")
 
 
+@chatfile_server.command("bench-rate-limit")
+@click.option("-n", "--iterations", default=100_000, help="Simulated requests")
+def server_bench_rate_limit(iterations):
+    """Benchmarks the overhead of the in-process rate limiter."""
+    from backend.utils.rate_limit import benchmark_rate_limiter
+
+    result = benchmark_rate_limiter(iterations)
+    click.secho(
+        f"{result['iterations']} requests: mean {result['mean_us']:.1f}us, "
+        f"p99 {result['p99_us']:.1f}us",
+        fg="green",
+    )
+
+
+@chatfile_server.command("startup-check")
+@click.option("--module", default="backend.main", help="Module imported at startup")
+@click.option("-n", "--repeat", default=3, help="Fresh interpreters to time")
+@click.option("--max-seconds", default=3.0, help="Import time budget")
+@click.option("--max-rss-mb", default=400, help="Resident set size budget")
+def server_startup_check(module, repeat, max_seconds, max_rss_mb):
+    """Fails when API workers import ingestion dependencies or start slowly."""
+    from backend.utils.startup import measure_startup
+
+    result = measure_startup(module, repeat)
+    click.echo(
+        f"{module}: {result['seconds']:.2f}s, {result['rss_mb']:.0f} MB resident"
+    )
+    errors = []
+    if result["heavy_modules"]:
+        errors.append(f"imports {', '.join(result['heavy_modules'])} at startup")
+    if result["seconds"] > max_seconds:
+        errors.append(f"import takes more than {max_seconds:.2f}s")
+    if result["rss_mb"] > max_rss_mb:
+        errors.append(f"resident set size is over {max_rss_mb} MB")
+    for error in errors:
+        click.secho(f"{module} {error}", fg="red")
+    if errors:
+        raise SystemExit(1)
+    click.secho("Success.", fg="green")
+
+
 @chatfile_database.command("init")
 def init_database():
     """Initializes a new database."""
@@ -138,6 +185,375 @@ def downgrade_database(tag, sql, revision):
     click.secho("Success.", fg="green")
 
 
+@chatfile_database.command("import-users")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--rejects",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="File receiving rejected rows (default: <path>.rejects.csv).",
+)
+@click.option("--batch-size", default=50_000, help="Rows per COPY and merge.")
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes used to validate rows and hash passwords (default: all cores).",
+)
+def import_users_database(path, rejects, batch_size, workers):
+    """Imports users from a CSV or JSONL file."""
+    from backend.api.user.bulk_import import import_users
+
+    rejects = rejects or path.with_name(f"{path.name}.rejects.csv")
+    report = import_users(path, rejects, batch_size=batch_size, workers=workers)
+    click.secho(
+        f"Imported {report.imported} of {report.total} users in "
+        f"{report.elapsed:.1f}s ({report.total / max(report.elapsed, 1e-9):.0f} rows/s).",
+        fg="green",
+    )
+    if report.rejected:
+        click.secho(f"{report.rejected} rows rejected, see {rejects}", fg="yellow")
+
+
+@chatfile_ingestion.command("extract-dir")
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("temp/extracted"),
+    help="Folder receiving one Docling JSON file per document.",
+)
+@click.option("--workers", type=int, default=None, help="Worker processes.")
+@click.option("--accelerator", is_flag=True, help="Use the threaded pipeline.")
+@click.option("--no-ocr", is_flag=True, help="Disable OCR.")
+def extract_directory(directory, output, workers, accelerator, no_ocr):
+    """Extracts every supported document of a directory tree."""
+    import time
+
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+    from backend.api.data_ingestion.model import DocumentSuffix
+
+    suffixes = {
+        suffix
+        for document_suffix in (
+            DocumentSuffix.PDF,
+            DocumentSuffix.DOCX,
+            DocumentSuffix.DOC,
+            DocumentSuffix.EXCEL,
+            DocumentSuffix.POWERPOINT,
+            DocumentSuffix.IMAGE,
+        )
+        for suffix in document_suffix.value
+    }
+    doc_paths = (
+        path
+        for path in sorted(directory.rglob("*"))
+        if path.is_file() and path.suffix.lower() in suffixes
+    )
+
+    started = time.perf_counter()
+    documents = pages = failed = 0
+    for result in DoclingExtractionService().extract_many(
+        doc_paths,
+        output_folder=output,
+        max_workers=workers,
+        is_accelerator=accelerator,
+        do_ocr=not no_ocr,
+    ):
+        documents += 1
+        if result.ok:
+            pages += result.num_pages
+            ocr = ""
+            if result.ocr_stats is not None:
+                ocr = (
+                    f", {len(result.ocr_stats.ocr_pages)}/{result.ocr_stats.pages} "
+                    "pages OCRed"
+                )
+            click.secho(
+                f"{result.doc_path}: {result.num_pages} pages in "
+                f"{result.elapsed:.1f}s{ocr}",
+                fg="green",
+            )
+        else:
+            failed += 1
+            click.secho(f"{result.doc_path}: {result.error}", fg="red")
+
+    elapsed = time.perf_counter() - started
+    click.secho(
+        f"{documents} documents ({failed} failed), {pages} pages in {elapsed:.1f}s "
+        f"({pages / max(elapsed, 1e-9):.2f} pages/s).",
+        fg="green",
+    )
+
+
+@chatfile_ingestion.command("extract-file")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("temp/extracted"),
+    help="Folder receiving the Docling JSON file.",
+)
+@click.option("--workers", type=int, default=None, help="Worker processes.")
+@click.option("--accelerator", is_flag=True, help="Use the threaded pipeline.")
+@click.option("--no-ocr", is_flag=True, help="Disable OCR.")
+def extract_file(path, output, workers, accelerator, no_ocr):
+    """Extracts one document, splitting large PDFs into page-range shards."""
+    import time
+
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+    started = time.perf_counter()
+    doc = DoclingExtractionService().extract_sharded(
+        path,
+        output_folder=output,
+        max_workers=workers,
+        is_accelerator=accelerator,
+        do_ocr=not no_ocr,
+    )
+    output_path = output / f"{path.stem}.json"
+    doc.save_as_json(output_path)
+
+    elapsed = time.perf_counter() - started
+    click.secho(
+        f"{path}: {len(doc.pages)} pages in {elapsed:.1f}s "
+        f"({len(doc.pages) / max(elapsed, 1e-9):.2f} pages/s) -> {output_path}",
+        fg="green",
+    )
+
+
+@chatfile_ingestion.command("bench-office")
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("temp/bench-office"),
+    help="Scratch folder for converted documents.",
+)
+def bench_office(directory, output):
+    """Compares native Office extraction with converting to PDF first."""
+    from backend.api.data_ingestion.office import benchmark_office_formats
+
+    doc_paths = [
+        path
+        for path in sorted(directory.rglob("*"))
+        if path.is_file() and path.suffix.lower() in (".docx", ".xlsx", ".pptx")
+    ]
+    native_seconds = via_pdf_seconds = pages = 0
+    for result in benchmark_office_formats(doc_paths, output):
+        pages += result["pages"]
+        native_seconds += result["native_seconds"]
+        via_pdf_seconds += result["via_pdf_seconds"]
+        click.secho(
+            f"{result['document']}: {result['pages']} pages, "
+            f"native {result['native_seconds']:.2f}s, "
+            f"via PDF {result['via_pdf_seconds']:.2f}s",
+            fg="green",
+        )
+    click.secho(
+        f"{len(doc_paths)} documents, {pages} pages: "
+        f"native {pages / max(native_seconds, 1e-9):.2f} pages/s, "
+        f"via PDF {pages / max(via_pdf_seconds, 1e-9):.2f} pages/s.",
+        fg="green",
+    )
+
+
+@chatfile_ingestion.command("bench-chunk")
+@click.argument(
+    "pages_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=False,
+)
+@click.option("--pages", default=2000, help="Synthetic pages without PAGES_PATH.")
+@click.option("-n", "--repeat", default=3, help="Runs, the fastest is reported.")
+def bench_chunk(pages_path, pages, repeat):
+    """Measures chunking throughput on a pages.jsonl or a synthetic corpus."""
+    from backend.api.data_ingestion.chunking import benchmark_chunker, synthetic_pages
+    from backend.api.data_ingestion.model import ExtractedPage
+
+    if pages_path is None:
+        corpus = synthetic_pages(pages)
+    else:
+        with open(pages_path, encoding="utf-8") as file:
+            corpus = [ExtractedPage.model_validate_json(line) for line in file]
+
+    result = benchmark_chunker(corpus, repeat)
+    click.secho(
+        f"{result['pages']} pages -> {result['chunks']} chunks, "
+        f"{result['tokens']} tokens in {result['seconds']:.2f}s: "
+        f"{result['chunks_per_second']:.0f} chunks/s, "
+        f"{result['pages_per_second']:.0f} pages/s",
+        fg="green",
+    )
+
+
+@chatfile_ingestion.command("bench-bm25")
+@click.argument(
+    "chunks_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=False,
+)
+@click.option("--pages", default=2000, help="Synthetic pages without CHUNKS_PATH.")
+@click.option("-n", "--repeat", default=3, help="Runs, the fastest is reported.")
+def bench_bm25(chunks_path, pages, repeat):
+    """Measures BM25 encoding throughput on a chunks.jsonl or a synthetic corpus."""
+    from backend.api.data_ingestion.bm25 import benchmark_bm25
+    from backend.api.data_ingestion.chunking import Chunker, synthetic_pages
+    from backend.api.data_ingestion.embedding import embedding_text
+    from backend.api.data_ingestion.model import DocumentChunk
+
+    if chunks_path is None:
+        chunks = Chunker().chunk_pages(synthetic_pages(pages))
+    else:
+        with open(chunks_path, encoding="utf-8") as file:
+            chunks = [DocumentChunk.model_validate_json(line) for line in file]
+    texts = [embedding_text(chunk) for chunk in chunks]
+
+    result = benchmark_bm25(texts, repeat)
+    click.secho(
+        f"{result['documents']} chunks, {result['terms']} terms "
+        f"in {result['seconds']:.2f}s: "
+        f"{result['documents_per_minute']:.0f} chunks/min",
+        fg="green",
+    )
+
+
+@chatfile_ingestion.command("tune")
+@click.option("--workers", default=1, help="Worker processes sharing the host.")
+@click.option(
+    "--calibrate",
+    "run_calibration",
+    is_flag=True,
+    help="Time candidate batch sizes and store the fastest for this host.",
+)
+def tune(workers, run_calibration):
+    """Shows the threads and batch sizes tuned for this host."""
+    from backend.api.data_ingestion.tuning import (
+        calibrate,
+        detect_resources,
+        get_accelerator_profile,
+    )
+
+    resources = detect_resources()
+    quota = f"{resources.cpu_quota:g}" if resources.cpu_quota else "none"
+    click.echo(
+        f"{resources.cpus} CPUs (quota {quota}), "
+        f"{resources.available_memory_mb} of {resources.total_memory_mb} MB "
+        f"available, CUDA {'yes' if resources.cuda else 'no'}"
+    )
+    if run_calibration:
+        profile = calibrate(resources, workers)
+    else:
+        profile = get_accelerator_profile(workers)
+    click.secho(
+        f"{profile.source} profile: num_threads={profile.num_threads} "
+        f"ocr_batch_size={profile.ocr_batch_size} "
+        f"layout_batch_size={profile.layout_batch_size} "
+        f"table_batch_size={profile.table_batch_size}",
+        fg="green",
+    )
+
+
+def _parse_int_list(ctx, param, value):
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise click.BadParameter("expected comma separated integers")
+
+
+@chatfile_ingestion.command("benchmark")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("temp/benchmark"),
+    help="Folder receiving the corpus and report.json / report.md.",
+)
+@click.option(
+    "--corpus",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    default=None,
+    help="Benchmark the PDFs of this folder instead of a synthetic corpus.",
+)
+@click.option("--pages", default=8, help="Pages per synthetic document.")
+@click.option("--repeat", default=1, help="Extractions of each document.")
+@click.option(
+    "--threads", default="4", callback=_parse_int_list, help="num_threads values."
+)
+@click.option(
+    "--batch-sizes",
+    default="4",
+    callback=_parse_int_list,
+    help="ocr_batch_size and table_batch_size values.",
+)
+@click.option(
+    "--layout-batch-sizes",
+    default="64",
+    callback=_parse_int_list,
+    help="layout_batch_size values.",
+)
+@click.option(
+    "--matrix",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help='JSON list of {"name", "options"} replacing the generated matrix.',
+)
+@click.option("--no-ocr", is_flag=True, help="Disable OCR.")
+@click.option(
+    "--online",
+    is_flag=True,
+    help="Allow downloading missing models from the Hugging Face Hub.",
+)
+def benchmark(
+    output,
+    corpus,
+    pages,
+    repeat,
+    threads,
+    batch_sizes,
+    layout_batch_sizes,
+    matrix,
+    no_ocr,
+    online,
+):
+    """Compares extraction configurations on a synthetic corpus."""
+    if not online:
+        # Inherited by the benchmark processes, models must be cached locally
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    from backend.api.data_ingestion.benchmark import (
+        build_matrix,
+        generate_corpus,
+        load_matrix,
+        run_benchmark,
+        write_report,
+    )
+
+    if corpus is None:
+        doc_paths = generate_corpus(output / "corpus", pages=pages)
+    else:
+        doc_paths = sorted(corpus.glob("*.pdf"))
+    configs = (
+        load_matrix(matrix)
+        if matrix
+        else build_matrix(threads, batch_sizes, layout_batch_sizes)
+    )
+    for config in configs:
+        config.options.setdefault("do_ocr", not no_ocr)
+
+    report = run_benchmark(doc_paths, configs, output / "extracted", repeat=repeat)
+    json_path, markdown_path = write_report(report, output)
+    click.echo(markdown_path.read_text())
+    click.secho(f"Report written to {json_path} and {markdown_path}", fg="green")
+
+
 def entrypoint():
     """The entry that the CLI is executed from"""
     try:
@@ -14,8 +14,19 @@ class QdrantConfig:
     qdrant_host: str = os.getenv("QDRANT_HOST")
     qdrant_port: str = os.getenv("QDRANT_PORT")
     qdrant_url: str = f"http://{qdrant_host}:{qdrant_port}"
+    qdrant_grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    qdrant_prefer_grpc: bool = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+    # ":memory:" or a folder for the local mode of qdrant-client, no server
+    qdrant_location: str = os.getenv("QDRANT_LOCATION", "")
     qdrant_timeout: int = 3600
     qdrant_batch_size: int = 100
+    # Upsert requests sent at the same time, retries of a failed one
+    qdrant_max_in_flight: int = 4
+    qdrant_max_retries: int = 5
+    qdrant_retry_delay: float = 0.5
+    # Names of the vectors of a point
+    dense_vector_name: str = "dense"
+    sparse_vector_name: str = "sparse"
 
     # collection names
     default_collection: str = "default_collection"
@@ -83,6 +94,76 @@ class RedisConfig:
     url: str = os.getenv("REDIS_URL")
 
 
+@dataclass
+class PermissionConfig:
+    """Role-based access control configuration settings."""
+
+    # Other workers pick up role changes at most this long after they happen
+    role_catalog_refresh_seconds: int = 300
+    # Role ids of users are cached per worker; a commit changing the roles of
+    # a user drops them at once in that worker, others within this delay
+    user_roles_ttl_seconds: int = 30
+    user_roles_max_entries: int = 10_000
+
+
+@dataclass
+class UserCacheConfig:
+    """User profile cache configuration settings."""
+
+    # "memory" keeps an LRU per worker, "redis" shares one cache between workers
+    backend: str = os.getenv("USER_CACHE_BACKEND", "memory")
+    max_entries: int = 10_000
+    ttl_seconds: int = 300
+    key_prefix: str = "user-profile"
+    invalidation_channel: str = "user-profile-invalidation"
+
+
+@dataclass
+class ActivityConfig:
+    """Login activity recorder configuration settings."""
+
+    # Pending login/logout timestamps are written at least this often
+    flush_interval_seconds: float = 5.0
+    # ... or as soon as this many users are waiting to be written
+    max_pending: int = 1000
+    # Rows per UPDATE statement
+    batch_size: int = 1000
+
+
+@dataclass
+class RateLimitConfig:
+    """Rate limit configuration settings."""
+
+    enabled: bool = True
+    key_prefix: str = "rate-limit"
+    # Maximum number of buckets kept by the in-process limiter
+    max_keys: int = 100_000
+    # Only trust X-Forwarded-For when running behind our own proxy
+    trust_forwarded_for: bool = False
+    # Per-route limits as (capacity, refill tokens per second). The "ip" bucket
+    # is keyed by client address, the "identity" bucket by the body field named
+    # in "identity_field".
+    routes: Dict[str, Dict] = field(
+        default_factory=lambda: {
+            "/api/authentication/login": {
+                "ip": (20, 20 / 60),
+                "identity": (5, 5 / 60),
+                "identity_field": "username",
+            },
+            "/api/authentication/register": {
+                "ip": (5, 5 / 60),
+                "identity": (3, 3 / 60),
+                "identity_field": "username",
+            },
+            "/api/authentication/access": {
+                "ip": (30, 30 / 60),
+                "identity": (10, 10 / 60),
+                "identity_field": "refresh_token",
+            },
+        }
+    )
+
+
 @dataclass
 class CeleryConfig:
     """Celery configuration settings."""
@@ -94,16 +175,40 @@ class CeleryConfig:
     task_serializer: str = "json"
     result_serializer: str = "json"
     accept_content: List[str] = field(default_factory=lambda: ["json"])
-    include: List[str] = field(default_factory=lambda: ["core.files.tasks"])
+    include: List[str] = field(
+        default_factory=lambda: ["backend.api.data_ingestion.tasks"]
+    )
     enable_utc: bool = True
     task_routes: Dict[str, str] = field(
         default_factory=lambda: {"process_file": "pipeline_processing"}
     )
+    # Redis emulates message priorities with one list per priority step,
+    # 0 being served first
+    broker_transport_options: Dict = field(
+        default_factory=lambda: {
+            "priority_steps": list(range(10)),
+            "sep": ":",
+            "queue_order_strategy": "priority",
+        }
+    )
+    task_default_priority: int = 5
+    priorities: Dict[str, int] = field(
+        default_factory=lambda: {"high": 0, "normal": 5, "low": 9}
+    )
+    task_track_started: bool = True
     worker_prefetch_multiplier: int = 1
     task_acks_late: bool = True
+    task_reject_on_worker_lost: bool = True
     worker_disable_rate_limits: bool = False
-    task_always_eager: bool = False
-    task_eager_propagates: bool = True
+    # Runs tasks inline, for local development and tests without a broker
+    task_always_eager: bool = (
+        os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
+    )
+    # Eager failures are recorded as FAILURE like on a worker, so that a
+    # resubmitted job resumes, instead of being raised to the submitter
+    task_eager_propagates: bool = False
+    # Keep eager job states in the result backend so the status API works
+    task_store_eager_result: bool = True
     task_max_retries: int = 0
     task_time_limit: int = 3600
     task_soft_time_limit: int = 3300
@@ -130,6 +235,27 @@ class EmbeddingModelConfig:
     dense_model: str = "text-embedding-3-large"
     dense_embedding_size: int = 3072
     sparse_model: str = "Qdrant/bm25"
+    api_version: str = "2024-10-21"
+
+    # "azure_openai" or "hashing"; "bm25", "fastembed", "hashing" or "none"
+    dense_encoder: str = os.getenv("EMBEDDING_DENSE_ENCODER", "azure_openai")
+    sparse_encoder: str = os.getenv("EMBEDDING_SPARSE_ENCODER", "bm25")
+    # Limits of one request, the provider caps inputs and tokens per request
+    batch_max_tokens: int = 32000
+    batch_max_size: int = 256
+    # Batches embedded at the same time
+    max_in_flight: int = 4
+    timeout_seconds: int = 60
+    max_retries: int = 3
+
+    # Local BM25 encoder, its document frequencies shared by the workers
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    # Average document length until documents are indexed
+    bm25_avg_length: float = 256.0
+    bm25_statistics_path: str = os.getenv(
+        "BM25_STATISTICS_PATH", "tmp/index/bm25_statistics.npz"
+    )
 
 
 @dataclass
@@ -187,8 +313,10 @@ class APIConfig:
 class ChunkConfig:
     """Chunk configuration settings."""
 
+    # Sizes in tokens of the tiktoken encoding, approximated by words without it
     chunk_size: int = 1000
     chunk_overlap: int = 100
+    tokenizer: str = "cl100k_base"
     markdown_headers: List[Tuple[str, str]] = field(
         default_factory=lambda: [
             ("#", "header1"),
@@ -199,6 +327,127 @@ class ChunkConfig:
     separators: List[str] = field(default_factory=lambda: ["\n\n", "\n", ". ", " ", ""])
 
 
+@dataclass
+class DedupConfig:
+    """Near-duplicate chunk detection settings."""
+
+    enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    # Estimated Jaccard similarity of the word shingles of two chunks above
+    # which the later one is a duplicate
+    threshold: float = 0.85
+    shingle_size: int = 5
+    num_perm: int = 128
+    seed: int = 1
+    # Chunks looked up in the index per request, and candidates fetched at most
+    batch_size: int = 64
+    max_candidates: int = 1000
+
+
+@dataclass
+class ExtractionConfig:
+    """Document extraction configuration settings."""
+
+    # Warm DocumentConverter registry
+    max_converters: int = 4
+    converter_memory_limit_mb: int = 6144
+    converter_idle_seconds: int = 1800
+    prewarm: bool = os.getenv("EXTRACTION_PREWARM", "false").lower() == "true"
+
+    # Batch extraction across worker processes
+    max_workers: int = int(os.getenv("EXTRACTION_MAX_WORKERS", "0"))  # 0: all cores
+    max_tasks_per_worker: int = 50
+    min_free_memory_mb: int = 2048
+
+    # Page-range sharding of large PDFs across worker processes
+    shard_min_document_pages: int = 64  # smaller PDFs are converted in one piece
+    shard_min_pages: int = 8
+    shard_max_pages: int = 128
+    shards_per_worker: int = 2
+
+    # Streaming extraction converts PDFs in windows of this many pages
+    stream_window_pages: int = 4
+
+    # Memory-bounded extraction: PDF windows are resized to keep the resident
+    # set size of the process under this budget (0: unbounded)
+    memory_budget_mb: int = int(os.getenv("EXTRACTION_MEMORY_BUDGET_MB", "0"))
+    memory_max_window_pages: int = 32
+    # Share of the memory left under the budget a window may use
+    memory_window_headroom: float = 0.8
+    # Pages buffered between the stages of the PDF pipeline, at least a batch
+    pipeline_queue_max_size: int = 16
+
+    # Persistent LibreOffice servers converting DOC/XLS/PPT to Open XML
+    office_pool_size: int = 2
+    office_timeout_seconds: int = 120
+
+    # Adaptive OCR: only pages without a usable text layer are OCRed in full
+    adaptive_ocr: bool = os.getenv("EXTRACTION_ADAPTIVE_OCR", "true").lower() == "true"
+    ocr_min_chars: int = 32
+    ocr_min_image_coverage: float = 0.3
+    ocr_max_invalid_ratio: float = 0.1
+    ocr_min_alnum_ratio: float = 0.5
+    ocr_scanned_image_coverage: float = 0.8
+    ocr_min_text_coverage: float = 0.02
+
+    # Threads and batch sizes derived from the host resources when not given
+    auto_tune: bool = os.getenv("EXTRACTION_AUTO_TUNE", "true").lower() == "true"
+    # Calibrated profiles, one per host and resources
+    tuning_profile_path: str = os.getenv(
+        "EXTRACTION_TUNING_PROFILE_PATH", "tmp/cache/accelerator_profiles.json"
+    )
+    # Share of the available memory batches may use, after loading the models
+    tuning_memory_fraction: float = 0.5
+    tuning_base_memory_mb: int = 1536
+    # Estimated memory of one page image and of one table in a batch
+    tuning_page_memory_mb: int = 64
+    tuning_table_memory_mb: int = 128
+
+    # Picture descriptions by an OpenAI-compatible VLM server
+    vlm_concurrency: int = 8
+    vlm_timeout_seconds: int = 120
+    vlm_max_retries: int = 2
+    # Pictures covering less of their page are not described
+    picture_min_area: float = 0.05
+    # Pictures whose perceptual hashes differ by fewer bits share a description
+    picture_max_hash_distance: int = 8
+    picture_images_scale: float = 2.0
+    picture_memory_entries: int = 4096
+
+    # Content-addressed cache of extracted documents
+    cache_enabled: bool = (
+        os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    )
+    # Defaults to a "cache" folder inside the extraction output folder
+    cache_dir: str = os.getenv("EXTRACTION_CACHE_DIR", "")
+    cache_max_size_mb: int = 4096
+    # Recently used documents also kept decoded, skipping JSON validation
+    cache_memory_entries: int = 32
+
+
+@dataclass
+class RetrievalConfig:
+    """Hybrid retrieval configuration settings."""
+
+    # Collections searched when a query does not name any
+    collections: List[str] = field(
+        default_factory=lambda: [
+            QdrantConfig.company_collection,
+            QdrantConfig.project_collection,
+            QdrantConfig.experience_collection,
+        ]
+    )
+    # Results returned once the dense and sparse results are fused
+    limit: int = QdrantConfig.limit
+    # Candidates of every dense and sparse query, per collection
+    candidates: int = 20
+    # Reciprocal rank fusion constant: score = sum(1 / (rrf_k + rank))
+    rrf_k: int = 60
+    # Queries still running after the budget are dropped from the results
+    budget_ms: int = 1000
+    max_workers: int = 16
+    query_cache_entries: int = 1024
+
+
 @dataclass
 class ProcessFileConfig:
     """Process file configuration settings."""
@@ -207,6 +456,24 @@ class ProcessFileConfig:
     download_timeout: int = 3600
     max_retries: int = 3
     retry_delay: int = 60
+    # Held in Redis while a job is submitted, so that concurrent submissions
+    # of the same document queue it once
+    submit_lock_prefix: str = "ingestion-submit"
+    submit_lock_seconds: int = 30
+    # Downloads stop past this size, whatever Content-Length says
+    max_download_bytes: int = int(
+        os.getenv("PROCESS_FILE_MAX_DOWNLOAD_BYTES", str(512 * 1024 * 1024))
+    )
+    max_download_redirects: int = 5
+    # Hosts downloaded from even though they resolve to a private address,
+    # e.g. a document store inside the cluster; comma separated
+    allowed_download_hosts: List[str] = field(
+        default_factory=lambda: [
+            host.strip()
+            for host in os.getenv("PROCESS_FILE_ALLOWED_DOWNLOAD_HOSTS", "").split(",")
+            if host.strip()
+        ]
+    )
 
 
 @dataclass
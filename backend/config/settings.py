@@ -1,21 +1,28 @@
 from pydantic_settings import BaseSettings
 
 from .config import (
+    ActivityConfig,
     APIConfig,
     AzureChatOpenAIConfig,
     AzureDocumentIntelligenceConfig,
     CeleryConfig,
     ChunkConfig,
     ConversationChatConfig,
+    DedupConfig,
     EmbeddingModelConfig,
+    ExtractionConfig,
     JWTConfig,
     LoggingConfig,
+    PermissionConfig,
     PostgresConfig,
     ProcessFileConfig,
     QdrantConfig,
+    RateLimitConfig,
     RedisConfig,
+    RetrievalConfig,
     S3Config,
     TavilySearchConfig,
+    UserCacheConfig,
     WebConfig,
 )
 
@@ -29,6 +36,10 @@ class Settings(BaseSettings):
         AzureDocumentIntelligenceConfig()
     )
     redis: RedisConfig = RedisConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    user_cache: UserCacheConfig = UserCacheConfig()
+    permission: PermissionConfig = PermissionConfig()
+    activity: ActivityConfig = ActivityConfig()
     celery: CeleryConfig = CeleryConfig()
     azure_chat_openai: AzureChatOpenAIConfig = AzureChatOpenAIConfig()
     tavily_search: TavilySearchConfig = TavilySearchConfig()
@@ -36,7 +47,10 @@ class Settings(BaseSettings):
     api: APIConfig = APIConfig()
     web: WebConfig = WebConfig()
     chunk: ChunkConfig = ChunkConfig()
+    dedup: DedupConfig = DedupConfig()
+    retrieval: RetrievalConfig = RetrievalConfig()
     process_file: ProcessFileConfig = ProcessFileConfig()
+    extraction: ExtractionConfig = ExtractionConfig()
     conversation_chat: ConversationChatConfig = ConversationChatConfig()
     jwt: JWTConfig = JWTConfig()
 
@@ -0,0 +1,27 @@
+from functools import lru_cache
+
+from qdrant_client import QdrantClient
+
+from backend.config.settings import _settings
+
+
+@lru_cache(maxsize=None)
+def get_qdrant_client() -> QdrantClient:
+    """Get the Qdrant client shared by the process.
+
+    Over gRPC when ``qdrant_prefer_grpc`` is set, so vectors travel as packed
+    floats instead of JSON. With ``qdrant_location``, ":memory:" or a folder,
+    the local mode of qdrant-client is used instead of a server.
+    """
+    config = _settings.qdrant
+    if config.qdrant_location == ":memory:":
+        return QdrantClient(location=":memory:")
+    if config.qdrant_location:
+        return QdrantClient(path=config.qdrant_location)
+    return QdrantClient(
+        host=config.qdrant_host,
+        port=int(config.qdrant_port or 6333),
+        grpc_port=config.qdrant_grpc_port,
+        prefer_grpc=config.qdrant_prefer_grpc,
+        timeout=config.qdrant_timeout,
+    )
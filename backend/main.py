@@ -1,25 +1,58 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from loguru import logger
 
+from backend.api.data_ingestion.view import router as data_ingestion_router
 from backend.api.meta.view import router as meta_router
+from backend.api.retrieval.view import router as retrieval_router
 from backend.api.revision.view import database_router
 from backend.api.token.view import router as token_router
+from backend.api.user.activity import activity_recorder
+from backend.api.user.permissions import role_catalog
 from backend.api.user.view import router as user_router
+from backend.config.settings import _settings
 from backend.exceptions.handler import exception_handler, global_exception_handler
 from backend.exceptions.model import BusinessBaseException
+from backend.utils.rate_limit import RateLimitMiddleware
 
 main_router = APIRouter(prefix="/api")
 main_router.include_router(token_router)
 main_router.include_router(database_router)
 main_router.include_router(user_router)
 main_router.include_router(meta_router)
+main_router.include_router(data_ingestion_router)
+main_router.include_router(retrieval_router)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        role_catalog.load()
+    except Exception as e:
+        # The catalog loads lazily on first use if the database is not ready yet
+        logger.error(f"Failed to load role catalog at startup: {e}")
+    if _settings.extraction.prewarm:
+        from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+        DoclingExtractionService().warm_up()
+    yield
+    activity_recorder.stop()
+
+
 app = FastAPI(
     title="MultiAgentX API",
     description="API for the MultiAgentX application",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# The last middleware added is the outermost: CORS wraps the rate limiter so
+# that 429 responses carry CORS headers too
+if _settings.rate_limit.enabled:
+    app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
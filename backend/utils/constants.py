@@ -30,6 +30,7 @@ class Message:
     )
     MESSAGE_INVALID_PHONE_NUMBER = "Oops! Invalid phone number"
     MESSAGE_VALUE_ERROR = "Oops! Value error"
+    MESSAGE_TOO_MANY_REQUESTS = "Oops! Too many requests, please try again later"
 
     MESSAGE_OBJECT_NOT_FOUND = "Oops! Object Not Found"
 
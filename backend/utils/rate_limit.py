@@ -0,0 +1,300 @@
+"""Token-bucket rate limiting for the authentication endpoints.
+
+The limiter runs in-process by default. When ``RedisConfig.url`` is set the
+buckets live in Redis so every worker shares the same budget.
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from loguru import logger
+
+from backend.config.settings import _settings
+from backend.utils.constants import Message
+
+# (key, capacity, refill tokens per second)
+Bucket = Tuple[str, int, float]
+
+# Maximum request body we are willing to buffer to read the identity field
+MAX_BODY_SIZE = 64 * 1024
+
+
+class InMemoryRateLimiter:
+    """Process-local token buckets with LRU eviction of idle keys."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: List[Bucket], now: Optional[float] = None) -> float:
+        """Take one token from every bucket, or none if any bucket is empty.
+
+        Args:
+            buckets: Buckets to charge as (key, capacity, refill_rate).
+            now: Current monotonic time, mainly for tests and benchmarks.
+
+        Returns:
+            float: 0 if the request is admitted, otherwise seconds to wait.
+        """
+        now = time.monotonic() if now is None else now
+        retry_after = 0.0
+        refilled = []
+        with self._lock:
+            for key, capacity, rate in buckets:
+                tokens, updated_at = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated_at) * rate)
+                if tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / rate)
+                refilled.append((key, tokens))
+
+            for key, tokens in refilled:
+                if not retry_after:
+                    tokens -= 1
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    async def acquire(self, buckets: List[Bucket]) -> float:
+        return self.consume(buckets)
+
+
+# All-or-nothing token bucket over KEYS, using the Redis clock so that workers
+# on different hosts agree on elapsed time. Returns the wait time as a string
+# because Lua numbers are truncated to integers in replies.
+_TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local retry_after = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local current = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    current = math.min(capacity, current + math.max(0, now - updated_at) * rate)
+    if current < 1 then
+        retry_after = math.max(retry_after, (1 - current) / rate)
+    end
+    tokens[i] = current
+end
+for i, key in ipairs(KEYS) do
+    local current = tokens[i]
+    if retry_after == 0 then
+        current = current - 1
+    end
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', current, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimiter:
+    """Token buckets shared across workers through a Redis Lua script."""
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.Redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, buckets: List[Bucket]) -> float:
+        keys = [key for key, _, _ in buckets]
+        args = []
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        try:
+            return float(await self._script(keys=keys, args=args))
+        except Exception as e:
+            # Fail open: an unavailable Redis must not lock everyone out
+            logger.warning(f"Rate limiter unavailable, admitting request: {e}")
+            return 0.0
+
+
+def build_rate_limiter():
+    """Create the limiter configured for this deployment."""
+    if _settings.redis.url:
+        return RedisRateLimiter(_settings.redis.url)
+    return InMemoryRateLimiter(max_keys=_settings.rate_limit.max_keys)
+
+
+def _hash_identity(value: str) -> str:
+    return hashlib.sha1(value.strip().lower().encode()).hexdigest()
+
+
+def _get_client_ip(scope, trust_forwarded_for: bool) -> str:
+    if trust_forwarded_for:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _read_body(receive) -> Tuple[bytes, list]:
+    """Read the request body, returning it with the consumed messages."""
+    messages = []
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size <= MAX_BODY_SIZE:
+            chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks) if size <= MAX_BODY_SIZE else b""
+    return body, messages
+
+
+def _get_identity(body: bytes, field_name: str) -> Optional[str]:
+    try:
+        value = json.loads(body).get(field_name)
+    except (ValueError, AttributeError):
+        return None
+    return value if isinstance(value, str) and value else None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying per-route token buckets.
+
+    Every configured route is charged on an IP bucket and, when the request
+    body carries the configured identity field, on an identity bucket.
+    Rejected requests get a 429 with a ``Retry-After`` header.
+    """
+
+    def __init__(self, app, limiter=None, routes: Optional[Dict[str, Dict]] = None):
+        self.app = app
+        self.limiter = limiter or build_rate_limiter()
+        self.routes = routes if routes is not None else _settings.rate_limit.routes
+        self.prefix = _settings.rate_limit.key_prefix
+        self.trust_forwarded_for = _settings.rate_limit.trust_forwarded_for
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        route = self.routes.get(path)
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        client_ip = _get_client_ip(scope, self.trust_forwarded_for)
+        buckets: List[Bucket] = [(f"{self.prefix}:{path}:ip:{client_ip}", *route["ip"])]
+
+        identity_field = route.get("identity_field")
+        if identity_field and "identity" in route:
+            body, messages = await _read_body(receive)
+            identity = _get_identity(body, identity_field)
+            if identity:
+                buckets.append(
+                    (
+                        f"{self.prefix}:{path}:id:{_hash_identity(identity)}",
+                        *route["identity"],
+                    )
+                )
+            receive = _replay(messages, receive)
+
+        retry_after = await self.limiter.acquire(buckets)
+        if retry_after > 0:
+            logger.warning(f"Rate limit exceeded on {path} from {client_ip}")
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"message": Message.MESSAGE_TOO_MANY_REQUESTS},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            return await response(scope, receive, send)
+
+        return await self.app(scope, receive, send)
+
+
+def _replay(messages: list, receive):
+    """Feed buffered body messages back to the application."""
+    pending = list(messages)
+
+    async def replay_receive():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay_receive
+
+
+def benchmark_rate_limiter(iterations: int = 100_000) -> Dict[str, float]:
+    """Measure the in-process limiter overhead per request.
+
+    Runs the full middleware path (body buffering, identity hashing and bucket
+    accounting) against a no-op application.
+
+    Args:
+        iterations: Number of simulated requests.
+
+    Returns:
+        dict: Mean and p99 overhead in microseconds.
+    """
+    import asyncio
+
+    async def noop_app(scope, receive, send):
+        return None
+
+    async def noop_send(message):
+        return None
+
+    limiter = InMemoryRateLimiter()
+    routes = {
+        "/login": {
+            "ip": (10**9, 10**9),
+            "identity": (10**9, 10**9),
+            "identity_field": "username",
+        }
+    }
+    middleware = RateLimitMiddleware(noop_app, limiter=limiter, routes=routes)
+    bodies = [
+        json.dumps({"username": f"user{i % 1000}", "password": "x" * 12}).encode()
+        for i in range(1000)
+    ]
+
+    async def run() -> List[float]:
+        timings = []
+        for i in range(iterations):
+            body = bodies[i % len(bodies)]
+
+            async def receive(body=body):
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            scope = {
+                "type": "http",
+                "method": "POST",
+                "path": "/login",
+                "client": (f"10.0.{i % 250}.{i % 200}", 1234),
+                "headers": [],
+            }
+            started = time.perf_counter()
+            await middleware(scope, receive, noop_send)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    timings = sorted(asyncio.run(run()))
+    return {
+        "iterations": iterations,
+        "mean_us": sum(timings) / len(timings) * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+    }
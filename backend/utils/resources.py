@@ -0,0 +1,142 @@
+import ctypes
+import gc
+import os
+import resource
+from typing import Optional
+
+# cgroup v2 mounts a single hierarchy here, v1 one hierarchy per controller
+_CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def get_rss_bytes() -> int:
+    """Get the current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not on Linux: fall back to the peak, which is an upper bound
+        return get_peak_rss_bytes()
+
+
+def get_peak_rss_bytes() -> int:
+    """Get the peak resident set size of this process in bytes.
+
+    Since the last ``reset_peak_rss`` when the kernel supports resetting it.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak resident set size of this process to the current one.
+
+    Returns:
+        bool: False when the kernel does not support it, in which case
+            ``get_peak_rss_bytes`` keeps returning the peak of the process.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def release_memory() -> None:
+    """Collect garbage and return the freed heap memory to the system.
+
+    glibc keeps freed memory in its arenas, so without trimming them the
+    resident set size does not go down after large objects are released.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc
+        pass
+
+
+def _read_cgroup_file(*names: str) -> Optional[str]:
+    for name in names:
+        try:
+            with open(os.path.join(_CGROUP_ROOT, name)) as file:
+                return file.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def get_cpu_quota() -> Optional[float]:
+    """Get the CPU quota of this container in CPUs, None when unlimited."""
+    cpu_max = _read_cgroup_file("cpu.max")
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period or 100_000)
+
+    quota = _read_cgroup_file("cpu/cpu.cfs_quota_us", "cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_cgroup_file("cpu/cpu.cfs_period_us", "cpu,cpuacct/cpu.cfs_period_us")
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def get_memory_limit_bytes() -> Optional[int]:
+    """Get the memory limit of this container in bytes, None when unlimited."""
+    limit = _read_cgroup_file("memory.max", "memory/memory.limit_in_bytes")
+    if limit is None or limit == "max":
+        return None
+    limit = int(limit)
+    # cgroup v1 reports "unlimited" as a huge page-aligned number
+    return limit if limit < 2**60 else None
+
+
+def get_available_memory_bytes() -> int:
+    """Get the memory available to new allocations in bytes.
+
+    Inside a container with a memory limit, the memory left under the limit
+    when it is lower than what the machine has available.
+    """
+    available = None
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    if available is None:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+    limit = get_memory_limit_bytes()
+    if limit is not None:
+        usage = _read_cgroup_file("memory.current", "memory/memory.usage_in_bytes")
+        if usage is not None:
+            available = min(available, max(0, limit - int(usage)))
+    return available
+
+
+def get_cpu_count() -> int:
+    """Get the number of CPUs this process can keep busy.
+
+    The CPUs it is allowed to run on, capped by the container CPU quota.
+    """
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 1
+    quota = get_cpu_quota()
+    if quota is not None:
+        # More threads than the quota get throttled together, round down
+        cpu_count = min(cpu_count, max(1, int(quota)))
+    return cpu_count
@@ -0,0 +1,67 @@
+"""Import time and memory of a fresh API worker.
+
+Every measurement imports the application in a new interpreter, so modules
+already imported by the caller do not hide a slow import.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from typing import List
+
+# Ingestion and search dependencies an API worker must not import at startup
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "docling",
+    "docling_core",
+    "pypdfium2",
+    "qdrant_client",
+    "grpc",
+    "numpy",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+from backend.utils.resources import get_rss_bytes
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": get_rss_bytes() / 2**20,
+    "modules": sorted({{name.partition(".")[0] for name in sys.modules}}),
+}}))
+"""
+
+
+def measure_startup(module: str = "backend.main", repeat: int = 3) -> dict:
+    """Import a module in fresh interpreters and measure the imports.
+
+    Args:
+        module: The module an API worker imports at startup.
+        repeat: Interpreters started, the median import time is reported.
+
+    Returns:
+        dict: Median import seconds, resident set size in MB after the
+            import, and the heavy modules it imported.
+    """
+    runs: List[dict] = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        # The probe prints its result last, after any import-time logging
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "module": module,
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "rss_mb": statistics.median(run["rss_mb"] for run in runs),
+        "heavy_modules": [
+            name for name in HEAVY_MODULES if name in runs[-1]["modules"]
+        ],
+    }
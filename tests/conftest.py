@@ -0,0 +1,25 @@
+"""Test settings, applied before the backend reads its configuration."""
+
+import os
+import tempfile
+
+# Settings are read from the environment when backend.config is imported
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("POSTGRES_PORT", "5432")
+os.environ.setdefault("POSTGRES_USER", "test")
+os.environ.setdefault("POSTGRES_PASSWORD", "test")
+os.environ.setdefault("POSTGRES_DB", "test")
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+os.environ.setdefault("EMBEDDING_DENSE_ENCODER", "hashing")
+os.environ.setdefault("QDRANT_LOCATION", ":memory:")
+os.environ.setdefault(
+    "BM25_STATISTICS_PATH",
+    os.path.join(tempfile.mkdtemp(prefix="bm25-"), "bm25_statistics.npz"),
+)
+os.environ.pop("REDIS_URL", None)
+
+from backend.celery_app import celery_app  # noqa: E402
+
+# Eager job states are kept in memory, the status API reads them back
+celery_app.conf.update(task_always_eager=True, result_backend="cache+memory://")
@@ -0,0 +1,202 @@
+from typing import List
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient, models
+
+from backend.api.data_ingestion import dedup
+from backend.api.data_ingestion.dedup import (
+    Deduplicator,
+    MinHasher,
+    lsh_parameters,
+    similarity,
+)
+from backend.api.data_ingestion.indexing import chunk_hash, point_id
+from backend.api.data_ingestion.model import DocumentChunk
+from backend.config.config import DedupConfig
+
+COLLECTION = "chunks"
+
+
+def words(prefix: str, count: int, start: int = 0) -> List[str]:
+    return [f"{prefix}{i}" for i in range(start, start + count)]
+
+
+def make_chunk(index: int, text: str) -> DocumentChunk:
+    return DocumentChunk(index=index, text=text, num_tokens=len(text.split()))
+
+
+@pytest.fixture
+def hasher() -> MinHasher:
+    return MinHasher(DedupConfig())
+
+
+@pytest.mark.parametrize(
+    "threshold, num_perm", [(0.85, 128), (0.5, 128), (0.9, 64), (0.85, 16)]
+)
+def test_lsh_parameters_separate_pairs_around_the_threshold(threshold, num_perm):
+    bands, rows = lsh_parameters(threshold, num_perm)
+
+    assert bands * rows <= num_perm
+
+    def candidate(s: float) -> float:
+        return 1 - (1 - s**rows) ** bands
+
+    assert candidate(threshold - 0.2) < 0.2
+    assert candidate(min(1.0, threshold + 0.1)) > 0.85
+
+
+def test_higher_threshold_takes_longer_bands():
+    assert lsh_parameters(0.9, 128)[1] > lsh_parameters(0.5, 128)[1]
+
+
+@pytest.mark.parametrize("shared", [0, 40, 70, 90, 100])
+def test_estimated_similarity_is_close_to_the_exact_one(hasher, shared):
+    first = " ".join(words("w", 100))
+    second = " ".join(words("w", shared) + words("x", 100 - shared))
+
+    signatures, has_words = hasher.signatures([first, second])
+
+    a, b = set(hasher.shingles(first)), set(hasher.shingles(second))
+    exact = len(a & b) / len(a | b)
+    assert has_words.all()
+    assert similarity(signatures[0], signatures[1:])[0] == pytest.approx(
+        exact, abs=0.15
+    )
+
+
+def test_shingles_of_short_and_empty_texts(hasher):
+    assert len(hasher.shingles("one two three four five six")) == 2
+    assert len(hasher.shingles("One two")) == 1
+    assert len(hasher.shingles("... !!!")) == 0
+    # Case and punctuation are ignored
+    assert (hasher.shingles("One, two.") == hasher.shingles("one two")).all()
+
+
+def test_signatures_split_in_groups_match_a_single_pass(hasher, monkeypatch):
+    texts = [
+        " ".join(words("a", 50)),
+        "",
+        " ".join(words("b", 3)),
+        " ".join(words("c", 20)),
+        "?!",
+        " ".join(words("a", 40, start=10)),
+    ]
+    expected, expected_has_words = hasher.signatures(texts)
+
+    # Room for 8 shingles per group, the first text alone is over that
+    monkeypatch.setattr(dedup, "_MAX_HASHES", 8 * hasher.num_perm)
+    signatures, has_words = hasher.signatures(texts)
+
+    assert (signatures == expected).all()
+    assert (has_words == expected_has_words).all()
+    assert has_words.tolist() == [True, False, True, True, False, True]
+    assert (signatures[~has_words] == dedup._NO_WORDS).all()
+
+
+def test_band_keys_change_with_their_band_only(hasher):
+    signatures, _ = hasher.signatures([" ".join(words("w", 30))])
+    changed = np.repeat(signatures, 3, axis=0)
+    # In the second band, and past the last band
+    changed[1, hasher.rows] += 1
+    changed[2, hasher.bands * hasher.rows :] += 1
+
+    keys = hasher.band_keys(np.concatenate([signatures, changed]))
+
+    assert keys.shape == (4, hasher.bands)
+    assert (keys[1] == keys[0]).all()
+    assert (keys[2] != keys[0]).tolist() == [b == 1 for b in range(hasher.bands)]
+    assert (keys[3] == keys[0]).all()
+
+
+def test_band_keys_depend_on_the_band_position(hasher):
+    signature = np.zeros((1, hasher.num_perm), dtype=np.uint32)
+
+    keys = hasher.band_keys(signature)[0]
+
+    assert len(set(keys.tolist())) == hasher.bands
+
+
+@pytest.fixture
+def client() -> QdrantClient:
+    return QdrantClient(":memory:")
+
+
+def index_chunks(client: QdrantClient, document_id: str, chunks: List[DocumentChunk]):
+    """Index chunks with the payload fields the deduplicator looks up."""
+    hasher = MinHasher(DedupConfig())
+    signatures, _ = hasher.signatures([chunk.text for chunk in chunks])
+    if not client.collection_exists(COLLECTION):
+        client.create_collection(
+            COLLECTION,
+            vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+        )
+    client.upsert(
+        COLLECTION,
+        points=[
+            models.PointStruct(
+                id=point_id(document_id, chunk_hash(chunk)),
+                vector=[1.0],
+                payload={"document_id": document_id, **payload},
+            )
+            for chunk, payload in zip(chunks, hasher.payloads(signatures))
+        ],
+        wait=True,
+    )
+
+
+def test_repeated_chunks_of_the_document_are_duplicates(client):
+    first = " ".join(words("a", 100))
+    near = " ".join(words("a", 99) + ["changed"])
+    other = " ".join(words("b", 100))
+    deduplicator = Deduplicator(COLLECTION, "document", client=client)
+
+    _, duplicates = deduplicator.check(
+        [make_chunk(0, first), make_chunk(1, other), make_chunk(2, near)]
+    )
+    _, later = deduplicator.check([make_chunk(3, other)])
+
+    assert duplicates[:2] == [None, None]
+    assert duplicates[2].chunk_index == 0
+    assert duplicates[2].point_id is None
+    assert duplicates[2].similarity >= 0.85
+    assert later[0].chunk_index == 1
+
+
+def test_remembered_chunks_are_repeated(client):
+    text = " ".join(words("a", 100))
+    deduplicator = Deduplicator(COLLECTION, "document", client=client)
+    deduplicator.remember([make_chunk(5, text)])
+
+    _, duplicates = deduplicator.check([make_chunk(0, text)])
+
+    assert duplicates[0].chunk_index == 5
+
+
+def test_chunks_of_other_documents_are_duplicates(client):
+    shared = make_chunk(0, " ".join(words("s", 100)))
+    own = make_chunk(1, " ".join(words("o", 100)))
+    index_chunks(client, "first", [shared])
+    index_chunks(client, "second", [own])
+    deduplicator = Deduplicator(COLLECTION, "second", client=client)
+
+    _, duplicates = deduplicator.check(
+        [make_chunk(0, shared.text), make_chunk(1, own.text)]
+    )
+
+    assert duplicates[0].point_id == point_id("first", chunk_hash(shared))
+    assert duplicates[0].chunk_index is None
+    # Its own points are replaced by the new version, not repeated
+    assert duplicates[1] is None
+
+
+def test_texts_without_words_are_never_duplicates(client, hasher):
+    index_chunks(client, "first", [make_chunk(0, "---")])
+    deduplicator = Deduplicator(COLLECTION, "second", client=client)
+
+    signatures, duplicates = deduplicator.check(
+        [make_chunk(0, "---"), make_chunk(1, "..."), make_chunk(2, "")]
+    )
+
+    assert duplicates == [None, None, None]
+    assert hasher.payloads(signatures) == [{}, {}, {}]
@@ -0,0 +1,139 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from backend.api.data_ingestion.tasks import (
+    DownloadRejectedError,
+    _check_download_url,
+    _download,
+)
+from backend.config.settings import _settings
+
+CONTENT = b"%PDF-1.4 " + b"x" * 4000
+
+
+class FakeDocumentServer:
+    """Serves a document, redirects to it, and streams an oversized one."""
+
+    def __init__(self):
+        self.app = FastAPI()
+        self.app.get("/document.pdf")(
+            lambda: Response(CONTENT, media_type="application/pdf")
+        )
+        self.app.get("/stream.pdf")(self._stream)
+        self.app.get("/redirect")(lambda to: RedirectResponse(to))
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                self.app, host="127.0.0.1", port=self.port, log_level="warning"
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @staticmethod
+    def _stream():
+        # Chunked, without a Content-Length to check up front
+        return StreamingResponse(
+            (CONTENT for _ in range(10)), media_type="application/pdf"
+        )
+
+    def url(self, path: str, host: str = "127.0.0.1") -> str:
+        return f"http://{host}:{self.port}{path}"
+
+    def start(self) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Fake document server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture(scope="module")
+def server() -> Iterator[FakeDocumentServer]:
+    server = FakeDocumentServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def download(tmp_path, monkeypatch):
+    """Download a URL with the fake server host allowed."""
+    monkeypatch.setattr(_settings.process_file, "allowed_download_hosts", ["127.0.0.1"])
+    monkeypatch.setattr(_settings.process_file, "max_download_bytes", 10_000)
+
+    def run(url: str):
+        context = SimpleNamespace(
+            source=url,
+            document_path=tmp_path / "document.pdf",
+            report=lambda *args, **kwargs: None,
+        )
+        _download(context)
+        return context.document_path
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1/document.pdf",
+        "http://localhost/document.pdf",
+        "http://10.1.2.3/document.pdf",
+        "http://192.168.0.1/document.pdf",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/document.pdf",
+        "http://[::ffff:127.0.0.1]/document.pdf",
+        "http://[fe80::1]/document.pdf",
+        "http://224.0.0.1/document.pdf",
+        "file:///etc/passwd",
+    ],
+)
+def test_internal_urls_are_rejected(url):
+    with pytest.raises(DownloadRejectedError):
+        _check_download_url(httpx.URL(url))
+
+
+def test_public_address_is_accepted():
+    _check_download_url(httpx.URL("https://93.184.215.14/document.pdf"))
+
+
+def test_allowed_host_is_downloaded(server, download):
+    path = download(server.url("/redirect?to=/document.pdf"))
+
+    assert path.read_bytes() == CONTENT
+
+
+def test_redirect_to_an_internal_host_is_rejected(server, download, tmp_path):
+    # Same server, under a host name missing from the allow-list
+    target = server.url("/document.pdf", host="localhost")
+
+    with pytest.raises(DownloadRejectedError, match="non-public"):
+        download(server.url(f"/redirect?to={target}"))
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("path", ["/document.pdf", "/stream.pdf"])
+def test_download_larger_than_the_limit_is_rejected(
+    server, download, tmp_path, monkeypatch, path
+):
+    monkeypatch.setattr(_settings.process_file, "max_download_bytes", 1000)
+
+    with pytest.raises(DownloadRejectedError, match="larger than"):
+        download(server.url(path))
+    assert not list(tmp_path.iterdir())
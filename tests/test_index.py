@@ -0,0 +1,204 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.api.data_ingestion import tasks
+from backend.api.data_ingestion.embedding import get_embedder
+from backend.api.data_ingestion.indexing import chunk_hash, point_id
+from backend.api.data_ingestion.jobs import get_job_status, submit_job
+from backend.api.data_ingestion.model import DocumentChunk
+from backend.api.data_ingestion.versions import (
+    DocumentVersion,
+    document_version_service,
+)
+from backend.config.settings import _settings
+from backend.databases.db import SessionLocal
+from backend.databases.qdrant import get_qdrant_client
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet".split()
+
+
+def make_chunks(names: List[str]) -> List[DocumentChunk]:
+    """Chunks different enough not to be near-duplicates of each other.
+
+    The chunk of a name ending with "~" repeats the chunk of the name, but for
+    its last word.
+    """
+    chunks = []
+    for index, name in enumerate(names):
+        words = [f"{name.rstrip('~')}{WORDS[i % len(WORDS)]}{i}" for i in range(100)]
+        if name.endswith("~"):
+            words[-1] = "changed"
+        chunks.append(
+            DocumentChunk(index=index, text=" ".join(words), num_tokens=len(words))
+        )
+    return chunks
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    DocumentVersion.__table__.create(engine)
+    SessionLocal.configure(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """Jobs running the real stages from diff on, on the chunks given."""
+    monkeypatch.setattr(
+        _settings.process_file, "root_download_folder", str(tmp_path / "work")
+    )
+    chunks: List[DocumentChunk] = []
+
+    def extract(context: tasks.JobContext) -> None:
+        context.pages_path.touch()
+
+    def chunk(context: tasks.JobContext) -> None:
+        context.chunks_path.write_text(
+            "".join(chunk.model_dump_json() + "\n" for chunk in chunks)
+        )
+
+    monkeypatch.setitem(tasks.STAGE_HANDLERS, "extract", extract)
+    monkeypatch.setitem(tasks.STAGE_HANDLERS, "chunk", chunk)
+
+    def ingest(version: int, names: List[str], document: str = "document") -> str:
+        chunks[:] = make_chunks(names)
+        source = tmp_path / f"{document}-v{version}.pdf"
+        source.write_bytes(b"%PDF-1.4")
+        return submit_job(str(source), tmp_path.name, options={"document_id": document})
+
+    return ingest
+
+
+def fail_once(monkeypatch, obj, name: str) -> None:
+    original = getattr(obj, name)
+    calls = []
+
+    def run(*args, **kwargs):
+        calls.append(name)
+        if len(calls) == 1:
+            raise RuntimeError(f"{name} failed")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, run)
+
+
+def num_docs() -> int:
+    return get_embedder().sparse_encoder.model.statistics.num_docs
+
+
+def test_rerun_index_stage_counts_statistics_once(pipeline, monkeypatch):
+    before = num_docs()
+    fail_once(monkeypatch, document_version_service, "add_version")
+
+    job_id = pipeline(1, ["a", "b", "c"])
+    assert get_job_status(job_id).state == "FAILURE"
+    assert num_docs() == before + 3
+
+    assert pipeline(1, ["a", "b", "c"]) == job_id
+    status = get_job_status(job_id)
+    assert status.state == "SUCCESS"
+    assert status.result["resumed_after"][-1] == "embed"
+    assert num_docs() == before + 3
+
+
+def test_rerun_index_stage_counts_removed_chunks_out_once(pipeline, monkeypatch):
+    before = num_docs()
+    pipeline(1, ["a", "b", "c"])
+
+    fail_once(monkeypatch, document_version_service, "add_version")
+    job_id = pipeline(2, ["a", "c", "d"])
+    assert get_job_status(job_id).state == "FAILURE"
+    assert pipeline(2, ["a", "c", "d"]) == job_id
+
+    assert get_job_status(job_id).state == "SUCCESS"
+    assert num_docs() == before + 3
+    assert not Path(tasks.get_job_folder(job_id)).exists()
+
+
+def get_point(collection: str, document: str, name: str):
+    chunk = make_chunks([name])[0]
+    points = get_qdrant_client().retrieve(
+        collection, [point_id(document, chunk_hash(chunk))]
+    )
+    return points[0] if points else None
+
+
+def test_removed_point_is_handed_over_to_a_document_repeating_it(pipeline, tmp_path):
+    collection = tmp_path.name
+    before = num_docs()
+    pipeline(1, ["a", "b", "c"], document="first")
+    pipeline(1, ["x", "b"], document="second")
+    assert get_point(collection, "second", "b") is None
+    repeated = get_point(collection, "first", "b")
+    assert repeated.payload["duplicate_documents"] == ["second"]
+
+    pipeline(2, ["a", "c"], document="first")
+
+    assert get_point(collection, "first", "b") is None
+    heir = get_point(collection, "second", "b")
+    assert heir.payload["document_id"] == "second"
+    assert heir.payload["index"] == 1
+    assert heir.payload["duplicate_documents"] == []
+    # The text of the point handed over is still counted
+    assert num_docs() == before + 4
+
+
+def test_removed_duplicate_is_forgotten(pipeline, tmp_path):
+    collection = tmp_path.name
+    pipeline(1, ["a", "b"], document="first")
+    pipeline(1, ["x", "b"], document="second")
+
+    pipeline(2, ["x"], document="second")
+
+    repeated = get_point(collection, "first", "b")
+    assert repeated.payload["duplicate_documents"] == []
+    assert repeated.payload["duplicate_chunks"] == []
+
+
+def test_unchanged_duplicate_is_checked_again(pipeline, tmp_path):
+    collection = tmp_path.name
+    pipeline(1, ["a", "b"], document="first")
+    pipeline(1, ["x", "b"], document="second")
+    # Deleted without being handed over
+    get_qdrant_client().delete(
+        collection, [str(get_point(collection, "first", "b").id)], wait=True
+    )
+
+    job_id = pipeline(2, ["x", "b", "y"], document="second")
+
+    assert get_job_status(job_id).result["diff"]["rechecked"] == 1
+    assert get_point(collection, "second", "b") is not None
+
+
+def test_added_chunk_repeating_an_unchanged_one_is_left_out(pipeline, tmp_path):
+    collection = tmp_path.name
+    pipeline(1, ["a", "b"])
+
+    job_id = pipeline(2, ["a", "b", "a~"])
+
+    assert get_job_status(job_id).result["dedup"]["duplicates"] == 1
+    assert get_point(collection, "document", "a~") is None
+
+
+def test_dedup_report_counts_the_skipped_tokens(pipeline):
+    pipeline(1, ["a", "b"], document="first")
+
+    job_id = pipeline(1, ["x", "y", "x~", "b", "z"], document="second")
+
+    report = get_job_status(job_id).result["dedup"]
+    assert report == {
+        "chunks": 5,
+        "duplicates": 2,
+        "cross_document": 1,
+        "skipped_tokens": 200,
+        "total_tokens": 500,
+        "skipped_ratio": 0.4,
+    }
@@ -0,0 +1,126 @@
+from typing import Iterator, List
+
+import httpx
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+from backend.api.data_ingestion.embedding import EmbeddedBatch
+from backend.api.data_ingestion.indexing import QdrantIndexWriter
+from backend.api.data_ingestion.model import DocumentChunk
+
+COLLECTION = "chunks"
+DIMENSION = 4
+
+
+def make_batch(start: int, count: int) -> EmbeddedBatch:
+    chunks = [
+        DocumentChunk(index=index, text=f"chunk {index}", num_tokens=2)
+        for index in range(start, start + count)
+    ]
+    dense = np.random.default_rng(start).random((count, DIMENSION), dtype=np.float32)
+    return EmbeddedBatch(chunks=chunks, dense=dense)
+
+
+def unexpected_response(status_code: int) -> UnexpectedResponse:
+    return UnexpectedResponse(status_code, "error", b"", httpx.Headers())
+
+
+class FailingUpserts:
+    """Wraps ``client.upsert``, failing its first calls.
+
+    A failure either replaces the request, or follows it, like a timeout
+    after the server stored the points.
+    """
+
+    def __init__(self, client: QdrantClient, errors: List[Exception], after=False):
+        self.upsert = client.upsert
+        self.errors = list(errors)
+        self.after = after
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if not self.errors:
+            return self.upsert(*args, **kwargs)
+        if self.after:
+            self.upsert(*args, **kwargs)
+        raise self.errors.pop(0)
+
+
+@pytest.fixture
+def client() -> QdrantClient:
+    return QdrantClient(":memory:")
+
+
+@pytest.fixture
+def writer(client) -> Iterator[QdrantIndexWriter]:
+    writer = QdrantIndexWriter(
+        COLLECTION,
+        "document",
+        client=client,
+        batch_size=4,
+        max_retries=3,
+        retry_delay=0.001,
+    )
+    writer.ensure_collection(DIMENSION, sparse=False)
+    yield writer
+    writer.close()
+
+
+def num_points(client: QdrantClient) -> int:
+    return client.count(COLLECTION, exact=True).count
+
+
+@pytest.mark.parametrize(
+    "errors, after",
+    [
+        ([ConnectionError(), TimeoutError(), unexpected_response(503)], False),
+        ([TimeoutError()], True),
+    ],
+)
+def test_transient_failures_are_retried(client, writer, monkeypatch, errors, after):
+    upsert = FailingUpserts(client, errors, after=after)
+    monkeypatch.setattr(client, "upsert", upsert)
+
+    writer.add(make_batch(0, 6))
+    assert writer.flush() == 6
+
+    # One request per batch, and one per failure
+    assert upsert.calls == 2 + len(errors)
+    assert num_points(client) == 6
+
+
+def test_retries_are_bounded(client, writer, monkeypatch):
+    upsert = FailingUpserts(client, [ConnectionError()] * 4)
+    monkeypatch.setattr(client, "upsert", upsert)
+
+    writer.add(make_batch(0, 2))
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    assert upsert.calls == 4
+
+
+@pytest.mark.parametrize("error", [ValueError("bad point"), unexpected_response(400)])
+def test_other_failures_surface_at_the_next_flush(client, writer, monkeypatch, error):
+    upsert = FailingUpserts(client, [error])
+    monkeypatch.setattr(client, "upsert", upsert)
+
+    # A full batch is sent without waiting for it
+    writer.add(make_batch(0, 4))
+    with pytest.raises(type(error)):
+        writer.flush()
+    assert upsert.calls == 1
+    assert num_points(client) == 0
+
+
+def test_other_failures_surface_at_the_next_add(client, writer, monkeypatch):
+    upsert = FailingUpserts(client, [ValueError("bad point")])
+    monkeypatch.setattr(client, "upsert", upsert)
+
+    writer.add(make_batch(0, 4))
+    # Waits for the failed request before sending the next batch
+    with pytest.raises(ValueError, match="bad point"):
+        writer.add(make_batch(4, 4))
+    assert upsert.calls == 1
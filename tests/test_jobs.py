@@ -0,0 +1,140 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from backend.api.data_ingestion import jobs, tasks
+from backend.api.data_ingestion.jobs import get_job_id, get_job_status, submit_job
+from backend.api.data_ingestion.model import DedupReport, DocumentChunk
+from backend.api.data_ingestion.versions import ChunkDiff
+from backend.celery_app import celery_app
+from backend.config.settings import _settings
+
+
+class FakeStages:
+    """Stage handlers writing the outputs the job summary reads."""
+
+    def __init__(self):
+        self.calls: List[str] = []
+        self.fail_once = set()
+
+    def handler(self, stage: str):
+        def run(context: tasks.JobContext) -> None:
+            self.calls.append(stage)
+            if stage in self.fail_once:
+                self.fail_once.discard(stage)
+                raise RuntimeError(f"{stage} failed")
+            if stage == "chunk":
+                chunk = DocumentChunk(index=0, text="text", num_tokens=1)
+                context.chunks_path.write_text(chunk.model_dump_json() + "\n")
+            elif stage == "diff":
+                context.diff_path.mkdir()
+                (context.diff_path / "diff.json").write_text(
+                    ChunkDiff(added=[0]).model_dump_json()
+                )
+            elif stage == "dedup":
+                context.dedup_path.mkdir()
+                (context.dedup_path / "report.json").write_text(
+                    DedupReport(chunks=1, total_tokens=1).model_dump_json()
+                )
+
+        return run
+
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch) -> FakeStages:
+    monkeypatch.setattr(
+        _settings.process_file, "root_download_folder", str(tmp_path / "work")
+    )
+    fake = FakeStages()
+    for stage in tasks.STAGES:
+        monkeypatch.setitem(tasks.STAGE_HANDLERS, stage, fake.handler(stage))
+    return fake
+
+
+@pytest.fixture
+def source(tmp_path) -> str:
+    path = tmp_path / f"{tmp_path.name}.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    return str(path)
+
+
+def test_submit_job_runs_once(stages, source):
+    job_id = submit_job(source, "documents")
+
+    assert submit_job(source, "documents") == job_id
+    assert stages.calls == list(tasks.STAGES)
+    status = get_job_status(job_id)
+    assert status.state == "SUCCESS"
+    assert status.progress == 1.0
+    assert status.result["num_chunks"] == 1
+    assert status.result["diff"]["added"] == 1
+    assert status.result["resumed_after"] == []
+    # The stage outputs are only kept to resume failed jobs
+    assert not tasks.get_job_folder(job_id).exists()
+    assert Path(source).exists()
+
+
+def test_options_change_the_job_id(stages, source):
+    assert submit_job(source, "documents") != submit_job(
+        source, "documents", options={"do_ocr": False}
+    )
+
+
+def test_failed_job_resumes_after_last_completed_stage(stages, source):
+    stages.fail_once.add("embed")
+    job_id = submit_job(source, "documents")
+    status = get_job_status(job_id)
+    assert status.state == "FAILURE"
+    assert "embed failed" in status.error
+
+    stages.calls.clear()
+    assert submit_job(source, "documents") == job_id
+    assert stages.calls == ["embed", "index"]
+    status = get_job_status(job_id)
+    assert status.state == "SUCCESS"
+    assert status.result["resumed_after"] == [
+        "download",
+        "extract",
+        "chunk",
+        "diff",
+        "dedup",
+    ]
+
+
+def test_get_job_status_reports_progress():
+    job_id = "progress-job"
+    celery_app.backend.store_result(
+        job_id,
+        {"stage": "extract", "progress": 0.25, "page_no": 3, "num_pages": 12},
+        "PROGRESS",
+    )
+
+    status = get_job_status(job_id)
+    assert status.state == "PROGRESS"
+    assert status.stage == "extract"
+    assert status.progress == 0.25
+    assert (status.page_no, status.num_pages) == (3, 12)
+
+
+def test_unknown_job_is_pending():
+    assert get_job_status("unknown-job").state == "PENDING"
+
+
+def test_concurrent_submission_is_not_queued_twice(stages, source, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(jobs, "_get_redis", lambda: client)
+    job_id = get_job_id(source, "documents", {})
+    config = _settings.process_file
+
+    # Another request is queueing the same job
+    lock = client.lock(f"{config.submit_lock_prefix}:{job_id}", timeout=30)
+    assert lock.acquire(blocking=False)
+    assert submit_job(source, "documents") == job_id
+    assert stages.calls == []
+
+    lock.release()
+    assert submit_job(source, "documents") == job_id
+    assert stages.calls == list(tasks.STAGES)
+    assert not client.keys(f"{config.submit_lock_prefix}:*")
@@ -0,0 +1,275 @@
+import asyncio
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator, Optional, Tuple
+
+import pypdfium2 as pdfium
+import pytest
+import uvicorn
+from docling_core.types.doc import (
+    BoundingBox,
+    DoclingDocument,
+    ImageRef,
+    ProvenanceItem,
+    Size,
+)
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageDraw
+
+from backend.api.data_ingestion.picture_description import PictureDescriber, VlmEndpoint
+
+# Requests for this model are rejected by the fake server
+BROKEN_MODEL = "broken"
+
+
+class FakeVlmServer:
+    """OpenAI-compatible chat completions server counting requests per model."""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self._chat)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                self.app, host="127.0.0.1", port=self.port, log_level="warning"
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    async def _chat(self, request: Request):
+        body = await request.json()
+        model = body["model"]
+        self.calls[model] += 1
+        if model == BROKEN_MODEL:
+            return JSONResponse({"error": "bad request"}, status_code=400)
+        # Slow enough for concurrent requests to overlap
+        await asyncio.sleep(0.05)
+        content = f" picture {self.calls[model]} by {model} "
+        return {"choices": [{"message": {"content": content}}]}
+
+    def endpoint(self, model: str = "vlm") -> VlmEndpoint:
+        return VlmEndpoint(
+            url=f"http://127.0.0.1:{self.port}/v1/chat/completions",
+            model=model,
+            prompt="Describe the picture.",
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Fake VLM server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture(scope="module")
+def vlm_server() -> Iterator[FakeVlmServer]:
+    server = FakeVlmServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def describer() -> Iterator[PictureDescriber]:
+    describer = PictureDescriber(
+        concurrency=4,
+        timeout_seconds=10,
+        max_retries=0,
+        min_area=0.05,
+        max_hash_distance=8,
+        memory_entries=100,
+    )
+    yield describer
+    describer.close()
+
+
+def _image(color, size: Tuple[int, int] = (200, 100), text: str = "") -> Image.Image:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((10, 10, size[0] // 2, size[1] - 10), fill=color)
+    draw.text((5, 5), text, fill="black")
+    return image
+
+
+def _add_picture(
+    doc: DoclingDocument, page_no: int, image: Image.Image, side: float = 50
+) -> None:
+    doc.add_picture(
+        image=ImageRef.from_pil(image, dpi=72),
+        prov=ProvenanceItem(
+            page_no=page_no,
+            bbox=BoundingBox(l=0, t=side, r=side, b=0),
+            charspan=(0, 0),
+        ),
+    )
+
+
+def make_document(
+    num_pages: int, page_range: Optional[Tuple[int, int]] = None
+) -> DoclingDocument:
+    """Pages with a logo repeated at two scales and a picture of their own."""
+    first, last = page_range or (1, num_pages)
+    doc = DoclingDocument(name="document")
+    for page_no in range(first, last + 1):
+        doc.add_page(page_no=page_no, size=Size(width=100, height=100))
+        logo = _image("red")
+        if page_no % 2:
+            logo = logo.resize((400, 200))
+        _add_picture(doc, page_no, logo)
+        _add_picture(doc, page_no, _image((page_no * 20) % 255, text=str(page_no)))
+    return doc
+
+
+def test_describes_each_distinct_picture_once(vlm_server, describer):
+    doc = make_document(10)
+    # Too small to be worth a description
+    _add_picture(doc, 1, _image("blue"), side=1)
+
+    stats = describer.describe(doc, vlm_server.endpoint("distinct"))
+
+    assert stats.pictures == 20
+    # The logo once, and the picture of every page
+    assert stats.described == 11
+    assert stats.duplicates == 9
+    assert stats.failed == 0
+    assert vlm_server.calls["distinct"] == 11
+    logos = {doc.pictures[index].meta.description.text for index in range(0, 20, 2)}
+    assert len(logos) == 1
+    assert all(picture.meta.description for picture in doc.pictures[:20])
+    assert doc.pictures[20].meta is None
+
+
+def test_descriptions_are_reused_across_describers(vlm_server, tmp_path):
+    endpoint = vlm_server.endpoint("persisted")
+    first, second = (
+        PictureDescriber(
+            concurrency=4,
+            timeout_seconds=10,
+            max_retries=0,
+            min_area=0.05,
+            max_hash_distance=8,
+            memory_entries=100,
+        )
+        for _ in range(2)
+    )
+    try:
+        first.describe(make_document(4), endpoint, tmp_path)
+        stats = second.describe(make_document(4), endpoint, tmp_path)
+    finally:
+        first.close()
+        second.close()
+
+    assert stats.cached == 5
+    assert stats.described == 0
+    assert vlm_server.calls["persisted"] == 5
+
+
+def test_concurrent_documents_share_requests(vlm_server, describer):
+    endpoint = vlm_server.endpoint("shared")
+    with ThreadPoolExecutor(4) as executor:
+        docs = [make_document(3) for _ in range(4)]
+        list(executor.map(lambda doc: describer.describe(doc, endpoint), docs))
+
+    assert vlm_server.calls["shared"] == 4
+    descriptions = {
+        tuple(picture.meta.description.text for picture in doc.pictures) for doc in docs
+    }
+    assert len(descriptions) == 1
+
+
+def test_failed_pictures_are_counted(vlm_server, describer):
+    doc = make_document(2)
+
+    stats = describer.describe(doc, vlm_server.endpoint(BROKEN_MODEL))
+
+    assert stats.failed == 4
+    assert stats.described == 0
+    assert all(picture.meta is None for picture in doc.pictures)
+
+
+class FakeConverter:
+    """Returns generated documents in place of converting the file."""
+
+    def __init__(self, num_pages: int):
+        self.num_pages = num_pages
+        self.calls = 0
+
+    def convert(self, source, page_range=None):
+        self.calls += 1
+        first, last = page_range
+        document = make_document(self.num_pages, (first, min(last, self.num_pages)))
+        return SimpleNamespace(document=document)
+
+
+@pytest.fixture
+def extraction_service(vlm_server, monkeypatch):
+    from backend.api.data_ingestion.extraction import DoclingExtractionService
+
+    service = DoclingExtractionService()
+    converter = FakeConverter(num_pages=4)
+    monkeypatch.setattr(service, "get_converter", lambda options: converter)
+    monkeypatch.setattr(
+        service,
+        "_get_vllm_picture_annotation_with_vlm",
+        lambda model: vlm_server.endpoint(model),
+    )
+    return service, converter
+
+
+@pytest.fixture
+def pdf_path(tmp_path) -> Path:
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(4):
+        pdf.new_page(100, 100)
+    path = tmp_path / "document.pdf"
+    pdf.save(str(path))
+    pdf.close()
+    return path
+
+
+def _iter_pages(service, pdf_path: Path, output_folder: Path, vlm_model: str):
+    return list(
+        service.iter_pages(
+            pdf_path,
+            output_folder,
+            window_pages=2,
+            memory_budget_mb=0,
+            adaptive_ocr=False,
+            vlm_model=vlm_model,
+        )
+    )
+
+
+@pytest.mark.parametrize("model, cached", [("windows", True), (BROKEN_MODEL, False)])
+def test_windows_are_cached_only_when_every_picture_is_described(
+    extraction_service, pdf_path, tmp_path, model, cached
+):
+    service, converter = extraction_service
+
+    pages = _iter_pages(service, pdf_path, tmp_path, model)
+    assert [page.page_no for page in pages] == [1, 2, 3, 4]
+    assert converter.calls == 2
+    assert all(
+        (picture.description is not None) == cached
+        for page in pages
+        for picture in page.pictures
+    )
+
+    # A cached document is served without converting it again
+    _iter_pages(service, pdf_path, tmp_path, model)
+    assert converter.calls == (2 if cached else 4)
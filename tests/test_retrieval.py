@@ -0,0 +1,164 @@
+import time
+from typing import Iterator, List
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+from backend.api.data_ingestion.embedding import (
+    Embedder,
+    HashingDenseEncoder,
+    HashingSparseEncoder,
+)
+from backend.api.data_ingestion.indexing import QdrantIndexWriter
+from backend.api.data_ingestion.model import DocumentChunk
+from backend.api.retrieval.model import SearchRequest
+from backend.api.retrieval.service import RetrievalService, reciprocal_rank_fusion
+
+TEXTS = {
+    "animals": [
+        "The quick brown fox jumps over the lazy dog",
+        "Cats sleep most of the day in the sun",
+        "Owls hunt mice at night in the forest",
+    ],
+    "engineering": [
+        "Bridges are built from steel and concrete",
+        "The fox bridge crosses the river near the forest",
+    ],
+}
+
+
+class CountingEmbedder:
+    """Embedder counting the queries it encodes, or failing them."""
+
+    def __init__(self, embedder: Embedder):
+        self.embedder = embedder
+        self.calls = 0
+        self.error = None
+
+    def encode_queries(self, texts, timeout=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.embedder.encode_queries(texts, timeout=timeout)
+
+
+@pytest.fixture(scope="module")
+def embedder() -> Iterator[Embedder]:
+    embedder = Embedder(
+        dense_encoder=HashingDenseEncoder(64),
+        sparse_encoder=HashingSparseEncoder(),
+        batch_max_tokens=1000,
+        batch_max_size=8,
+        max_in_flight=1,
+    )
+    yield embedder
+    embedder.close()
+
+
+@pytest.fixture(scope="module")
+def client(embedder) -> QdrantClient:
+    client = QdrantClient(":memory:")
+    for collection, texts in TEXTS.items():
+        chunks = [
+            DocumentChunk(index=index, text=text, num_tokens=len(text.split()))
+            for index, text in enumerate(texts)
+        ]
+        with QdrantIndexWriter(collection, collection, client=client) as writer:
+            writer.ensure_collection(embedder.dense_encoder.dimension)
+            for batch in embedder.embed(chunks):
+                writer.add(batch)
+    return client
+
+
+@pytest.fixture
+def query_embedder(embedder) -> CountingEmbedder:
+    return CountingEmbedder(embedder)
+
+
+@pytest.fixture
+def service(client, query_embedder) -> RetrievalService:
+    return RetrievalService(client=client, query_embedder=query_embedder)
+
+
+def scored(point_id: int, text: str) -> models.ScoredPoint:
+    return models.ScoredPoint(id=point_id, version=0, score=0.0, payload={"text": text})
+
+
+def test_fusion_ranks_points_found_by_both_lists_first():
+    dense = [scored(1, "dense"), scored(2, "dense"), scored(3, "dense")]
+    sparse = [scored(2, "sparse"), scored(4, "sparse"), scored(1, "sparse")]
+
+    fused = reciprocal_rank_fusion([dense, sparse], k=60)
+
+    ids: List[int] = [point.id for _, point in fused]
+    assert ids == [2, 1, 4, 3]
+    assert fused[0][0] == pytest.approx(1 / 62 + 1 / 61)
+    # Kept once, with the payload of its best ranked occurrence
+    assert fused[0][1].payload["text"] == "sparse"
+    assert fused[1][1].payload["text"] == "dense"
+
+
+def test_search_fuses_the_collections(service):
+    response = service.search(
+        SearchRequest(query="fox forest", collections=list(TEXTS), limit=10)
+    )
+
+    assert not response.partial
+    assert response.missing == []
+    ids = [hit.id for hit in response.hits]
+    assert len(ids) == len(set(ids)) == 5
+    assert {hit.collection for hit in response.hits} == set(TEXTS)
+    assert {"fox", "forest"} & set(response.hits[0].text.split())
+    scores = [hit.score for hit in response.hits]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_missing_collection_gives_a_partial_response(service):
+    response = service.search(
+        SearchRequest(query="fox", collections=["animals", "unknown"])
+    )
+
+    assert response.partial
+    assert response.missing == ["unknown/dense", "unknown/sparse"]
+    assert {hit.collection for hit in response.hits} == {"animals"}
+
+
+def test_collection_slower_than_the_budget_is_left_out(service, monkeypatch):
+    query = service._query
+
+    def slow_query(collection, using, vector, limit):
+        if collection == "engineering":
+            time.sleep(0.5)
+        return query(collection, using, vector, limit)
+
+    monkeypatch.setattr(service, "_query", slow_query)
+
+    response = service.search(
+        SearchRequest(query="fox", collections=list(TEXTS), budget_ms=200)
+    )
+
+    assert response.partial
+    assert response.missing == ["engineering/dense", "engineering/sparse"]
+    assert response.hits
+    assert {hit.collection for hit in response.hits} == {"animals"}
+
+
+def test_repeated_query_skips_the_embedder(service, query_embedder):
+    request = SearchRequest(query="owls at night", collections=["animals"])
+
+    first = service.search(request)
+    second = service.search(request)
+
+    assert query_embedder.calls == 1
+    assert [hit.id for hit in first.hits] == [hit.id for hit in second.hits]
+
+
+@pytest.mark.parametrize("error", [TimeoutError(), RuntimeError("encoder down")])
+def test_embedding_failure_gives_a_partial_response(service, query_embedder, error):
+    query_embedder.error = error
+
+    response = service.search(SearchRequest(query="fox", collections=["animals"]))
+
+    assert response.partial
+    assert response.missing == ["embedding"]
+    assert response.hits == []
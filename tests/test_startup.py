@@ -0,0 +1,11 @@
+from backend.utils.startup import HEAVY_MODULES, measure_startup
+
+
+def test_api_startup_does_not_import_heavy_modules():
+    # Imported in a fresh interpreter, this process already loaded some of them
+    result = measure_startup("backend.main", repeat=1)
+
+    assert result["heavy_modules"] == [], (
+        f"backend.main imports {result['heavy_modules']}, "
+        f"none of {HEAVY_MODULES} should be imported at startup"
+    )